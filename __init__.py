@@ -1,25 +1,45 @@
+import os
+import sys
+
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
 
+from .fragments import FragmentCacheExtension
+from .passwords import PasswordHasher
+from .storage_profile import apply_profile, engine_options
+
+# routes.py and content.py import sibling modules (dice, content, database)
+# by their top-level names, as app.py does; keep them importable from the package
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
 db = SQLAlchemy()
 migrate = Migrate()
 login_manager = LoginManager()
+password_hasher = PasswordHasher()
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
+    app.jinja_env.add_extension(FragmentCacheExtension)
     
     # Configuration
     app.config['SECRET_KEY'] = 'your-secret-key'  # Change this to a secure secret key
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///game.db'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLITE_PROFILE'] = 'tuned'
+    app.config.update(config or {})
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(
+        app.config['SQLITE_PROFILE'], app.config['SQLALCHEMY_DATABASE_URI']))
     
     # Initialize extensions
     db.init_app(app)
+    with app.app_context():
+        apply_profile(db.engine, app.config['SQLITE_PROFILE'])
     migrate.init_app(app, db)
     login_manager.init_app(app)
     login_manager.login_view = 'main.login'
+    password_hasher.init_app(app)
     
     # Import models (after db initialization)
     from .models import User, Character
@@ -1,31 +1,122 @@
 import random
-from flask import Flask, render_template, redirect, url_for, request, session, jsonify
-from flask_wtf.csrf import CSRFProtect
+from flask import (
+    Flask, render_template, redirect, url_for, request, session, jsonify, abort, Response,
+    stream_with_context, g
+)
+from flask.cli import AppGroup
+import click
+from flask_wtf.csrf import CSRFProtect, validate_csrf
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.exc import StaleDataError
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from flask_wtf import FlaskForm
 from wtforms import StringField, SubmitField, PasswordField, RadioField, SelectField
-from wtforms.validators import DataRequired, Length, EqualTo
+from wtforms.validators import DataRequired, Length, EqualTo, ValidationError
+import copy
+import functools
 import json
 import os
+import secrets
+import sys
+import time
 
-app = Flask(__name__)
+# `flask --app app.py` imports this file as package.app because of the
+# __init__.py next to it; keep the sibling modules importable either way.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import dice
+from content import ContentError, get_content, reload_content
+from encounter_store import create_encounter_store
+from fragments import FragmentCache, FragmentCacheExtension
+from identity_cache import IdentityCache
+from idle import IDLE_MAX_SECONDS, IDLE_TICK_SECONDS, idle_rates, idle_ticks, offline_rewards
+import maintenance
+import metrics as request_metrics
+from passwords import PasswordHasher, PasswordHasherBusy
+from query_budget import install as install_query_budget, query_budget
+from rules import (
+    BASIC_ATTACK_DICE, spawn_wave, strength_bonus, wave_clear_max_hp
+)
+from session_interface import TimedSessionInterface
+from startup import (
+    install_database_template, precompile_templates, running_under_cli, schema_is_current,
+    template_bytecode_cache
+)
+from storage_profile import apply_profile, engine_options
+from write_behind import WriteBehindBacklogged, create_write_behind
+
+# Packaged builds keep their data next to the executable, not in the working directory
+FROZEN = getattr(sys, 'frozen', False)
+app = Flask(__name__, instance_path=os.path.join(os.path.dirname(sys.executable), 'instance') if FROZEN else None)
 app.config['SECRET_KEY'] = '666'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///dnd_game.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///dnd_game.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# SQLite PRAGMAs and pool sizing, see storage_profile.py: 'tuned' or 'default'
+app.config['SQLITE_PROFILE'] = os.environ.get('SQLITE_PROFILE', 'tuned')
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(
+    app.config['SQLITE_PROFILE'], app.config['SQLALCHEMY_DATABASE_URI'])
+# Where combat encounters live: 'layered' (memory + SQLite), 'memory', 'sqlite' or 'cookie'
+app.config['ENCOUNTER_STORE'] = os.environ.get('ENCOUNTER_STORE', 'layered')
+app.session_interface = TimedSessionInterface()
+# How many times a turn is re-run after losing an optimistic-locking race
+app.config['TURN_RETRY_LIMIT'] = 3
+# Auto-battle: turn cap per wave and an optional pause between streamed turns (seconds)
+app.config['AUTO_BATTLE_MAX_TURNS'] = 200
+app.config['AUTO_BATTLE_TURN_DELAY'] = float(os.environ.get('AUTO_BATTLE_TURN_DELAY', 0))
+# Buffer per-turn character changes and write them in batches (see write_behind.py);
+# single server process only, a second one refuses to start
+app.config['WRITE_BEHIND'] = os.environ.get('WRITE_BEHIND') == '1'
+app.config['WRITE_BEHIND_INTERVAL'] = 2.0
+app.config['WRITE_BEHIND_MAX_PENDING'] = 500
+# Turns waiting for a failing flush before new turns are refused with 503
+app.config['WRITE_BEHIND_MAX_BACKLOG'] = 50_000
+# Record request, SQL, template and cookie metrics for /metrics (see metrics.py)
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS') == '1'
+# Raise instead of logging when a view runs more SQL than its budget (always on under app.testing)
+app.config['QUERY_BUDGET_STRICT'] = os.environ.get('QUERY_BUDGET_STRICT') == '1'
+# PBKDF2 work factor and how many hashes may run at once (see passwords.py)
+app.config['PASSWORD_HASH_ITERATIONS'] = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 600_000))
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+app.config['PASSWORD_HASH_QUEUE'] = 64
+# Reuse compiled templates across processes; packaged builds ship them prebuilt (see startup.py)
+app.config['JINJA_CACHE_DIR'] = os.path.join(app.root_path if FROZEN else app.instance_path, 'jinja_cache')
+app.jinja_options = dict(app.jinja_options, bytecode_cache=template_bytecode_cache(app.config['JINJA_CACHE_DIR']),
+                         extensions=[FragmentCacheExtension])
+# Memory budget for {% cache %} fragments keyed by character version (see fragments.py); 0 disables
+app.config['FRAGMENT_CACHE_BYTES'] = int(os.environ.get('FRAGMENT_CACHE_BYTES', 4 * 1024 * 1024))
+# Packaged builds ship a migrated empty database to start from (see build_bundle.py)
+app.config['DATABASE_TEMPLATE'] = os.path.join(app.root_path, 'db_template', 'dnd_game.db')
+install_database_template(app.config['SQLALCHEMY_DATABASE_URI'], app.instance_path,
+                          app.config['DATABASE_TEMPLATE'])
 
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+# Keep committed objects loaded so views can render them without a refresh SELECT
+db = SQLAlchemy(app, session_options={'expire_on_commit': False})
+with app.app_context():
+    apply_profile(db.engine, app.config['SQLITE_PROFILE'])
+    install_query_budget(db.engine)
+if running_under_cli():
+    # Alembic is slow to import and only the `flask db` commands need it
+    from flask_migrate import Migrate
+    migrate = Migrate(app, db)
 csrf = CSRFProtect(app)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
+password_hasher = PasswordHasher(app)
+encounter_store = create_encounter_store(app.config, app.instance_path)
+metrics = None
+if app.config['METRICS_ENABLED']:
+    with app.app_context():
+        metrics = request_metrics.Metrics(app, db.engine)
+get_content()  # Load game data at startup so a bad data file fails fast
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     password = db.Column(db.String(120), nullable=False)
-    characters = db.relationship('Character', backref='user', lazy=True)
+    characters = db.relationship('Character', backref='user', lazy=True, order_by='Character.id')
 
 class Character(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -42,60 +133,205 @@ class Character(db.Model):
     charisma = db.Column(db.Integer, default=10)
     gold = db.Column(db.Integer, default=0)
     experience = db.Column(db.Integer, default=0)
-    inventory = db.Column(db.String(500), default='[]')
-    equipment = db.Column(db.String(500), default='{"weapon": "Fists", "armor": "Clothes"}')
-    abilities = db.Column(db.String(500), default='[]')
+    equipment = db.Column(db.JSON, default=lambda: {'weapon': 'Fists', 'armor': 'Clothes'})
+    abilities = db.Column(db.JSON, default=list)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     version = db.Column(db.Integer, default=1)
+    # Unix time of the last turn, or of the offline progress credited since (see idle.py);
+    # whole seconds so write-behind buffers it like any other numeric column
+    last_played = db.Column(db.Integer)
+    items = db.relationship('CharacterItem', backref='character', lazy=True,
+                            cascade='all, delete-orphan')
+
+    # Every UPDATE is a compare-and-swap on version ("... WHERE id = ? AND version = ?")
+    # and bumps it; a lost race raises StaleDataError (see retry_on_conflict)
+    __mapper_args__ = {
+        'version_id_col': version,
+        'version_id_generator': lambda version: (version or 0) + 1
+    }
+
+    def inventory_items(self):
+        """Return [(item name, quantity), ...] for this character"""
+        rows = (db.session.query(Item.name, CharacterItem.quantity)
+                .join(CharacterItem, CharacterItem.item_id == Item.id)
+                .filter(CharacterItem.character_id == self.id)
+                .order_by(Item.id)
+                .all())
+        if write_behind is None:
+            return rows
+        # Add item changes that are still buffered
+        quantities = dict(rows)
+        for name, delta in write_behind.pending_items(self.id, self.version).items():
+            quantities[name] = quantities.get(name, 0) + delta
+        return [(name, quantity) for name, quantity in quantities.items() if quantity > 0]
+
+    def add_item(self, name, quantity=1):
+        """Add an item with a single-row upsert, safe against concurrent adds"""
+        if write_behind is not None:
+            write_behind.add_item(self, name, quantity)
+            return
+        stmt = sqlite_insert(CharacterItem).values(
+            character_id=self.id, item_id=Item.id_for(name), quantity=quantity)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['character_id', 'item_id'],
+            set_={'quantity': CharacterItem.quantity + stmt.excluded.quantity}))
+
+    def remove_item(self, name, quantity=1):
+        """Remove up to quantity of an item; returns False if the character has none"""
+        item = Item.query.filter_by(name=name).first()
+        row = db.session.get(CharacterItem, (self.id, item.id)) if item else None
+        if row is None:
+            return False
+        if row.quantity > quantity:
+            row.quantity -= quantity
+        else:
+            db.session.delete(row)
+        return True
 
     def __repr__(self):
         return f'<Character {self.name}>'
 
-# Class definitions with starting stats and abilities
-CLASS_STATS = {
-    'warrior': {
-        'hp': 80,
-        'strength': 14,
-        'dexterity': 12,
-        'constitution': 14,
-        'intelligence': 8,
-        'wisdom': 10,
-        'charisma': 10,
-        'equipment': {
-            'weapon': 'Longsword',
-            'armor': 'Chain Mail'
-        },
-        'abilities': ['Cleave', 'Second Wind']
-    },
-    'mage': {
-        'hp': 60,
-        'strength': 8,
-        'dexterity': 10,
-        'constitution': 10,
-        'intelligence': 16,
-        'wisdom': 14,
-        'charisma': 12,
-        'equipment': {
-            'weapon': 'Staff',
-            'armor': 'Robes'
-        },
-        'abilities': ['Fireball', 'Divine Shield']
-    },
-    'rogue': {
-        'hp': 70,
-        'strength': 10,
-        'dexterity': 16,
-        'constitution': 12,
-        'intelligence': 12,
-        'wisdom': 10,
-        'charisma': 14,
-        'equipment': {
-            'weapon': 'Dagger',
-            'armor': 'Leather Armor'
-        },
-        'abilities': ['Backstab', 'Evasion']
-    }
-}
+class Item(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+
+    # name -> id of rows that were already committed when looked up; items are never deleted
+    _ids = {}
+
+    @classmethod
+    def id_for(cls, name):
+        """Id of the item called name, creating the row on first use"""
+        item_id = cls._ids.get(name)
+        if item_id is not None:
+            return item_id
+        item_id = db.session.execute(select(cls.id).where(cls.name == name)).scalar()
+        if item_id is not None:
+            cls._ids[name] = item_id
+            return item_id
+        # The no-op update makes RETURNING give the id even if another request inserted the row first
+        stmt = sqlite_insert(cls).values(name=name)
+        return db.session.execute(
+            stmt.on_conflict_do_update(index_elements=['name'], set_={'name': stmt.excluded.name})
+            .returning(cls.id)
+        ).scalar_one()
+
+    def __repr__(self):
+        return f'<Item {self.name}>'
+
+class CharacterItem(db.Model):
+    __tablename__ = 'character_item'
+    character_id = db.Column(db.Integer, db.ForeignKey('character.id'), primary_key=True, index=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('item.id'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+
+identity_cache = IdentityCache(User, Character)
+with app.app_context():
+    write_behind = create_write_behind(app.config, app.instance_path, db.engine,
+                                       Character.__table__, Item.__table__, CharacterItem.__table__,
+                                       logger=app.logger)
+
+def fragment_version(character):
+    """What a character's cached fragments are keyed on: its row version, plus buffered turns"""
+    if write_behind is None:
+        return character.version
+    return (character.version, write_behind.revision(character.id))
+
+fragment_cache = FragmentCache(app.config['FRAGMENT_CACHE_BYTES'], version_of=fragment_version)
+app.jinja_env.fragment_cache = fragment_cache
+
+def get_character_or_404(character_id):
+    """Character for this request, from the identity cache while its version is current"""
+    try:
+        character = identity_cache.characters.load(db.session, int(character_id))
+    except (TypeError, ValueError):
+        character = None
+    if character is None:
+        abort(404)
+    if write_behind is not None:
+        write_behind.overlay(character)
+    return character
+
+def save_turn(character, flush=False):
+    """Commit a turn; with write-behind on the character's changes are buffered instead"""
+    character.last_played = int(time.time())
+    if write_behind is not None:
+        write_behind.capture(character)
+    db.session.commit()
+    if flush and write_behind is not None:
+        try:
+            write_behind.flush()
+        except Exception:
+            # The turn is buffered and journaled; the background flusher retries the batch
+            app.logger.exception("Write-behind flush failed")
+
+def credit_offline_progress(character, now=None, rng=None):
+    """Grant what character earned since last_played (see idle.py); returns the rewards, or None
+
+    Only whole idle ticks are paid: last_played moves forward by the ticks
+    granted, so the remainder counts towards the next visit. The caller commits.
+    """
+    now = int(time.time()) if now is None else now
+    if character.last_played is None:
+        character.last_played = now  # Never played since the column was added: start counting now
+        return None
+    seconds = now - character.last_played
+    if not idle_ticks(seconds):
+        return None
+    rewards = offline_rewards(seconds, idle_rates(get_content()), rng=rng)
+    character.experience = (character.experience or 0) + rewards['xp']
+    character.gold = (character.gold or 0) + rewards['gold']
+    for name, count in rewards['loot'].items():
+        character.add_item(name, count)
+    if seconds >= IDLE_MAX_SECONDS:
+        character.last_played = now  # Time past the cap is not earned
+    else:
+        character.last_played += rewards['ticks'] * IDLE_TICK_SECONDS
+    return rewards
+
+def with_offline_progress(view):
+    """Credit offline progress when a character's page is opened, in its own commit
+
+    Runs before the view's query budget: a long absence can drop several items.
+    The rewards are left in g.offline_rewards for the template.
+    """
+    @functools.wraps(view)
+    def wrapper(character_id, *args, **kwargs):
+        character = get_character_or_404(character_id)
+        if character.user_id == current_user.id:
+            last_played = character.last_played
+            rewards = credit_offline_progress(character)
+            if character.last_played != last_played:
+                if write_behind is not None:
+                    write_behind.capture(character)
+                db.session.commit()
+            g.offline_rewards = rewards
+        return view(character_id, *args, **kwargs)
+    return wrapper
+
+conflict_stats = {'conflicts': 0, 'retries_exhausted': 0}
+
+@app.errorhandler(WriteBehindBacklogged)
+def write_behind_backlogged(e):
+    db.session.rollback()
+    app.logger.error("Refusing a turn: %s", e)
+    return "The server is behind on saving games, please try again in a moment.", 503
+
+def retry_on_conflict(view):
+    """Re-run a turn from scratch when another request updated the character first"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        for _ in range(app.config['TURN_RETRY_LIMIT']):
+            try:
+                return view(*args, **kwargs)
+            except StaleDataError:
+                db.session.rollback()
+                conflict_stats['conflicts'] += 1
+                # The rollback expired the logged-in user; reload it here, as login_required did
+                # before the first attempt, so every attempt runs within the view's query budget
+                db.session.refresh(current_user._get_current_object())
+        conflict_stats['retries_exhausted'] += 1
+        return "Your character was changed by another action, please try again.", 409
+    return wrapper
 
 class PlayForm(FlaskForm):
     choice = RadioField('Make your choice', 
@@ -147,47 +383,9 @@ class CombatForm(FlaskForm):
     target = SelectField('Choose your target', validators=[DataRequired()])
     submit = SubmitField('Execute Action')
 
-ABILITIES = {
-    'Cleave': {
-        'damage': 12,
-        'description': 'A powerful swing that hits all enemies',
-        'type': 'attack_all'
-    },
-    'Second Wind': {
-        'heal': 20,
-        'description': 'Recover some health',
-        'type': 'heal'
-    },
-    'Fireball': {
-        'damage': 15,
-        'description': 'Launch a powerful fireball at all enemies',
-        'type': 'attack_all'
-    },
-    'Magic Shield': {
-        'shield': 15,
-        'description': 'Create a magical shield to absorb damage',
-        'type': 'shield'
-    },
-    'Divine Shield': {
-        'shield': 20,
-        'description': 'Create a divine shield to absorb damage',
-        'type': 'shield'
-    },
-    'Backstab': {
-        'damage': 20,
-        'description': 'A precise strike that deals heavy damage to one enemy',
-        'type': 'attack_single'
-    },
-    'Evasion': {
-        'dodge': 0.5,
-        'description': 'Increase dodge chance for one turn',
-        'type': 'buff'
-    }
-}
-
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return identity_cache.users.load(db.session, user_id)
 
 @app.route('/')
 def home():
@@ -201,7 +399,15 @@ def login():
         password = form.password.data
         user = User.query.filter_by(username=username).first()
         
-        if user and password == user.password:  # In production, use proper password hashing
+        try:
+            ok, upgrade = password_hasher.verify(user.password, password) if user else (False, False)
+            if ok and upgrade:
+                # Plaintext from before hashing, or an old work factor
+                user.password = password_hasher.hash(password)
+                db.session.commit()
+        except PasswordHasherBusy:
+            return "Too many people are logging in right now, please try again.", 503
+        if ok:
             login_user(user)
             return redirect(url_for('character_select'))
             
@@ -217,7 +423,10 @@ def register():
         if User.query.filter_by(username=username).first():
             return "Username already exists"
             
-        user = User(username=username, password=password)  # In production, hash the password
+        try:
+            user = User(username=username, password=password_hasher.hash(password))
+        except PasswordHasherBusy:
+            return "Too many people are signing up right now, please try again.", 503
         db.session.add(user)
         db.session.commit()
         return redirect(url_for('login'))
@@ -230,7 +439,7 @@ def create_character():
     form = CharacterForm()
     if form.validate_on_submit():
         char_class = form.char_class.data
-        stats = CLASS_STATS[char_class]
+        stats = get_content().classes[char_class]
         
         character = Character(
             name=form.name.data,
@@ -244,8 +453,9 @@ def create_character():
             intelligence=stats['intelligence'],
             wisdom=stats['wisdom'],
             charisma=stats['charisma'],
-            equipment=json.dumps(stats['equipment']),
-            abilities=json.dumps(stats['abilities'])
+            equipment=dict(stats['equipment']),
+            abilities=list(stats['abilities']),
+            last_played=int(time.time())
         )
         
         db.session.add(character)
@@ -257,10 +467,17 @@ def create_character():
 
 @app.route('/character/select')
 @login_required
+@query_budget(2)
 def character_select():
-    characters = Character.query.filter_by(user_id=current_user.id).all()
-    forms = {char.id: SelectCharacterForm() for char in characters}
-    return render_template('character_select.html', characters=characters, forms=forms)
+    # Every character in one IN query; only this page needs the roster, so it is not loaded with the user
+    user = db.session.scalars(
+        select(User).where(User.id == current_user.id).options(selectinload(User.characters))).one()
+    characters = user.characters
+    if write_behind is not None:
+        for char in characters:
+            write_behind.overlay(char)
+    # One form renders the CSRF token; every character card posts it
+    return render_template('character_select.html', characters=characters, form=SelectCharacterForm())
 
 @app.route('/character/select/choose', methods=['POST'])
 @login_required
@@ -268,7 +485,7 @@ def select_character():
     form = SelectCharacterForm()
     if form.validate_on_submit():
         character_id = request.args.get('character_id')
-        character = Character.query.get_or_404(character_id)
+        character = get_character_or_404(character_id)
         
         if character.user_id != current_user.id:
             return "Unauthorized", 403
@@ -279,8 +496,13 @@ def select_character():
 
 @app.route('/game/<int:character_id>', methods=['GET', 'POST'])
 @login_required
+@retry_on_conflict
+@with_offline_progress
+# Worst case, an explore that finds a new item after an identity-cache miss: version probe,
+# character SELECT, UPDATE, item SELECT, item INSERT ... RETURNING, character_item upsert
+@query_budget(6)
 def game(character_id):
-    character = Character.query.get_or_404(character_id)
+    character = get_character_or_404(character_id)
     if character.user_id != current_user.id:
         return "Unauthorized", 403
 
@@ -289,57 +511,9 @@ def game(character_id):
     if form.validate_on_submit():
         action = form.action.data
         if action == 'explore':
-            # Random exploration outcomes with varied events
-            outcomes = [
-                {
-                    'text': "You find a hidden treasure chest! Inside you find some gold and a healing potion.",
-                    'effect': {'gold': 50, 'hp': 5, 'item': 'Healing Potion'},
-                    'rarity': 'rare'
-                },
-                {
-                    'text': "You discover an ancient shrine. Praying here restores your health and grants a blessing.",
-                    'effect': {'hp': 15, 'ability': 'Divine Shield'},
-                    'rarity': 'rare'
-                },
-                {
-                    'text': "You stumble upon a merchant's abandoned cart. You find some useful items.",
-                    'effect': {'gold': 30, 'item': 'Magic Scroll'},
-                    'rarity': 'uncommon'
-                },
-                {
-                    'text': "You find a peaceful grove and take a short rest.",
-                    'effect': {'hp': 10},
-                    'rarity': 'common'
-                },
-                {
-                    'text': "You discover a trap the hard way! You take some damage.",
-                    'effect': {'hp': -8},
-                    'rarity': 'common'
-                },
-                {
-                    'text': "You find an ancient training dummy and practice your combat skills.",
-                    'effect': {'strength': 1},
-                    'rarity': 'uncommon'
-                },
-                {
-                    'text': "You discover a mystical fountain. Drinking from it enhances your abilities.",
-                    'effect': {'max_hp': 5, 'hp': 5},
-                    'rarity': 'rare'
-                },
-                {
-                    'text': "You find a merchant willing to trade.",
-                    'effect': {'shop': True},
-                    'rarity': 'uncommon'
-                }
-            ]
-            
-            # Weight outcomes by rarity
-            weights = {'common': 0.5, 'uncommon': 0.3, 'rare': 0.2}
-            weighted_outcomes = []
-            for outcome in outcomes:
-                weighted_outcomes.extend([outcome] * int(weights[outcome['rarity']] * 10))
-            
-            outcome = random.choice(weighted_outcomes)
+            # Random exploration outcomes with varied events, weighted by rarity
+            content = get_content()
+            outcome = content.explore_sampler.sample()
             message = outcome['text']
             effect = outcome['effect']
             
@@ -364,28 +538,20 @@ def game(character_id):
                 message += f" Gold: +{effect['gold']}"
             
             if 'item' in effect:
-                inventory = json.loads(character.inventory)
-                inventory.append(effect['item'])
-                character.inventory = json.dumps(inventory)
+                character.add_item(effect['item'])
                 message += f" Item gained: {effect['item']}"
             
             if 'ability' in effect:
-                abilities = json.loads(character.abilities)
+                abilities = character.abilities or []
                 if effect['ability'] not in abilities:
-                    abilities.append(effect['ability'])
-                    character.abilities = json.dumps(abilities)
+                    character.abilities = abilities + [effect['ability']]
                     message += f" New ability learned: {effect['ability']}"
             
             if 'shop' in effect:
                 # Implement shop logic here
-                shop_items = [
-                    {'name': 'Health Potion', 'cost': 50},
-                    {'name': 'Better Weapon', 'cost': 100},
-                    {'name': 'Better Armor', 'cost': 100}
-                ]
-                message += "\nAvailable items:\n" + "\n".join([f"{item['name']}: {item['cost']} gold" for item in shop_items])
+                message += "\nAvailable items:\n" + "\n".join([f"{item['name']}: {item['cost']} gold" for item in content.shop_items])
             
-            db.session.commit()
+            save_turn(character)
             return render_template('game.html', character=character, form=form, message=message)
             
         elif action == 'fight':
@@ -396,24 +562,17 @@ def game(character_id):
             # Increased rest healing
             old_hp = character.hp
             character.hp = min(character.hp + 15, character.max_hp)  # Increased from 5 to 15
-            db.session.commit()
+            save_turn(character)
             message = f"You rest and recover some HP. HP: {old_hp} → {character.hp}"
             return render_template('game.html', character=character, form=form, message=message)
             
         elif action == 'inventory':
             # Handle inventory
-            inventory = json.loads(character.inventory)
+            inventory = character.inventory_items()
             if inventory:
-                # Format inventory items in pairs (for items with quantities)
-                formatted_items = []
-                i = 0
-                while i < len(inventory):
-                    if i + 1 < len(inventory) and inventory[i] == 'Gold':
-                        formatted_items.append(f"{inventory[i]}: {inventory[i+1]}")
-                        i += 2
-                    else:
-                        formatted_items.append(inventory[i])
-                        i += 1
+                # Show quantities for stacked items
+                formatted_items = [name if quantity == 1 else f"{name}: {quantity}"
+                                   for name, quantity in inventory]
                 message = "Your inventory: " + ", ".join(formatted_items)
             else:
                 message = "Your inventory is empty"
@@ -421,199 +580,358 @@ def game(character_id):
     
     return render_template('game.html', character=character, form=form)
 
+def encounter_key(character_id):
+    """Store key for a character's encounter; the cookie only carries the opaque id"""
+    if 'encounter_id' not in session:
+        session['encounter_id'] = secrets.token_urlsafe(12)
+    return f"{session['encounter_id']}:{character_id}"
+
+def load_encounter(key):
+    """A working copy of the stored encounter, with this wave's monsters spawned"""
+    # Work on a copy so a turn retried after a conflict starts from the stored state
+    encounter = copy.deepcopy(encounter_store.get(key))
+    if encounter is None:
+        encounter = {
+            'wave': 1,
+            'shield': 0,  # For Magic Shield ability
+            'dodge': 0    # For Evasion ability
+        }
+    
+    # Get or create encounter monsters with wave-based scaling
+    if 'monsters' not in encounter:
+        encounter['monsters'] = spawn_wave(encounter['wave'])
+        encounter_store.set(key, encounter)
+    return encounter
+
+def resolve_turn(character, encounter, action, target_idx):
+    """One combat turn: the character acts, then every living monster attacks; returns the log lines"""
+    current_monsters = encounter['monsters']
+    living_monsters = [m for m in current_monsters if m['hp'] > 0]
+    message_parts = []
+    
+    # Handle abilities
+    if action == 'attack':
+        # Basic attack
+        damage_dealt = dice.roll(BASIC_ATTACK_DICE) + strength_bonus(character.strength)
+        current_monsters[target_idx]['hp'] -= damage_dealt
+        message_parts.append(f"You hit {current_monsters[target_idx]['name']} for {damage_dealt} damage!")
+    else:
+        ability = get_content().abilities[action]
+        if ability['type'] == 'attack_all':
+            # AoE attack
+            for monster in current_monsters:
+                if monster['hp'] > 0:
+                    monster['hp'] -= ability['damage']
+            message_parts.append(f"You use {action} and deal {ability['damage']} damage to all enemies!")
+        elif ability['type'] == 'attack_single':
+            # Single target attack
+            current_monsters[target_idx]['hp'] -= ability['damage']
+            message_parts.append(f"You use {action} and deal {ability['damage']} damage to {current_monsters[target_idx]['name']}!")
+        elif ability['type'] == 'heal':
+            # Healing ability
+            old_hp = character.hp
+            character.hp = min(character.hp + ability['heal'], character.max_hp)
+            message_parts.append(f"You use {action} and heal for {character.hp - old_hp} HP!")
+        elif ability['type'] == 'shield':
+            # Shield ability
+            encounter['shield'] = ability['shield']
+            message_parts.append(f"You use {action} and gain {ability['shield']} shield!")
+        elif ability['type'] == 'buff':
+            # Buff ability (like Evasion)
+            encounter['dodge'] = ability['dodge']
+            message_parts.append(f"You use {action} and gain increased dodge chance!")
+    
+    # Monster attacks
+    total_damage_taken = 0
+    for monster in living_monsters:
+        if monster['hp'] > 0:  # Only living monsters attack
+            # Check for dodge
+            if encounter.get('dodge', 0) > 0 and random.random() < encounter['dodge']:
+                message_parts.append(f"You dodged {monster['name']}'s attack!")
+                continue
+            
+            damage_taken = dice.roll(monster['damage'])
+            
+            # Apply shield if available
+            if encounter.get('shield', 0) > 0:
+                absorbed = min(encounter['shield'], damage_taken)
+                encounter['shield'] -= absorbed
+                damage_taken -= absorbed
+                message_parts.append(f"Shield absorbed {absorbed} damage!")
+            
+            total_damage_taken += damage_taken
+            message_parts.append(f"{monster['name']} hits for {damage_taken}")
+    
+    character.hp -= total_damage_taken
+    
+    # Reset temporary buffs
+    encounter['shield'] = 0
+    encounter['dodge'] = 0
+    return message_parts
+
+def clear_wave(character, encounter):
+    """Level up after every monster in the wave is down and queue the next wave; returns the message"""
+    encounter.pop('monsters', None)
+    encounter['wave'] = encounter.get('wave', 1) + 1
+    encounter['shield'] = 0
+    encounter['dodge'] = 0
+    
+    # Level up and increase stats
+    old_level = character.level
+    old_hp = character.max_hp
+    old_str = character.strength
+    
+    character.level += 1
+    character.max_hp = wave_clear_max_hp(character.level)
+    character.hp = character.max_hp
+    character.strength += 2
+    
+    return f"""Wave {encounter['wave'] - 1} completed! Level Up!
+        Level: {old_level} → {character.level}
+        Max HP: {old_hp} → {character.max_hp}
+        Strength: {old_str} → {character.strength}
+        You've been healed and enemies grow stronger!"""
+
+def revive(character, encounter):
+    """A defeated character is healed and sent back to wave 1"""
+    character.hp = character.max_hp
+    encounter.pop('monsters', None)
+    encounter['wave'] = 1
+
+# Character columns a combat turn can change, sent back in delta responses
+COMBAT_DELTA_FIELDS = ('hp', 'max_hp', 'level', 'strength', 'dexterity', 'constitution')
+
+def wants_delta():
+    """True when the combat form was posted by scripts.js asking for JSON changes only"""
+    return (request.method == 'POST'
+            and request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json')
+
+def combat_snapshot(character, monsters):
+    return {'character': {field: getattr(character, field) for field in COMBAT_DELTA_FIELDS},
+            'monsters': [monster['hp'] for monster in monsters]}
+
+def target_choices(monsters):
+    return [(str(i), f"{m['name']} (HP: {m['hp']}/{m['max_hp']})")
+            for i, m in enumerate(monsters) if m['hp'] > 0]
+
+def combat_delta(character, before, monsters, wave, message, combat_over):
+    """What changed since ``before``, in the shape scripts.js applies to the page"""
+    old_hp = before['monsters']
+    return {
+        'wave': wave,
+        'combat_over': combat_over,
+        'character': {field: getattr(character, field) for field in COMBAT_DELTA_FIELDS
+                      if getattr(character, field) != before['character'][field]},
+        'monsters': [{'index': i, 'name': m['name'], 'hp': m['hp'], 'max_hp': m['max_hp']}
+                     for i, m in enumerate(monsters)
+                     if len(monsters) != len(old_hp) or m['hp'] != old_hp[i]],
+        'targets': [] if combat_over else target_choices(monsters),
+        'log': [line.strip() for line in message.splitlines() if line.strip()],
+    }
+
+def render_combat(character, form, before, monsters, wave, message, combat_over):
+    """The combat page, or for scripts.js just what changed since ``before``"""
+    if not wants_delta():
+        return render_template('combat.html', character=character, monsters=monsters, wave=wave,
+                               message=message, combat_over=combat_over, form=form)
+    return jsonify(combat_delta(character, before, monsters, wave, message, combat_over))
+
 @app.route('/combat/<int:character_id>', methods=['GET', 'POST'])
 @login_required
+@retry_on_conflict
 def combat(character_id):
-    character = Character.query.get_or_404(character_id)
+    character = get_character_or_404(character_id)
     if character.user_id != current_user.id:
         return "Unauthorized", 403
 
     form = CombatForm()
     
     # Get character's abilities
-    abilities = json.loads(character.abilities)
+    abilities = character.abilities or []
     ability_choices = [('attack', 'Basic Attack')] + [(ability, ability) for ability in abilities]
     form.action.choices = ability_choices
     
-    # Base monster stats
-    base_monsters = {
-        'Goblin': {'hp': 8, 'damage': '1d6', 'xp': 15},
-        'Skeleton': {'hp': 10, 'damage': '1d6', 'xp': 25},
-        'Orc': {'hp': 12, 'damage': '1d8', 'xp': 35}
-    }
-    
-    # Initialize or get current wave
-    if 'wave' not in session:
-        session['wave'] = 1
-        session['shield'] = 0  # For Magic Shield ability
-        session['dodge'] = 0   # For Evasion ability
-    
-    # Get or create session monsters with wave-based scaling
-    if 'monsters' not in session:
-        wave = session['wave']
-        available_monsters = list(base_monsters.keys())
-        session['monsters'] = []
-        for _ in range(4):
-            monster_name = random.choice(available_monsters)
-            base_monster = base_monsters[monster_name].copy()
-            scaled_hp = int(base_monster['hp'] * (1 + (wave - 1) * 0.5))
-            scaled_xp = int(base_monster['xp'] * (1 + (wave - 1) * 0.3))
-            session['monsters'].append({
-                'name': monster_name,
-                'hp': scaled_hp,
-                'max_hp': scaled_hp,
-                'damage': base_monster['damage'],
-                'xp': scaled_xp
-            })
-    
-    current_monsters = session['monsters']
+    key = encounter_key(character_id)
+    encounter = load_encounter(key)
+    current_monsters = encounter['monsters']
     living_monsters = [m for m in current_monsters if m['hp'] > 0]
+    before = combat_snapshot(character, current_monsters)
     
     # Check if all monsters are defeated before processing form
     if not living_monsters:
         # All monsters defeated - start new wave
-        session.pop('monsters', None)
-        session['wave'] = session.get('wave', 1) + 1
-        session['shield'] = 0
-        session['dodge'] = 0
-        
-        # Level up and increase stats
-        old_level = character.level
-        old_hp = character.max_hp
-        old_str = character.strength
-        
-        character.level += 1
-        character.max_hp = int(70 * (1 + (character.level - 1) * 0.2))
-        character.hp = character.max_hp
-        character.strength += 2
-        
-        db.session.commit()
+        level_up_message = clear_wave(character, encounter)
+        save_turn(character, flush=True)
+        encounter_store.set(key, encounter)
         
-        level_up_message = f"""Wave {session['wave'] - 1} completed! Level Up!
-        Level: {old_level} → {character.level}
-        Max HP: {old_hp} → {character.max_hp}
-        Strength: {old_str} → {character.strength}
-        You've been healed and enemies grow stronger!"""
-        
-        return render_template('combat.html', 
-                            character=character,
-                            monsters=[],  # Clear monsters for display
-                            wave=session['wave'] - 1,
-                            message=level_up_message,
-                            combat_over=True,
-                            form=form)
+        return render_combat(character, form, before,
+                             monsters=[],  # Clear monsters for display
+                             wave=encounter['wave'] - 1,
+                             message=level_up_message,
+                             combat_over=True)
     
     # Update target choices based on living monsters
-    form.target.choices = [(str(i), f"{m['name']} (HP: {m['hp']}/{m['max_hp']})") 
-                          for i, m in enumerate(current_monsters) if m['hp'] > 0]
+    form.target.choices = target_choices(current_monsters)
     
     if form.validate_on_submit():
-        action = form.action.data
-        message_parts = []
-        
-        # Handle abilities
-        if action == 'attack':
-            # Basic attack
-            target_idx = int(form.target.data)
-            base_damage = random.randint(1, 8)
-            strength_bonus = max(0, (character.strength - 10) // 2)
-            damage_dealt = base_damage + strength_bonus
-            current_monsters[target_idx]['hp'] -= damage_dealt
-            message_parts.append(f"You hit {current_monsters[target_idx]['name']} for {damage_dealt} damage!")
-        else:
-            ability = ABILITIES[action]
-            if ability['type'] == 'attack_all':
-                # AoE attack
-                for monster in current_monsters:
-                    if monster['hp'] > 0:
-                        monster['hp'] -= ability['damage']
-                message_parts.append(f"You use {action} and deal {ability['damage']} damage to all enemies!")
-            elif ability['type'] == 'attack_single':
-                # Single target attack
-                target_idx = int(form.target.data)
-                current_monsters[target_idx]['hp'] -= ability['damage']
-                message_parts.append(f"You use {action} and deal {ability['damage']} damage to {current_monsters[target_idx]['name']}!")
-            elif ability['type'] == 'heal':
-                # Healing ability
-                old_hp = character.hp
-                character.hp = min(character.hp + ability['heal'], character.max_hp)
-                message_parts.append(f"You use {action} and heal for {character.hp - old_hp} HP!")
-            elif ability['type'] == 'shield':
-                # Shield ability
-                session['shield'] = ability['shield']
-                message_parts.append(f"You use {action} and gain {ability['shield']} shield!")
-            elif ability['type'] == 'buff':
-                # Buff ability (like Evasion)
-                session['dodge'] = ability['dodge']
-                message_parts.append(f"You use {action} and gain increased dodge chance!")
-        
-        # Monster attacks
-        total_damage_taken = 0
-        for monster in living_monsters:
-            if monster['hp'] > 0:  # Only living monsters attack
-                # Check for dodge
-                if session.get('dodge', 0) > 0 and random.random() < session['dodge']:
-                    message_parts.append(f"You dodged {monster['name']}'s attack!")
-                    continue
-                
-                damage_dice = monster['damage'].split('d')
-                damage_taken = sum(random.randint(1, int(damage_dice[1])) 
-                                 for _ in range(int(damage_dice[0])))
-                
-                # Apply shield if available
-                if session.get('shield', 0) > 0:
-                    absorbed = min(session['shield'], damage_taken)
-                    session['shield'] -= absorbed
-                    damage_taken -= absorbed
-                    message_parts.append(f"Shield absorbed {absorbed} damage!")
-                
-                total_damage_taken += damage_taken
-                message_parts.append(f"{monster['name']} hits for {damage_taken}")
-        
-        character.hp -= total_damage_taken
-        
-        # Reset temporary buffs
-        session['shield'] = 0
-        session['dodge'] = 0
-        
-        # Update session
-        session['monsters'] = current_monsters
+        message_parts = resolve_turn(character, encounter, form.action.data, int(form.target.data))
         
         if character.hp <= 0:
-            character.hp = character.max_hp
-            session.pop('monsters', None)
-            session['wave'] = 1
-            db.session.commit()
-            return render_template('combat.html', 
-                                character=character,
-                                monsters=current_monsters,
-                                wave=session['wave'],
-                                message="You were defeated! But the gods have revived you. Starting from wave 1.",
-                                combat_over=True,
-                                form=form)
+            revive(character, encounter)
+            save_turn(character, flush=True)
+            encounter_store.set(key, encounter)
+            return render_combat(character, form, before,
+                                 monsters=current_monsters,
+                                 wave=encounter['wave'],
+                                 message="You were defeated! But the gods have revived you. Starting from wave 1.",
+                                 combat_over=True)
         
         # Create status message
         living_monster_count = sum(1 for m in current_monsters if m['hp'] > 0)
-        status = f"Wave {session['wave']}\n" + "\n".join(message_parts) + f"\nRemaining enemies: {living_monster_count}"
+        status = f"Wave {encounter['wave']}\n" + "\n".join(message_parts) + f"\nRemaining enemies: {living_monster_count}"
         
-        db.session.commit()
-        return render_template('combat.html', 
-                            character=character,
-                            monsters=current_monsters,
-                            wave=session['wave'],
-                            message=status,
-                            combat_over=False,
-                            form=form)
+        save_turn(character)
+        encounter_store.set(key, encounter)
+        form.target.choices = target_choices(current_monsters)
+        return render_combat(character, form, before,
+                             monsters=current_monsters,
+                             wave=encounter['wave'],
+                             message=status,
+                             combat_over=False)
     
+    if wants_delta():
+        return jsonify(errors=form.errors), 400
+
     # GET request - initial combat screen
     return render_template('combat.html', 
                          character=character,
-                         monsters=session.get('monsters', []),
-                         wave=session.get('wave', 1),
-                         message=f"Wave {session.get('wave', 1)} begins!",
+                         monsters=encounter.get('monsters', []),
+                         wave=encounter.get('wave', 1),
+                         message=f"Wave {encounter.get('wave', 1)} begins!",
                          combat_over=False,
                          form=form)
 
+def choose_auto_action(character, monsters):
+    """Auto-battle policy: heal when low, hit groups with area attacks, else focus the weakest monster"""
+    abilities = get_content().abilities
+    by_type = {}
+    for name in character.abilities or []:
+        if name in abilities:
+            by_type.setdefault(abilities[name]['type'], name)
+    living = [i for i, m in enumerate(monsters) if m['hp'] > 0]
+    target = min(living, key=lambda i: monsters[i]['hp'])
+    if 'heal' in by_type and character.hp * 3 < character.max_hp:
+        return by_type['heal'], target
+    if 'attack_all' in by_type and len(living) > 1:
+        return by_type['attack_all'], target
+    return by_type.get('attack_single', 'attack'), target
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/combat/<int:character_id>/auto', methods=['GET'])
+@login_required
+def auto_battle(character_id):
+    """Fight the rest of the wave on the server, streaming every turn as a Server-Sent Event
+
+    The character is committed once, when the wave is won or lost. EventSource
+    can only GET, so the page's CSRF token comes in the query string.
+    """
+    if app.config.get('WTF_CSRF_ENABLED', True):
+        try:
+            validate_csrf(request.args.get('csrf_token'))
+        except ValidationError:
+            return "Invalid CSRF token", 400
+    character = get_character_or_404(character_id)
+    if character.user_id != current_user.id:
+        return "Unauthorized", 403
+    # Resolve the key now: the session cookie is sent before the stream starts
+    key = encounter_key(character_id)
+    encounter = load_encounter(key)
+    max_turns = app.config['AUTO_BATTLE_MAX_TURNS']
+    delay = app.config['AUTO_BATTLE_TURN_DELAY']
+
+    def events():
+        start = combat_snapshot(character, encounter['monsters'])
+        monsters = encounter['monsters']
+        turns = 0
+        while character.hp > 0 and any(m['hp'] > 0 for m in monsters) and turns < max_turns:
+            before = combat_snapshot(character, monsters)
+            action, target = choose_auto_action(character, monsters)
+            lines = resolve_turn(character, encounter, action, target)
+            turns += 1
+            yield sse('turn', combat_delta(character, before, monsters, encounter['wave'],
+                                           f"Wave {encounter['wave']} - turn {turns}\n" + "\n".join(lines),
+                                           combat_over=False))
+            if delay:
+                time.sleep(delay)
+
+        wave = encounter['wave']
+        if character.hp <= 0:
+            revive(character, encounter)
+            outcome, message = 'defeat', "You were defeated! But the gods have revived you. Starting from wave 1."
+        elif not any(m['hp'] > 0 for m in monsters):
+            outcome, message = 'victory', clear_wave(character, encounter)
+        else:
+            outcome, message = 'unfinished', f"Wave {wave} is still going after {turns} turns."
+        try:
+            save_turn(character, flush=outcome != 'unfinished')
+        except StaleDataError:
+            db.session.rollback()
+            yield sse('failed', {'log': ["Your character was changed by another action, nothing was saved."]})
+            return
+        except WriteBehindBacklogged as e:
+            db.session.rollback()
+            app.logger.error("Refusing an auto-battle result: %s", e)
+            yield sse('failed', {'log': ["The server is behind on saving games, nothing was saved."]})
+            return
+        encounter_store.set(key, encounter)
+        done = combat_delta(character, start, [] if outcome == 'victory' else monsters, wave, message,
+                            combat_over=outcome != 'unfinished')
+        yield sse('done', dict(done, outcome=outcome, turns=turns))
+
+    return Response(stream_with_context(events()), content_type='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/admin/content/reload', methods=['POST'])
+@csrf.exempt
+def reload_game_content():
+    """Swap in edited data/ files without a restart; only accepted from localhost"""
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return "Forbidden", 403
+    try:
+        content = reload_content()
+    except ContentError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return jsonify({
+        "success": True,
+        "classes": len(content.classes),
+        "abilities": len(content.abilities),
+        "monsters": len(content.monsters),
+        "explore_events": len(content.explore_events),
+        "adventure_tiers": len(content.adventure_tiers)
+    })
+
+@app.route('/admin/cache/stats', methods=['GET'])
+def cache_stats():
+    """Cache hit/miss counters and password hashing pool usage; only served to localhost"""
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return "Forbidden", 403
+    stats = dict(identity_cache.stats(), turn_conflicts=conflict_stats, fragments=fragment_cache.stats(),
+                 password_hashing=password_hasher.stats())
+    if write_behind is not None:
+        stats['write_behind'] = write_behind.stats()
+    return jsonify(stats)
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus text exposition of the request metrics; only served to localhost"""
+    if metrics is None:
+        abort(404)
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return "Forbidden", 403
+    return Response(metrics.render(), content_type=request_metrics.CONTENT_TYPE)
+
 @app.route('/game_over', methods=['GET'])
 def game_over():
     new_health = session.get('new_health', '')
@@ -635,232 +953,77 @@ def gameplay():
         return redirect(url_for('play'))
 
     choice = session['choice']
-    outcomes = {
-        1: [
-            {'outcome_text': "You find a hidden treasure chest!", 'new_health': 100, 'new_gold': 500},
-            {'outcome_text': "You trip and fall, hurting yourself.", 'new_health': 50, 'new_gold': 200},
-            {'outcome_text': "You see a group of goblins approaching.", 'new_health': 0, 'new_gold': -100},
-            {'outcome_text': "You discover a secret door.", 'new_health': 75, 'new_gold': 300},
-            {'outcome_text': "You get lost in the forest.", 'new_health': 25, 'new_gold': 100},
-        ],
-        2: [
-            {'outcome_text': "You defeat the dragon and get its treasure!", 'new_health': 150, 'new_gold': 1000},
-            {'outcome_text': "You get hit by a dragon fireball!", 'new_health': 0, 'new_gold': -500},
-            {'outcome_text': "You find a dragon egg!", 'new_health': 100, 'new_gold': 300},
-            {'outcome_text': "You get caught by a dragon and are taken to its lair.", 'new_health': 50, 'new_gold': -200},
-            {'outcome_text': "You see a dragon flying overhead.", 'new_health': 75, 'new_gold': 200},
-        ],
-        3: [
-            {'outcome_text': "You find a potion of healing!", 'new_health': 150, 'new_gold': 200},
-            {'outcome_text': "You drink a potion that makes you sleepy.", 'new_health': 100, 'new_gold': 100},
-            {'outcome_text': "You see a group of skeletons approaching.", 'new_health': 0, 'new_gold': -200},
-            {'outcome_text': "You discover a hidden cave.", 'new_health': 125, 'new_gold': 400},
-            {'outcome_text': "You get hurt by a rockslide.", 'new_health': 0, 'new_gold': -100},
-        ],
-        4: [
-            {'outcome_text': "You defeat the giant spider and get its silk!", 'new_health': 175, 'new_gold': 500},
-            {'outcome_text': "You get caught by a giant spider.", 'new_health': 0, 'new_gold': -300},
-            {'outcome_text': "You see a group of orcs approaching.", 'new_health': 50, 'new_gold': -200},
-            {'outcome_text': "You discover a secret passage.", 'new_health': 125, 'new_gold': 200},
-            {'outcome_text': "You get hurt by a giant spider bite.", 'new_health': 0, 'new_gold': -100},
-        ],
-        5: [
-            {'outcome_text': "You defeat the undead necromancer and get his spellbook!", 'new_health': 200, 'new_gold': 1000},
-            {'outcome_text': "You get hit by a necromancer's spell.", 'new_health': 0, 'new_gold': -500},
-            {'outcome_text': "You see a group of ghouls approaching.", 'new_health': 75, 'new_gold': -200},
-            {'outcome_text': "You discover a hidden graveyard.", 'new_health': 125, 'new_gold': 300},
-            {'outcome_text': "You get hurt by a necromancer's minions.", 'new_health': 0, 'new_gold': -100},
-        ],
-        6: [
-            {'outcome_text': "You defeat the evil wizard and get his magic staff!", 'new_health': 225, 'new_gold': 1500},
-            {'outcome_text': "You get hit by a wizard's spell.", 'new_health': 0, 'new_gold': -800},
-            {'outcome_text': "You see a group of demons approaching.", 'new_health': 100, 'new_gold': -400},
-            {'outcome_text': "You discover a hidden laboratory.", 'new_health': 150, 'new_gold': 600},
-            {'outcome_text': "You get hurt by a wizard's minions.", 'new_health': 0, 'new_gold': -200},
-        ],
-        7: [
-            {'outcome_text': "You defeat the giant bear and get its fur!", 'new_health': 250, 'new_gold': 1200},
-            {'outcome_text': "You get caught by a giant bear.", 'new_health': 0, 'new_gold': -600},
-            {'outcome_text': "You see a group of elves approaching.", 'new_health': 125, 'new_gold': -300},
-            {'outcome_text': "You discover a hidden forest glade.", 'new_health': 175, 'new_gold': 500},
-            {'outcome_text': "You get hurt by a giant bear swipe.", 'new_health': 0, 'new_gold': -200},
-        ],
-        8: [
-            {'outcome_text': "You defeat the dragon and get its treasure!", 'new_health': 275, 'new_gold': 1500},
-            {'outcome_text': "You get hit by a dragon fireball!", 'new_health': 0, 'new_gold': -1000},
-            {'outcome_text': "You see a group of dwarves approaching.", 'new_health': 150, 'new_gold': -400},
-            {'outcome_text': "You discover a hidden mine.", 'new_health': 200, 'new_gold': 600},
-            {'outcome_text': "You get hurt by a dragon claw.", 'new_health': 0, 'new_gold': -300},
-        ],
-        9: [
-            {'outcome_text': "You defeat the giant and get its club!", 'new_health': 300, 'new_gold': 1800},
-            {'outcome_text': "You get caught by a giant.", 'new_health': 0, 'new_gold': -1200},
-            {'outcome_text': "You see a group of goblins approaching.", 'new_health': 175, 'new_gold': -500},
-            {'outcome_text': "You discover a hidden cave-in.", 'new_health': 225, 'new_gold': 700},
-            {'outcome_text': "You get hurt by a giant fist.", 'new_health': 0, 'new_gold': -400},
-        ],
-        10: [
-            {'outcome_text': "You defeat the evil sorceress and get her magical staff!", 'new_health': 350, 'new_gold': 2200},
-            {'outcome_text': "You get hit by a sorceress's spell.", 'new_health': 0, 'new_gold': -2000},
-            {'outcome_text': "You see a group of demons approaching.", 'new_health': 200, 'new_gold': -1000},
-            {'outcome_text': "You discover a hidden laboratory.", 'new_health': 250, 'new_gold': 800},
-            {'outcome_text': "You get hurt by a sorceress's minions.", 'new_health': 0, 'new_gold': -800},
-        ],
-        11: [
-            {'outcome_text': "You defeat the giant spider and get its silk!", 'new_health': 375, 'new_gold': 2500},
-            {'outcome_text': "You get caught by a giant spider.", 'new_health': 0, 'new_gold': -2500},
-            {'outcome_text': "You see a group of orcs approaching.", 'new_health': 225, 'new_gold': -1500},
-            {'outcome_text': "You discover a secret passage.", 'new_health': 275, 'new_gold': 1000},
-            {'outcome_text': "You get hurt by a giant spider bite.", 'new_health': 0, 'new_gold': -1500},
-        ],
-        12: [
-            {'outcome_text': "You defeat the undead necromancer and get his spellbook!", 'new_health': 400, 'new_gold': 2800},
-            {'outcome_text': "You get hit by a necromancer's spell.", 'new_health': 0, 'new_gold': -3000},
-            {'outcome_text': "You see a group of ghouls approaching.", 'new_health': 250, 'new_gold': -2000},
-            {'outcome_text': "You discover a hidden graveyard.", 'new_health': 300, 'new_gold': 1200},
-            {'outcome_text': "You get hurt by a necromancer's minions.", 'new_health': 0, 'new_gold': -2000},
-        ],
-        13: [
-            {'outcome_text': "You defeat the evil wizard and get his magic staff!", 'new_health': 425, 'new_gold': 3200},
-            {'outcome_text': "You get hit by a wizard's spell.", 'new_health': 0, 'new_gold': -3800},
-            {'outcome_text': "You see a group of demons approaching.", 'new_health': 275, 'new_gold': -2800},
-            {'outcome_text': "You discover a hidden laboratory.", 'new_health': 325, 'new_gold': 1600},
-            {'outcome_text': "You get hurt by a wizard's minions.", 'new_health': 0, 'new_gold': -2800},
-        ],
-        14: [
-            {'outcome_text': "You defeat the giant bear and get its fur!", 'new_health': 450, 'new_gold': 3500},
-            {'outcome_text': "You get caught by a giant bear.", 'new_health': 0, 'new_gold': -4000},
-            {'outcome_text': "You see a group of elves approaching.", 'new_health': 300, 'new_gold': -3200},
-            {'outcome_text': "You discover a hidden forest glade.", 'new_health': 350, 'new_gold': 1800},
-            {'outcome_text': "You get hurt by a giant bear swipe.", 'new_health': 0, 'new_gold': -3200},
-        ],
-        15: [
-            {'outcome_text': "You defeat the dragon and get its treasure!", 'new_health': 475, 'new_gold': 4000},
-            {'outcome_text': "You get hit by a dragon fireball!", 'new_health': 0, 'new_gold': -4500},
-            {'outcome_text': "You see a group of dwarves approaching.", 'new_health': 325, 'new_gold': -3800},
-            {'outcome_text': "You discover a hidden mine.", 'new_health': 375, 'new_gold': 2200},
-            {'outcome_text': "You get hurt by a dragon claw.", 'new_health': 0, 'new_gold': -3800},
-        ],
-        16: [
-            {'outcome_text': "You defeat the giant and get its club!", 'new_health': 500, 'new_gold': 4400},
-            {'outcome_text': "You get caught by a giant.", 'new_health': 0, 'new_gold': -5400},
-            {'outcome_text': "You see a group of goblins approaching.", 'new_health': 350, 'new_gold': -4800},
-            {'outcome_text': "You discover a hidden cave-in.", 'new_health': 400, 'new_gold': 2800},
-            {'outcome_text': "You get hurt by a giant fist.", 'new_health': 0, 'new_gold': -4800},
-        ],
-        17: [
-            {'outcome_text': "You defeat the evil sorceress and get her magical staff!", 'new_health': 525, 'new_gold': 4800},
-            {'outcome_text': "You get hit by a sorceress's spell.", 'new_health': 0, 'new_gold': -5200},
-            {'outcome_text': "You see a group of demons approaching.", 'new_health': 375, 'new_gold': -5200},
-            {'outcome_text': "You discover a hidden laboratory.", 'new_health': 425, 'new_gold': 3200},
-            {'outcome_text': "You get hurt by a sorceress's minions.", 'new_health': 0, 'new_gold': -5200},
-        ],
-        18: [
-            {'outcome_text': "You defeat the giant spider and get its silk!", 'new_health': 550, 'new_gold': 5200},
-            {'outcome_text': "You get caught by a giant spider.", 'new_health': 0, 'new_gold': -6200},
-            {'outcome_text': "You see a group of orcs approaching.", 'new_health': 400, 'new_gold': -6000},
-            {'outcome_text': "You discover a secret passage.", 'new_health': 450, 'new_gold': 4400},
-            {'outcome_text': "You get hurt by a giant spider bite.", 'new_health': 0, 'new_gold': -6000},
-        ],
-        19: [
-            {'outcome_text': "You defeat the undead necromancer and get his spellbook!", 'new_health': 575, 'new_gold': 5600},
-            {'outcome_text': "You get hit by a necromancer's spell.", 'new_health': 0, 'new_gold': -6000},
-            {'outcome_text': "You see a group of ghouls approaching.", 'new_health': 425, 'new_gold': -5600},
-            {'outcome_text': "You discover a hidden graveyard.", 'new_health': 475, 'new_gold': 4800},
-            {'outcome_text': "You get hurt by a necromancer's minions.", 'new_health': 0, 'new_gold': -5600},
-        ],
-        20: [
-            {'outcome_text': "You defeat the evil wizard and get his magic staff!", 'new_health': 600, 'new_gold': 6000},
-            {'outcome_text': "You get hit by a wizard's spell.", 'new_health': 0, 'new_gold': -6400},
-            {'outcome_text': "You see a group of demons approaching.", 'new_health': 450, 'new_gold': -6400},
-            {'outcome_text': "You discover a hidden laboratory.", 'new_health': 500, 'new_gold': 5600},
-            {'outcome_text': "You get hurt by a wizard's minions.", 'new_health': 0, 'new_gold': -6400},
-        ],
-        21: [
-            {'outcome_text': "You defeat the giant bear and get its fur!", 'new_health': 625, 'new_gold': 6600},
-            {'outcome_text': "You get caught by a giant bear.", 'new_health': 0, 'new_gold': -7200},
-            {'outcome_text': "You see a group of elves approaching.", 'new_health': 475, 'new_gold': -6800},
-            {'outcome_text': "You discover a hidden forest glade.", 'new_health': 525, 'new_gold': 6400},
-            {'outcome_text': "You get hurt by a giant bear swipe.", 'new_health': 0, 'new_gold': -6800},
-        ],
-        22: [
-            {'outcome_text': "You defeat the dragon and get its treasure!", 'new_health': 650, 'new_gold': 7000},
-            {'outcome_text': "You get hit by a dragon fireball!", 'new_health': 0, 'new_gold': -7600},
-            {'outcome_text': "You see a group of dwarves approaching.", 'new_health': 500, 'new_gold': -7200},
-            {'outcome_text': "You discover a hidden mine.", 'new_health': 550, 'new_gold': 6800},
-            {'outcome_text': "You get hurt by a dragon claw.", 'new_health': 0, 'new_gold': -7200},
-        ],
-        23: [
-            {'outcome_text': "You defeat the giant and get its club!", 'new_health': 675, 'new_gold': 7600},
-            {'outcome_text': "You get caught by a giant.", 'new_health': 0, 'new_gold': -8800},
-            {'outcome_text': "You see a group of goblins approaching.", 'new_health': 525, 'new_gold': -8000},
-            {'outcome_text': "You discover a hidden cave-in.", 'new_health': 575, 'new_gold': 7800},
-            {'outcome_text': "You get hurt by a giant fist.", 'new_health': 0, 'new_gold': -8000},
-        ],
-        24: [
-            {'outcome_text': "You defeat the evil sorceress and get her magical staff!", 'new_health': 700, 'new_gold': 8200},
-            {'outcome_text': "You get hit by a sorceress's spell.", 'new_health': 0, 'new_gold': -9200},
-            {'outcome_text': "You see a group of demons approaching.", 'new_health': 550, 'new_gold': -9200},
-            {'outcome_text': "You discover a hidden laboratory.", 'new_health': 600, 'new_gold': 8800},
-            {'outcome_text': "You get hurt by a sorceress's minions.", 'new_health': 0, 'new_gold': -9200},
-        ],
-        25: [
-            {'outcome_text': "You defeat the giant spider and get its silk!", 'new_health': 725, 'new_gold': 8800},
-            {'outcome_text': "You get caught by a giant spider.", 'new_health': 0, 'new_gold': -10000},
-            {'outcome_text': "You see a group of orcs approaching.", 'new_health': 575, 'new_gold': -9000},
-            {'outcome_text': "You discover a secret passage.", 'new_health': 625, 'new_gold': 8200},
-            {'outcome_text': "You get hurt by a giant spider bite.", 'new_health': 0, 'new_gold': -9000},
-        ],
-        26: [
-            {'outcome_text': "You defeat the undead necromancer and get his spellbook!", 'new_health': 750, 'new_gold': 9400},
-            {'outcome_text': "You get hit by a necromancer's spell.", 'new_health': 0, 'new_gold': -10400},
-            {'outcome_text': "You see a group of ghouls approaching.", 'new_health': 600, 'new_gold': -10400},
-            {'outcome_text': "You discover a hidden graveyard.", 'new_health': 650, 'new_gold': 9200},
-            {'outcome_text': "You get hurt by a necromancer's minions.", 'new_health': 0, 'new_gold': -10400},
-        ],
-        27: [
-            {'outcome_text': "You defeat the evil wizard and get his magic staff!", 'new_health': 775, 'new_gold': 10200},
-            {'outcome_text': "You get hit by a wizard's spell.", 'new_health': 0, 'new_gold': -11200},
-            {'outcome_text': "You see a group of demons approaching.", 'new_health': 625, 'new_gold': -11200},
-            {'outcome_text': "You discover a hidden laboratory.", 'new_health': 675, 'new_gold': 10200},
-            {'outcome_text': "You get hurt by a wizard's minions.", 'new_health': 0, 'new_gold': -11200},
-        ],
-        28: [
-            {'outcome_text': "You defeat the giant bear and get its fur!", 'new_health': 800, 'new_gold': 11400},
-            {'outcome_text': "You get caught by a giant bear.", 'new_health': 0, 'new_gold': -13400},
-            {'outcome_text': "You see a group of elves approaching.", 'new_health': 650, 'new_gold': -13400},
-            {'outcome_text': "You discover a hidden forest glade.", 'new_health': 700, 'new_gold': 11400},
-            {'outcome_text': "You get hurt by a giant bear swipe.", 'new_health': 0, 'new_gold': -13400},
-        ],
-        29: [
-            {'outcome_text': "You defeat the dragon and get its treasure!", 'new_health': 825, 'new_gold': 12600},
-            {'outcome_text': "You get hit by a dragon fireball!", 'new_health': 0, 'new_gold': -15600},
-            {'outcome_text': "You see a group of dwarves approaching.", 'new_health': 675, 'new_gold': -15600},
-            {'outcome_text': "You discover a hidden mine.", 'new_health': 725, 'new_gold': 12600},
-            {'outcome_text': "You get hurt by a dragon claw.", 'new_health': 0, 'new_gold': -15600},
-        ],
-        30: [
-            {'outcome_text': "You defeat the giant and get its club!", 'new_health': 850, 'new_gold': 14000},
-            {'outcome_text': "You get caught by a giant.", 'new_health': 0, 'new_gold': -17000},
-            {'outcome_text': "You see a group of goblins approaching.", 'new_health': 700, 'new_gold': -17000},
-            {'outcome_text': "You discover a hidden cave-in.", 'new_health': 750, 'new_gold': 14000},
-            {'outcome_text': "You get hurt by a giant fist.", 'new_health': 0, 'new_gold': -17000},
-        ],
-    }
-
-    outcomes_choice = outcomes.get(choice)
+    outcomes_choice = get_content().adventure_samplers.get(choice)
     if not outcomes_choice:
         return "Invalid choice", 400
 
-    outcome = random.choice(outcomes_choice)
+    outcome = outcomes_choice.sample()
     session['new_health'] = outcome['new_health']
     session['new_gold'] = outcome['new_gold']
     session['outcome_text'] = outcome['outcome_text']
 
     return redirect(url_for('game_over'))
 
+@app.cli.command('precompile-templates')
+def precompile_templates_command():
+    """Fill the Jinja bytecode cache so new workers skip template compilation"""
+    print(f"Compiled {precompile_templates(app)} templates")
+
+characters_cli = AppGroup('characters', help='Bulk fixes to every character, in resumable chunks.')
+app.cli.add_command(characters_cli)
+
+def maintenance_options(command):
+    """--chunk-size, --pause and --restart, shared by the characters commands"""
+    command = click.option('--restart', is_flag=True,
+                           help='Start over instead of resuming; also reruns a finished job.')(command)
+    command = click.option('--pause', type=float, default=maintenance.DEFAULT_PAUSE, show_default=True,
+                           help='Seconds to wait between chunks so players can write.')(command)
+    return click.option('--chunk-size', type=click.IntRange(min=1), default=maintenance.DEFAULT_CHUNK_SIZE,
+                        show_default=True, help='Character ids per transaction.')(command)
+
+def run_maintenance(job, apply_range, chunk_size, pause, restart):
+    """Run a maintenance job over the character table with a progress bar"""
+    characters = Character.__table__
+    with click.progressbar(length=1, label=job, show_pos=True) as bar:
+        def progress(done_id, end_id, rows):
+            bar.length = max(end_id, 1)
+            bar.update(done_id - bar.pos)
+            bar.label = f'{job}: {rows} updated'
+
+        try:
+            rows = maintenance.run_chunked(db.engine, characters, job, apply_range, chunk_size=chunk_size,
+                                           pause=pause, restart=restart, progress=progress)
+        except maintenance.JobFinished:
+            click.echo(f"{job} already finished; pass --restart to run it again")
+            return
+    click.echo(f"{job}: {rows} characters updated")
+
+@characters_cli.command('rest')
+@maintenance_options
+def rest_characters_command(chunk_size, pause, restart):
+    """Heal every character to full HP"""
+    run_maintenance(maintenance.job_name('rest'), maintenance.rest_range(Character.__table__),
+                    chunk_size, pause, restart)
+
+@characters_cli.command('recompute-max-hp')
+@maintenance_options
+def recompute_max_hp_command(chunk_size, pause, restart):
+    """Reset max HP above level 1 to the current wave-clear formula"""
+    run_maintenance(maintenance.job_name('recompute-max-hp'),
+                    maintenance.recompute_max_hp_range(Character.__table__), chunk_size, pause, restart)
+
+@characters_cli.command('level-up')
+@click.option('--min-xp', type=int, required=True, help='Level up characters with at least this much experience.')
+@maintenance_options
+def level_up_characters_command(min_xp, chunk_size, pause, restart):
+    """Apply Character.level_up to every character with at least --min-xp experience"""
+    run_maintenance(maintenance.job_name('level-up', min_xp=min_xp),
+                    maintenance.level_up_range(Character.__table__, min_xp), chunk_size, pause, restart)
+
 with app.app_context():
-    db.create_all()
+    # A database stamped at the newest migration already has every table
+    if not schema_is_current(db.engine):
+        db.create_all()
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))  # Default to 5000 if not set
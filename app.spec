@@ -5,7 +5,7 @@ a = Analysis(
     ['app.py'],
     pathex=[],
     binaries=[],
-    datas=[('templates', 'templates'), ('static', 'static'), ('app/models', 'app/models')],
+    datas=[('templates', 'templates'), ('static', 'static'), ('data', 'data'), ('app/models', 'app/models')],
     hiddenimports=['flask_sqlalchemy'],
     hookspath=[],
     hooksconfig={},
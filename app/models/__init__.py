@@ -1,4 +1,3 @@
 from .user_model import User
 from .character_model import Character
-from .game_model import Game
-from .player_model import Player
\ No newline at end of file
+from .game_model import Game, GameStateDelta
@@ -1,5 +1,11 @@
 from .. import db
-from datetime import datetime
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+
+from content import get_content
+from idle import IDLE_MAX_SECONDS, IDLE_TICK_SECONDS, idle_rates, offline_rewards
+from state_log import COMPACT_EVERY, apply_patch, clone, diff, encode, replay
 
 class Game(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -7,17 +13,101 @@ class Game(db.Model):
     active_character_id = db.Column(db.Integer, db.ForeignKey('character.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_played = db.Column(db.DateTime, default=datetime.utcnow)
-    game_state = db.Column(db.JSON, default=dict)  # Store current game state
+    game_state = db.Column(db.JSON, default=dict)  # State from before the delta log; read once, never written
     is_completed = db.Column(db.Boolean, default=False)
+    # Last GameStateDelta written for this game, and the newest snapshot among them
+    state_seq = db.Column(db.Integer, default=0, nullable=False)
+    snapshot_seq = db.Column(db.Integer, default=0, nullable=False)
     
-    characters = db.relationship('Character', backref='game', lazy=True)
+    # Character.game_id, not active_character_id, which points the other way
+    characters = db.relationship('Character', backref='game', lazy=True, foreign_keys='Character.game_id')
 
     def update_last_played(self):
         self.last_played = datetime.utcnow()
 
+    def apply_offline_progress(self, character, now=None, rng=None):
+        """Grant what character earned since last_played (see idle.py); the caller commits
+
+        The app.py counterpart is credit_offline_progress, run when a game page opens.
+        """
+        now = now or datetime.utcnow()
+        seconds = (now - self.last_played).total_seconds()
+        rewards = offline_rewards(seconds, idle_rates(get_content()), rng=rng)
+        if rewards['ticks']:
+            character.experience = (character.experience or 0) + rewards['xp']
+            while character.experience >= character.level * 1000:
+                character.level_up()
+            loot = [name for name, count in rewards['loot'].items() for _ in range(count)]
+            character.inventory = list(character.inventory or []) + loot
+            # Characters in this model have no gold column; the game keeps the purse
+            state = self.load_game_state()
+            state['gold'] = state.get('gold', 0) + rewards['gold']
+            self.save_game_state(state)
+        if seconds >= IDLE_MAX_SECONDS:
+            self.last_played = now  # time past the cap is not earned
+        else:
+            # Only whole ticks are paid; the remainder counts towards the next check-in
+            self.last_played += timedelta(seconds=rewards['ticks'] * IDLE_TICK_SECONDS)
+        return rewards
+
+    def load_game_state(self):
+        """Current state: the newest snapshot plus the patches saved after it"""
+        return clone(self._current_state())
+
+    def _current_state(self):
+        # Cached per instance, tagged with its seq so a rolled-back save is not trusted
+        cached = getattr(self, '_state', None)
+        if cached is not None and cached[0] == self.state_seq:
+            return cached[1]
+        if not self.state_seq:
+            state = clone(self.game_state or {})
+        else:
+            rows = db.session.execute(
+                select(GameStateDelta.is_snapshot, GameStateDelta.payload)
+                .where(GameStateDelta.game_id == self.id, GameStateDelta.seq >= self.snapshot_seq)
+                .order_by(GameStateDelta.seq)
+            ).all()
+            state = replay(rows)
+        self._state = (self.state_seq, state)
+        return state
+
     def save_game_state(self, state):
-        self.game_state = state
+        """Append what changed since the last save; every COMPACT_EVERY saves write a full snapshot"""
+        if self.id is None:
+            db.session.add(self)
+            db.session.flush()
+        previous = self._current_state()
+        seq = (self.state_seq or 0) + 1
+        if not self.state_seq or seq - (self.snapshot_seq or 0) >= COMPACT_EVERY:
+            db.session.add(GameStateDelta(game_id=self.id, seq=seq, is_snapshot=True, payload=encode(state)))
+            # The snapshot supersedes everything before it
+            db.session.execute(delete(GameStateDelta).where(GameStateDelta.game_id == self.id,
+                                                            GameStateDelta.seq < seq))
+            self.snapshot_seq = seq
+            current = clone(state)
+        else:
+            ops = diff(previous, state)
+            if not ops:
+                self.update_last_played()
+                return
+            db.session.add(GameStateDelta(game_id=self.id, seq=seq, is_snapshot=False, payload=encode(ops)))
+            # Patch the cached copy rather than copying the whole new state
+            current = apply_patch(previous, clone(ops), in_place=True)
+        self.state_seq = seq
+        self._state = (seq, current)
         self.update_last_played()
 
     def __repr__(self):
-        return f'<Game {self.id}>'
\ No newline at end of file
+        return f'<Game {self.id}>'
+
+
+class GameStateDelta(db.Model):
+    """One saved change to a game's state: a full snapshot or a JSON patch, zlib-compressed"""
+    __tablename__ = 'game_state_delta'
+    game_id = db.Column(db.Integer, db.ForeignKey('game.id'), primary_key=True)
+    seq = db.Column(db.Integer, primary_key=True)
+    is_snapshot = db.Column(db.Boolean, nullable=False, default=False)
+    payload = db.Column(db.LargeBinary, nullable=False)
+
+    def __repr__(self):
+        return f'<GameStateDelta {self.game_id}:{self.seq}>'
@@ -0,0 +1,57 @@
+# -*- mode: python ; coding: utf-8 -*-
+# Unpacked ("onedir") build that starts faster than app.spec's onefile EXE:
+# nothing is extracted to a temp dir on launch, modules are stored as .pyc
+# compiled with optimize=2, and the Jinja bytecode plus a migrated empty
+# database are prebuilt. Run build_bundle.py rather than this spec directly,
+# it creates build/bundle_assets first.
+
+
+a = Analysis(
+    ['app.py'],
+    pathex=[],
+    binaries=[],
+    datas=[
+        ('templates', 'templates'),
+        ('static', 'static'),
+        ('data', 'data'),
+        ('migrations/versions', 'migrations/versions'),
+        ('build/bundle_assets/db_template', 'db_template'),
+        ('build/bundle_assets/jinja_cache', 'jinja_cache'),
+    ],
+    hiddenimports=['flask_sqlalchemy'],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    # Only the flask CLI and the simulator use these
+    excludes=['alembic', 'flask_migrate', 'numpy'],
+    noarchive=True,
+    optimize=2,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='app',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=True,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+)
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='app_bundle',
+)
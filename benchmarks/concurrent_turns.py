@@ -0,0 +1,106 @@
+"""Fire concurrent explore turns at one character and check for lost updates.
+
+    python benchmarks/concurrent_turns.py --threads 8 --turns 50
+
+Each thread logs in with its own test client and posts explore actions for
+the same character. Every response that reports "Gold: +N" must show up in
+the final gold total; with optimistic locking on Character.version a racing
+turn is retried (or answered with 409) instead of silently overwriting the
+other turn's write.
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmpdir = tempfile.mkdtemp(prefix='bench-concurrent-')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_tmpdir, 'bench.db'))
+os.environ.setdefault('ENCOUNTER_STORE', 'memory')
+
+import app as game_app  # noqa: E402
+
+GOLD_RE = re.compile(r'Gold: \+(\d+)')
+
+
+def login(app, username):
+    client = app.test_client()
+    client.post('/login', data={'username': username, 'password': 'secret1'})
+    return client
+
+
+def worker(client, character_id, turns, results, lock):
+    ok = conflicts = errors = gold = 0
+    for _ in range(turns):
+        response = client.post(f'/game/{character_id}', data={'action': 'explore'})
+        if response.status_code == 200:
+            ok += 1
+            gold += sum(int(n) for n in GOLD_RE.findall(response.get_data(as_text=True)))
+        elif response.status_code == 409:
+            conflicts += 1
+        else:
+            errors += 1
+    with lock:
+        results['ok'] += ok
+        results['409'] += conflicts
+        results['errors'] += errors
+        results['gold'] += gold
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--turns', type=int, default=50, help='turns per thread')
+    args = parser.parse_args(argv)
+
+    app = game_app.app
+    app.config['WTF_CSRF_ENABLED'] = False
+    setup = app.test_client()
+    setup.post('/register', data={'username': 'racer', 'password': 'secret1', 'confirm_password': 'secret1'})
+    setup.post('/login', data={'username': 'racer', 'password': 'secret1'})
+    setup.post('/character/create', data={'name': 'Racer', 'char_class': 'warrior'})
+    with app.app_context():
+        character = game_app.Character.query.filter_by(name='Racer').first()
+        character_id, start_gold, start_version = character.id, character.gold, character.version
+
+    clients = [login(app, 'racer') for _ in range(args.threads)]
+    results = {'ok': 0, '409': 0, 'errors': 0, 'gold': 0}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=worker, args=(client, character_id, args.turns, results, lock))
+        for client in clients
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    if game_app.write_behind is not None:
+        # Buffered turns are not in the row until they are flushed
+        game_app.write_behind.flush()
+    with app.app_context():
+        character = game_app.db.session.get(game_app.Character, character_id)
+        gold_delta = character.gold - start_gold
+        version_delta = character.version - start_version
+
+    total = args.threads * args.turns
+    print(f"turns         {total} ({args.threads} threads x {args.turns})")
+    print(f"succeeded     {results['ok']}")
+    print(f"409 conflict  {results['409']}")
+    print(f"other errors  {results['errors']}")
+    print(f"retries       {game_app.conflict_stats['conflicts']}")
+    print(f"gold reported {results['gold']}, gold stored {gold_delta}, "
+          f"lost updates {results['gold'] - gold_delta}")
+    print(f"version bumps {version_delta}")
+    print(f"turns/sec     {total / elapsed:.0f}")
+
+
+if __name__ == '__main__':
+    main()
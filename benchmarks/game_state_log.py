@@ -0,0 +1,174 @@
+"""Bytes written per save and load latency: full game_state overwrite vs the delta log.
+
+    python benchmarks/game_state_log.py
+    python benchmarks/game_state_log.py --saves 2000 --inventory 300 --map 2000
+
+Plays --saves autosaves of a synthetic game state (character sheet,
+inventory, explored map, quest flags, a bounded message log) that changes a
+little between saves, through the Game model in app/models. "full" assigns
+the whole state to Game.game_state each time, as Game.save_game_state used
+to; "delta" calls Game.save_game_state, which appends compressed JSON
+patches with a snapshot every state_log.COMPACT_EVERY saves. Loads read the
+game back from a fresh session with Game.load_game_state. Both run against
+a temporary SQLite file.
+"""
+import argparse
+import importlib
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import types
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func, select
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from state_log import COMPACT_EVERY, clone  # noqa: E402
+
+
+def load_models():
+    """(package, app/models) with the ``db`` the model modules import from their parent
+
+    app/ has no __init__.py (it would shadow app.py), so the models are
+    loaded as a subpackage of a stand-in package that provides it.
+    """
+    name = 'game_state_log_models'
+    if name not in sys.modules:
+        package = types.ModuleType(name)
+        package.__path__ = [os.path.join(ROOT, 'app')]
+        package.db = SQLAlchemy()
+        sys.modules[name] = package
+    return sys.modules[name], importlib.import_module(name + '.models')
+
+
+def initial_state(rng, inventory, map_cells):
+    return {
+        'character': {'name': 'Hero', 'level': 5, 'hp': 80, 'max_hp': 80, 'gold': 250, 'experience': 4200},
+        'position': [0, 0],
+        'inventory': [{'name': f'Item {i}', 'quantity': rng.randint(1, 5)} for i in range(inventory)],
+        'explored': {f'{x},{y}': True for x in range(int(map_cells ** 0.5)) for y in range(int(map_cells ** 0.5))},
+        'quests': {f'quest_{i}': {'stage': rng.randint(0, 4), 'done': False} for i in range(50)},
+        'log': [f'Turn {i}: nothing happened' for i in range(50)],
+    }
+
+
+def play_turn(state, rng, turn):
+    """A few small changes, like one turn of play between two autosaves"""
+    state['character']['hp'] = max(1, state['character']['hp'] - rng.randint(-5, 8))
+    state['character']['gold'] += rng.randint(0, 20)
+    state['position'] = [state['position'][0] + rng.choice((-1, 0, 1)), state['position'][1] + rng.choice((-1, 0, 1))]
+    state['explored'][f"{state['position'][0]},{state['position'][1]}"] = True
+    if rng.random() < 0.2:
+        state['inventory'].append({'name': f'Loot {turn}', 'quantity': 1})
+    if rng.random() < 0.3:
+        state['inventory'][rng.randrange(len(state['inventory']))]['quantity'] += 1
+    if rng.random() < 0.1:
+        state['quests'][f'quest_{rng.randrange(50)}']['stage'] += 1
+    state['log'] = state['log'][1:] + [f'Turn {turn}: you walk on']
+
+
+class FullStore:
+    """The old behaviour: every save rewrites the whole JSON column"""
+
+    def __init__(self, db, models, game_id):
+        self.db, self.models, self.game_id = db, models, game_id
+        self.game = db.session.get(models.Game, game_id)
+
+    def save(self, state):
+        self.game.game_state = clone(state)
+        self.db.session.commit()
+
+    def written(self, state):
+        return len(json.dumps(state))
+
+    def load(self):
+        self.db.session.expunge_all()
+        self.game = self.db.session.get(self.models.Game, self.game_id)
+        return self.game.game_state
+
+
+class DeltaStore(FullStore):
+    """Game.save_game_state/load_game_state"""
+
+    def save(self, state):
+        self.game.save_game_state(state)
+        self.db.session.commit()
+
+    def written(self, state):
+        delta = self.models.GameStateDelta
+        return self.db.session.scalar(
+            select(func.length(delta.payload)).where(delta.game_id == self.game_id, delta.seq == self.game.state_seq))
+
+    def load(self):
+        super().load()
+        return self.game.load_game_state()
+
+
+def run(store_class, args):
+    package, models = load_models()
+    db = package.db
+    rng = random.Random(args.seed)
+    path = os.path.join(tempfile.mkdtemp(prefix='state-log-'), 'bench.db')
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+    db.init_app(app)
+    state = initial_state(rng, args.inventory, args.map)
+    written, save_times, load_times = [], [], []
+    with app.app_context():
+        db.create_all()
+        user = models.User(username='bench')
+        db.session.add(user)
+        db.session.flush()
+        game = models.Game(user_id=user.id, game_state={})
+        db.session.add(game)
+        db.session.commit()
+        store = store_class(db, models, game.id)
+        for turn in range(args.saves):
+            play_turn(state, rng, turn)
+            started = time.perf_counter()
+            store.save(state)
+            save_times.append(time.perf_counter() - started)
+            written.append(store.written(state))
+            if turn % args.load_every == 0:
+                started = time.perf_counter()
+                loaded = store.load()
+                load_times.append(time.perf_counter() - started)
+                if loaded != state:
+                    raise AssertionError(f'{store_class.__name__} loaded a different state at save {turn}')
+        db.session.remove()
+        db.engine.dispose()
+    return {
+        'bytes_per_save': statistics.mean(written),
+        'save_ms': statistics.median(save_times) * 1000,
+        'load_ms': statistics.median(load_times) * 1000,
+        'file_kb': os.path.getsize(path) / 1024,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--saves', type=int, default=1000)
+    parser.add_argument('--inventory', type=int, default=100, help='items in the starting inventory')
+    parser.add_argument('--map', type=int, default=900, help='explored map cells to start with')
+    parser.add_argument('--load-every', type=int, default=10, help='time a load every N saves')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    print(f"{args.saves} saves, state of {len(json.dumps(initial_state(random.Random(0), args.inventory, args.map)))} "
+          f"bytes, snapshot every {COMPACT_EVERY} saves")
+    print(f"{'store':<6} {'bytes/save':>11} {'save ms':>8} {'load ms':>8} {'db KB':>8}")
+    for name, store_class in (('full', FullStore), ('delta', DeltaStore)):
+        row = run(store_class, args)
+        print(f"{name:<6} {row['bytes_per_save']:>11.0f} {row['save_ms']:>8.3f} {row['load_ms']:>8.3f} "
+              f"{row['file_kb']:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
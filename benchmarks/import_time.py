@@ -0,0 +1,122 @@
+"""Measure how long `import app` takes and fail when startup regresses.
+
+    python benchmarks/import_time.py                # check against the baseline
+    python benchmarks/import_time.py --update       # record a new baseline
+
+Each run imports app.py in a fresh interpreter with ``-X importtime`` against
+a copy of instance/dnd_game.db, and imports the app's framework dependencies
+on their own as a reference. Absolute times depend on the machine, so the
+check uses app time / reference time. The median ratio is compared with
+benchmarks/import_time_baseline.json, which the first run on a machine writes
+and which is not committed. The check fails (exit status 1) if the ratio is
+more than --tolerance higher, or if a module that should only load on demand
+(Alembic, NumPy) was imported.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, 'benchmarks', 'import_time_baseline.json')
+
+# Modules the web app must not import at startup
+LAZY_MODULES = ('alembic', 'flask_migrate', 'numpy')
+# Imported alone to measure how fast this machine imports
+REFERENCE_MODULES = ('flask', 'flask_sqlalchemy', 'flask_login', 'flask_wtf', 'sqlalchemy')
+
+_LINE_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def import_once(database_url, code='import app', top_level_only=False):
+    """{module: cumulative us}; top_level_only keeps the modules the code imported itself"""
+    env = dict(os.environ, DATABASE_URL=database_url, ENCOUNTER_STORE='memory')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match and not (top_level_only and len(match[3]) > 1):
+            modules[match[4]] = int(match[2])
+    return modules
+
+
+def reference_us(database_url):
+    """Time to import the reference modules; each is counted once, even if another imported it first"""
+    modules = import_once(database_url, 'import ' + ', '.join(REFERENCE_MODULES), top_level_only=True)
+    return sum(modules.get(name, 0) for name in REFERENCE_MODULES)
+
+
+def measure(runs):
+    tmpdir = tempfile.mkdtemp(prefix='bench-import-')
+    try:
+        path = os.path.join(tmpdir, 'dnd_game.db')
+        shutil.copy(os.path.join(ROOT, 'instance', 'dnd_game.db'), path)
+        samples, ratios = [], []
+        for _ in range(runs):
+            reference = reference_us('sqlite:///' + path)
+            sample = import_once('sqlite:///' + path)
+            samples.append(sample)
+            ratios.append(sample['app'] / reference)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    imported = set().union(*samples)
+    top_level = {name for name in imported if '.' not in name}
+    return {
+        'app_us': statistics.median(sample['app'] for sample in samples),
+        'ratio': statistics.median(ratios),
+        'lazy_imported': sorted(name for name in LAZY_MODULES if name in top_level),
+        'slowest': sorted(
+            ((name, statistics.median(s.get(name, 0) for s in samples)) for name in top_level if name != 'app'),
+            key=lambda item: item[1], reverse=True,
+        )[:8],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown over the baseline (0.25 = 25%%)')
+    parser.add_argument('--update', action='store_true', help='write the measured ratio as the new baseline')
+    args = parser.parse_args(argv)
+
+    result = measure(args.runs)
+    print(f"import app: {result['app_us'] / 1000:.1f} ms, {result['ratio']:.2f}x the reference imports "
+          f"(median of {args.runs})")
+    for name, us in result['slowest']:
+        print(f"  {name:<24} {us / 1000:>7.1f} ms")
+
+    failures = []
+    if result['lazy_imported']:
+        failures.append(f"imported at startup: {', '.join(result['lazy_imported'])}")
+    if args.update or not os.path.exists(BASELINE):
+        with open(BASELINE, 'w', encoding='utf-8') as f:
+            json.dump({'ratio': result['ratio']}, f, indent=2)
+            f.write('\n')
+        print(f"Baseline written to {os.path.relpath(BASELINE, ROOT)}")
+    else:
+        with open(BASELINE, encoding='utf-8') as f:
+            baseline = json.load(f).get('ratio')
+        if baseline is None:
+            failures.append("baseline is from an older version of this script; rerun with --update")
+        else:
+            limit = baseline * (1 + args.tolerance)
+            print(f"baseline:   {baseline:.2f}x, limit {limit:.2f}x")
+            if result['ratio'] > limit:
+                failures.append(f"import took {result['ratio']:.2f}x the reference imports, "
+                                f"limit is {limit:.2f}x")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
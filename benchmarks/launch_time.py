@@ -0,0 +1,82 @@
+"""Time from launching a packaged build until it serves its first page.
+
+    python build_bundle.py
+    pyinstaller --distpath build/onefile app.spec
+    python benchmarks/launch_time.py --onefile build/onefile/app --bundle dist/app_bundle/app
+
+Each executable is started with a free PORT and polled with GET / until it
+answers 200; the process is then stopped. Prints the median, min and max
+launch time per build over --runs launches.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def launch_once(command, timeout):
+    port = free_port()
+    env = dict(os.environ, PORT=str(port))
+    env.pop('DATABASE_URL', None)
+    started = time.perf_counter()
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"{command[0]} exited with status {process.returncode}")
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError, OSError):
+                pass
+            time.sleep(0.02)
+        raise RuntimeError(f"{command[0]} did not answer within {timeout}s")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--onefile', help='executable built from app.spec')
+    parser.add_argument('--bundle', help='executable built from app_bundle.spec')
+    parser.add_argument('--source', action='store_true', help='also time `python app.py`')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=60)
+    args = parser.parse_args(argv)
+
+    builds = []
+    if args.onefile:
+        builds.append(('onefile', [os.path.abspath(args.onefile)]))
+    if args.bundle:
+        builds.append(('bundle', [os.path.abspath(args.bundle)]))
+    if args.source:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        builds.append(('source', [sys.executable, os.path.join(root, 'app.py')]))
+    if not builds:
+        parser.error('give at least one of --onefile, --bundle or --source')
+
+    print(f"{'build':<8} {'median s':>9} {'min s':>7} {'max s':>7}")
+    for name, command in builds:
+        times = [launch_once(command, args.timeout) for _ in range(args.runs)]
+        print(f"{name:<8} {statistics.median(times):>9.2f} {min(times):>7.2f} {max(times):>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
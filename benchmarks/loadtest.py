@@ -0,0 +1,298 @@
+"""Load test: many virtual players walking the whole game journey.
+
+    python benchmarks/loadtest.py --players 20 --turns 30
+    python benchmarks/loadtest.py --url http://127.0.0.1:5000 --players 50
+    python benchmarks/loadtest.py --save benchmarks/loadtest_baseline.json
+    python benchmarks/loadtest.py --compare benchmarks/loadtest_baseline.json
+
+Every player registers, logs in, creates a character and then plays
+--turns rounds of explore, rest and combat turns. CSRF tokens are scraped
+from each page, as a browser would send them. By default the players drive
+app.py in-process through the Flask test client on a temporary database;
+with --url they talk HTTP to a running server instead.
+
+/api/combat is only defined by the blueprint in routes.py, and app.py does
+not serve it. So the in-process run never covers it, and it is load-tested
+only with --url against a server that serves it, such as the blueprint's
+app from create_app in __init__.py.
+
+Prints requests/sec and p50/p95/p99 latency per route. --save writes the
+numbers to a JSON baseline; --compare prints the change against one and
+exits with status 1 if any route's p95 got more than --tolerance slower.
+Baselines are absolute milliseconds, so they only mean something on the
+machine and with the settings that recorded them. None is committed
+(benchmarks/loadtest_baseline.json is in .gitignore): record one with --save
+before a change and --compare after it. A baseline recorded with other
+settings (players, turns, password hashing) is refused.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CSRF_RE = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+_CHARACTER_RE = re.compile(r'character_id=(\d+)')
+_TARGET_RE = re.compile(r'<option value="(\d+)">')
+
+
+class TestClientTransport:
+    """Requests through app.test_client(); one client (cookie jar) per player"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None, json_body=None, headers=None):
+        response = self.client.open(path, method=method, data=data, json=json_body, headers=headers)
+        return response.status_code, response.get_data(as_text=True)
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HTTPTransport:
+    """Requests to a running server over HTTP, keeping cookies but not following redirects"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def request(self, method, path, data=None, json_body=None, headers=None):
+        headers = dict(headers or {})
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+        elif data is not None:
+            body = urllib.parse.urlencode(data).encode()
+        req = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers)
+        try:
+            with self.opener.open(req, timeout=30) as response:
+                return response.status, response.read().decode('utf-8', 'replace')
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.read().decode('utf-8', 'replace')
+
+
+class Recorder:
+    """Latencies and error counts per route label, shared by all players"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def add(self, route, seconds, ok):
+        with self._lock:
+            self.latencies.setdefault(route, []).append(seconds)
+            if not ok:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+    def summary(self, elapsed):
+        rows = {}
+        for route, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            rows[route] = {
+                'count': len(values),
+                'errors': self.errors.get(route, 0),
+                'rps': len(values) / elapsed,
+                'p50_ms': _percentile(values, 50) * 1000,
+                'p95_ms': _percentile(values, 95) * 1000,
+                'p99_ms': _percentile(values, 99) * 1000,
+            }
+        return rows
+
+
+def _percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Player:
+    """One virtual player; every request goes through timed() so it is recorded"""
+
+    def __init__(self, transport, recorder, monster=None):
+        self.transport = transport
+        self.recorder = recorder
+        self.monster = monster
+        self.csrf_token = None
+        self.character_id = None
+        self.targets = []
+
+    def timed(self, route, method, path, data=None, json_body=None, ok=(200, 302)):
+        headers = {'X-CSRFToken': self.csrf_token} if json_body is not None and self.csrf_token else None
+        if data is not None and self.csrf_token:
+            data = dict(data, csrf_token=self.csrf_token)
+        started = time.perf_counter()
+        status, body = self.transport.request(method, path, data=data, json_body=json_body, headers=headers)
+        self.recorder.add(route, time.perf_counter() - started, status in ok)
+        match = _CSRF_RE.search(body)
+        if match:
+            self.csrf_token = match[1]
+        return status, body
+
+    def sign_up(self):
+        username = 'load_' + uuid.uuid4().hex[:12]
+        self.timed('GET /register', 'GET', '/register')
+        self.timed('POST /register', 'POST', '/register',
+                   {'username': username, 'password': 'secret1', 'confirm_password': 'secret1'})
+        self.timed('GET /login', 'GET', '/login')
+        self.timed('POST /login', 'POST', '/login', {'username': username, 'password': 'secret1'})
+        self.timed('GET /character/create', 'GET', '/character/create')
+        self.timed('POST /character/create', 'POST', '/character/create',
+                   {'name': 'Hero ' + username[-4:], 'char_class': 'warrior'})
+        _, body = self.timed('GET /character/select', 'GET', '/character/select')
+        match = _CHARACTER_RE.search(body)
+        if match is None:
+            raise RuntimeError('could not create a character; is CSRF or the schema broken?')
+        self.character_id = int(match[1])
+
+    def play_round(self, api_combat):
+        game = f'/game/{self.character_id}'
+        combat = f'/combat/{self.character_id}'
+        self.timed('GET /game', 'GET', game)
+        self.timed('POST /game explore', 'POST', game, {'action': 'explore'})
+        self.timed('POST /game rest', 'POST', game, {'action': 'rest'})
+        _, body = self.timed('GET /combat', 'GET', combat)
+        self.targets = _TARGET_RE.findall(body)
+        for _ in range(3):
+            if not self.targets:
+                break
+            _, body = self.timed('POST /combat', 'POST', combat,
+                                 {'action': 'attack', 'target': self.targets[0]})
+            self.targets = _TARGET_RE.findall(body)
+        if api_combat:
+            self.timed('POST /api/combat', 'POST', '/api/combat',
+                       json_body={'character_id': self.character_id, 'monster': self.monster})
+
+
+def run(transport_factory, players, turns, api_combat, monster):
+    recorder = Recorder()
+    failures = []
+
+    def journey():
+        player = Player(transport_factory(), recorder, monster)
+        try:
+            player.sign_up()
+            for _ in range(turns):
+                player.play_round(api_combat)
+        except Exception as exc:  # keep the other players going
+            failures.append(repr(exc))
+
+    threads = [threading.Thread(target=journey) for _ in range(players)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return recorder.summary(elapsed), elapsed, failures
+
+
+def settings(args, app=None):
+    """What the latencies depend on besides the code and the machine"""
+    values = {'players': args.players, 'turns': args.turns, 'url': args.url}
+    if app is not None:
+        # Login and register time is dominated by the hashing work factor
+        values['password_hash_iterations'] = app.config['PASSWORD_HASH_ITERATIONS']
+        values['password_hash_workers'] = app.config['PASSWORD_HASH_WORKERS']
+    return values
+
+
+def in_process_app():
+    """Import app.py against a throwaway database"""
+    tmpdir = tempfile.mkdtemp(prefix='loadtest-')
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tmpdir, 'load.db'))
+    os.environ.setdefault('ENCOUNTER_STORE', 'memory')
+    sys.path.insert(0, ROOT)
+    import app as game_app
+    return game_app.app
+
+
+def print_summary(rows, elapsed, baseline=None):
+    total = sum(row['count'] for row in rows.values())
+    print(f"{total} requests in {elapsed:.1f}s ({total / elapsed:.0f} req/s)")
+    header = f"{'route':<24} {'count':>6} {'err':>4} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    print(header + ('  p95 vs base' if baseline else ''))
+    for route, row in rows.items():
+        line = (f"{route:<24} {row['count']:>6} {row['errors']:>4} {row['rps']:>7.1f} "
+                f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f}")
+        if baseline and route in baseline:
+            line += f"  {(row['p95_ms'] / baseline[route]['p95_ms'] - 1) * 100:>+10.1f}%"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--players', type=int, default=20)
+    parser.add_argument('--turns', type=int, default=20, help='play rounds per player')
+    parser.add_argument('--url', help='base URL of a running server (default: in-process test client)')
+    parser.add_argument('--monster', default='Goblin', help='monster for /api/combat')
+    parser.add_argument('--save', metavar='PATH', help='write the results as a baseline')
+    parser.add_argument('--compare', metavar='PATH', help='compare against a saved baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed p95 slowdown per route with --compare (0.25 = 25%%)')
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        if not os.path.exists(args.compare):
+            print(f"No baseline at {args.compare}; record one on this machine first with --save {args.compare}")
+            return 2
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    app = None
+    if args.url:
+        transport_factory = lambda: HTTPTransport(args.url)  # noqa: E731
+        probe = HTTPTransport(args.url).request('POST', '/api/combat', json_body={})
+        api_combat = probe[0] not in (404, 405)
+    else:
+        app = in_process_app()
+        transport_factory = lambda: TestClientTransport(app)  # noqa: E731
+        api_combat = any(rule.rule == '/api/combat' for rule in app.url_map.iter_rules())
+    run_settings = settings(args, app)
+    if baseline is not None and baseline.get('settings') != run_settings:
+        print(f"{args.compare} was recorded with {baseline.get('settings')}, this run uses {run_settings}; "
+              f"the latencies are not comparable, record a new baseline with --save")
+        return 2
+    if not api_combat:
+        print("/api/combat is not served by this app, so it is NOT covered by this run "
+              "(only routes.py defines it; see the module docstring)")
+
+    rows, elapsed, failures = run(transport_factory, args.players, args.turns, api_combat, args.monster)
+    for failure in sorted(set(failures)):
+        print(f"player failed: {failure}")
+
+    baseline = baseline and baseline['routes']
+    print_summary(rows, elapsed, baseline)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'settings': run_settings, 'routes': rows}, f, indent=2)
+            f.write('\n')
+        print(f"Baseline written to {args.save}")
+
+    if baseline:
+        slower = [route for route, row in rows.items()
+                  if route in baseline and row['p95_ms'] > baseline[route]['p95_ms'] * (1 + args.tolerance)]
+        for route in slower:
+            print(f"FAIL: {route} p95 {rows[route]['p95_ms']:.2f} ms vs {baseline[route]['p95_ms']:.2f} ms")
+        return 1 if slower or failures else 0
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
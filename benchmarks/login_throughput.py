@@ -0,0 +1,138 @@
+"""Login throughput while combat traffic keeps flowing.
+
+    python benchmarks/login_throughput.py
+    python benchmarks/login_throughput.py --logins 16 --combat 8 --seconds 10 --workers 1 2 4
+
+Drives app.py in-process on a temporary database. For each hasher setup
+(inline on the request thread, then a pool of each --workers size) it runs
+--logins threads that log in over and over next to --combat threads that
+play combat turns, and prints logins/s next to combat turns/s and combat
+p50/p95 latency. The first login of each user upgrades a plaintext row, as
+after a deploy.
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_TARGET_RE = re.compile(r'<option value="(\d+)">')
+
+
+def in_process_app():
+    tmpdir = tempfile.mkdtemp(prefix='login-bench-')
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tmpdir, 'bench.db'))
+    os.environ.setdefault('ENCOUNTER_STORE', 'memory')
+    sys.path.insert(0, ROOT)
+    import app as game_app
+    game_app.app.config['WTF_CSRF_ENABLED'] = False
+    return game_app
+
+
+def add_legacy_users(game_app, count, prefix):
+    """Users stored the old way, with a plaintext password"""
+    with game_app.app.app_context():
+        for n in range(count):
+            game_app.db.session.add(game_app.User(username=f'{prefix}{n}', password='secret1'))
+        game_app.db.session.commit()
+    return [f'{prefix}{n}' for n in range(count)]
+
+
+def combat_client(app, name):
+    client = app.test_client()
+    client.post('/register', data={'username': name, 'password': 'secret1', 'confirm_password': 'secret1'})
+    client.post('/login', data={'username': name, 'password': 'secret1'})
+    client.post('/character/create', data={'name': 'Hero', 'char_class': 'warrior'})
+    body = client.get('/character/select').get_data(as_text=True)
+    character_id = re.search(r'character_id=(\d+)', body)[1]
+    return client, character_id
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def run_phase(app, usernames, combatants, seconds):
+    stop = threading.Event()
+    logins, turns = [], []
+    lock = threading.Lock()
+
+    def log_in(names):
+        client = app.test_client()
+        i = 0
+        while not stop.is_set():
+            started = time.perf_counter()
+            response = client.post('/login', data={'username': names[i % len(names)], 'password': 'secret1'})
+            if response.status_code == 302:
+                with lock:
+                    logins.append(time.perf_counter() - started)
+            i += 1
+
+    def fight(client, character_id):
+        path = f'/combat/{character_id}'
+        body = client.get(path).get_data(as_text=True)
+        while not stop.is_set():
+            targets = _TARGET_RE.findall(body)
+            started = time.perf_counter()
+            if targets:
+                body = client.post(path, data={'action': 'attack', 'target': targets[0]}).get_data(as_text=True)
+            else:
+                client.post(f'/game/{character_id}', data={'action': 'rest'})
+                body = client.get(path).get_data(as_text=True)
+            with lock:
+                turns.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=log_in, args=(names,)) for names in usernames]
+    threads += [threading.Thread(target=fight, args=combatant) for combatant in combatants]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return {
+        'logins_per_s': len(logins) / seconds,
+        'login_p95_ms': percentile(logins, 95) * 1000,
+        'turns_per_s': len(turns) / seconds,
+        'turn_p50_ms': percentile(turns, 50) * 1000,
+        'turn_p95_ms': percentile(turns, 95) * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--logins', type=int, default=8, help='threads logging in')
+    parser.add_argument('--combat', type=int, default=4, help='threads playing combat turns')
+    parser.add_argument('--users', type=int, default=4, help='legacy users per login thread')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--iterations', type=int, help='PBKDF2 work factor (default: the app\'s)')
+    args = parser.parse_args(argv)
+
+    game_app = in_process_app()
+    app, hasher = game_app.app, game_app.password_hasher
+    iterations = args.iterations or hasher.iterations
+    hasher.configure(iterations, max(args.workers), hasher.max_pending)
+    combatants = [combat_client(app, f'fighter{n}') for n in range(args.combat)]
+
+    print(f"{args.logins} login threads, {args.combat} combat threads, {iterations} iterations, "
+          f"{os.cpu_count()} CPUs")
+    print(f"{'hashing':<10} {'logins/s':>9} {'login p95':>10} {'turns/s':>8} {'turn p50':>9} {'turn p95':>9}")
+    for phase, workers in enumerate([0] + args.workers):
+        hasher.configure(iterations, workers, hasher.max_pending)
+        usernames = [add_legacy_users(game_app, args.users, f'p{phase}t{t}u') for t in range(args.logins)]
+        row = run_phase(app, usernames, combatants, args.seconds)
+        label = 'inline' if workers == 0 else f'pool={workers}'
+        print(f"{label:<10} {row['logins_per_s']:>9.1f} {row['login_p95_ms']:>8.0f}ms "
+              f"{row['turns_per_s']:>8.1f} {row['turn_p50_ms']:>7.1f}ms {row['turn_p95_ms']:>7.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Memory and bulk-operation time: game.Character objects vs a roster.Roster.
+
+    python benchmarks/roster.py
+    python benchmarks/roster.py --characters 200000
+
+Builds --characters CLI characters (three starting items each) and a Roster
+from them, measures both with tracemalloc, then times generate_stats, ten
+level-ups and a rest: per object in a Python loop, and vectorized on the
+roster. The loop's level-up is Character.level_up from app/models (that
+model cannot be imported without its Flask app). Both sides must end with
+the same columns.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game import Character  # noqa: E402
+from roster import ABILITIES, Roster  # noqa: E402
+
+CLASSES = ['warrior', 'mage', 'rogue']
+
+
+def level_up(character):
+    """app/models Character.level_up"""
+    character.level += 1
+    con_mod = (character.constitution - 10) // 2
+    if character.char_class == 'warrior':
+        hp_increase = 10 + con_mod
+    elif character.char_class == 'mage':
+        hp_increase = 6 + con_mod
+    else:
+        hp_increase = 8 + con_mod
+    character.max_hp += max(1, hp_increase)
+    character.hp = character.max_hp
+
+
+def build(n, seed):
+    rng = random.Random(seed)
+    return [Character(name=f'Hero {i}', char_class=rng.choice(CLASSES), inventory=['Sword', 'Shield', 'Potion'])
+            for i in range(n)]
+
+
+def measure(factory):
+    tracemalloc.start()
+    value = factory()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+
+def timed(fn):
+    started = time.perf_counter()
+    fn()
+    return (time.perf_counter() - started) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--characters', type=int, default=50_000)
+    parser.add_argument('--levels', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    characters, objects_bytes = measure(lambda: build(args.characters, args.seed))
+    roster, roster_bytes = measure(lambda: Roster.from_characters(characters))
+    n = args.characters
+    print(f"{n} characters")
+    print(f"{'':<14} {'bytes/char':>10} {'stats ms':>9} {'level ms':>9} {'rest ms':>8}")
+
+    def loop_stats():
+        for character in characters:
+            character.generate_stats()
+
+    def loop_levels():
+        for _ in range(args.levels):
+            for character in characters:
+                level_up(character)
+
+    def loop_rest():
+        for character in characters:
+            character.hp = character.max_hp
+
+    objects_row = [timed(loop_stats), timed(loop_levels), timed(loop_rest)]
+
+    # Same starting stats on both sides so the end states can be compared
+    fresh = Roster.from_characters(characters)
+    roster_stats = timed(lambda: roster.generate_stats(rng=np.random.default_rng(args.seed)))
+    roster.abilities[:] = fresh.abilities
+    roster.max_hp[:], roster.hp[:], roster.level[:] = fresh.max_hp, fresh.hp, 1
+    for character in characters:
+        character.level = 1
+        character.hp = character.max_hp
+    loop_levels()
+    loop_rest()
+
+    def roster_levels():
+        for _ in range(args.levels):
+            roster.level_up()
+
+    roster_row = [roster_stats, timed(roster_levels), timed(roster.rest)]
+
+    expected = Roster.from_characters(characters)
+    for column in ('level', 'hp', 'max_hp', 'abilities'):
+        if not np.array_equal(getattr(roster, column), getattr(expected, column)):
+            raise AssertionError(f'roster and objects disagree on {column}')
+    if roster.abilities.shape[1] != len(ABILITIES):
+        raise AssertionError('roster lost an ability column')
+
+    for label, size, row in (('objects', objects_bytes, objects_row), ('roster', roster_bytes, roster_row)):
+        print(f"{label:<14} {size / n:>10.0f} {row[0]:>9.1f} {row[1]:>9.1f} {row[2]:>8.1f}")
+    print(f"{'roster arrays':<14} {roster.nbytes / n:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Compare session cookie size and encode/decode time with and without the encounter store.
+
+    python benchmarks/session_cookie.py --turns 200
+
+Runs the same combat turns through the Flask test client once with
+ENCOUNTER_STORE=cookie (the old behaviour) and once with the server-side
+store, and prints the counters from TimedSessionInterface.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmpdir = tempfile.mkdtemp(prefix='bench-session-')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_tmpdir, 'bench.db'))
+
+import app as game_app  # noqa: E402
+from encounter_store import create_encounter_store  # noqa: E402
+
+
+def play(client, character_id, turns):
+    client.get(f'/combat/{character_id}')
+    for i in range(turns):
+        client.post(f'/combat/{character_id}', data={'action': 'attack', 'target': str(i % 4)})
+
+
+def run_mode(mode, turns):
+    app = game_app.app
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['ENCOUNTER_STORE'] = mode
+    app.config['ENCOUNTER_STORE_PATH'] = os.path.join(_tmpdir, f'encounters-{mode}.db')
+    game_app.encounter_store = create_encounter_store(app.config, app.instance_path)
+
+    client = app.test_client()
+    username = f'bench_{mode}'
+    client.post('/register', data={'username': username, 'password': 'secret1', 'confirm_password': 'secret1'})
+    client.post('/login', data={'username': username, 'password': 'secret1'})
+    client.post('/character/create', data={'name': f'Bench {mode}', 'char_class': 'warrior'})
+    with app.app_context():
+        character = game_app.Character.query.filter_by(name=f'Bench {mode}').first()
+
+    app.session_interface.stats.reset()
+    play(client, character.id, turns)
+    return app.session_interface.stats.as_dict()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--turns', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    print(f"{'store':<8} {'bytes avg':>10} {'bytes max':>10} {'encode us':>10} {'decode us':>10}")
+    for mode in ('cookie', 'layered'):
+        stats = run_mode(mode, args.turns)
+        print(f"{mode:<8} {stats['cookie_bytes_avg']:>10.0f} {stats['cookie_bytes_max']:>10} "
+              f"{stats['encode_us_avg']:>10.1f} {stats['decode_us_avg']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Write-heavy benchmark of the SQLite storage profiles.
+
+    python benchmarks/sqlite_profiles.py --threads 8 --commits 200
+
+For each profile a fresh database gets one character per thread; every
+thread then runs turn-sized transactions (read its character, change hp and
+gold, add an item, commit) as fast as it can. Prints commits/sec, p50/p99
+commit latency and how many transactions failed with "database is locked".
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmpdir = tempfile.mkdtemp(prefix='bench-sqlite-')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_tmpdir, 'app.db'))
+os.environ.setdefault('ENCOUNTER_STORE', 'memory')
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+import app as game_app  # noqa: E402
+from storage_profile import PROFILES, apply_profile, engine_options  # noqa: E402
+
+Character, CharacterItem, User = game_app.Character, game_app.CharacterItem, game_app.User
+
+
+def make_engine(profile):
+    url = 'sqlite:///' + os.path.join(_tmpdir, f'{profile}.db')
+    engine = apply_profile(create_engine(url, **engine_options(profile, url)), profile)
+    game_app.db.metadata.create_all(engine)
+    return engine
+
+
+def seed(engine, count):
+    with Session(engine) as session:
+        user = User(username='bench', password='secret1')
+        session.add(user)
+        session.flush()
+        characters = [Character(name=f'Bench {i}', char_class='warrior', user_id=user.id)
+                      for i in range(count)]
+        session.add_all(characters)
+        session.commit()
+        return [c.id for c in characters]
+
+
+def worker(engine, character_id, commits, latencies, failures, lock):
+    mine, failed = [], 0
+    for _ in range(commits):
+        started = time.perf_counter()
+        try:
+            with Session(engine) as session:
+                character = session.get(Character, character_id)
+                character.hp = random.randint(1, character.max_hp)
+                character.gold += random.randint(1, 10)
+                row = session.get(CharacterItem, (character_id, 1))
+                if row is None:
+                    session.add(CharacterItem(character_id=character_id, item_id=1, quantity=1))
+                else:
+                    row.quantity += 1
+                session.commit()
+        except OperationalError:
+            failed += 1
+            continue
+        mine.append(time.perf_counter() - started)
+    with lock:
+        latencies.extend(mine)
+        failures.append(failed)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_profile(profile, threads, commits):
+    engine = make_engine(profile)
+    with Session(engine) as session:
+        session.add(game_app.Item(id=1, name='Health Potion'))
+        session.commit()
+    character_ids = seed(engine, threads)
+
+    latencies, failures, lock = [], [], threading.Lock()
+    workers = [
+        threading.Thread(target=worker, args=(engine, cid, commits, latencies, failures, lock))
+        for cid in character_ids
+    ]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+
+    latencies.sort()
+    return {
+        'commits': len(latencies),
+        'failed': sum(failures),
+        'per_sec': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--commits', type=int, default=200, help='commits per thread')
+    parser.add_argument('--profiles', default=','.join(PROFILES))
+    args = parser.parse_args(argv)
+
+    print(f"{'profile':<8} {'commits':>8} {'failed':>7} {'commits/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for profile in args.profiles.split(','):
+        result = run_profile(profile, args.threads, args.commits)
+        print(f"{profile:<8} {result['commits']:>8} {result['failed']:>7} {result['per_sec']:>10.0f} "
+              f"{result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Build the unpacked, preoptimized app bundle (app_bundle.spec).
+
+    python build_bundle.py                 # dist/app_bundle/app
+    python build_bundle.py --assets-only   # just refresh build/bundle_assets
+
+Before running PyInstaller this prepares build/bundle_assets:
+
+* db_template/dnd_game.db - an empty database with every table, stamped at
+  the newest migration, copied into instance/ on first launch.
+* jinja_cache/ - bytecode for every template, loaded straight from the bundle.
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+
+from startup import precompile_templates
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+ASSETS = os.path.join(ROOT, 'build', 'bundle_assets')
+SPEC = os.path.join(ROOT, 'app_bundle.spec')
+
+
+def build_assets(assets_dir=ASSETS):
+    """Create the database template and template bytecode for the bundle"""
+    shutil.rmtree(assets_dir, ignore_errors=True)
+    template = os.path.join(assets_dir, 'db_template', 'dnd_game.db')
+    os.makedirs(os.path.dirname(template))
+
+    # app.py reads its settings at import, so point it at the template first
+    os.environ['DATABASE_URL'] = 'sqlite:///' + template
+    os.environ['ENCOUNTER_STORE'] = 'memory'
+    os.environ.pop('WRITE_BEHIND', None)
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    import app as game_app
+    from flask_migrate import Migrate, stamp
+
+    Migrate(game_app.app, game_app.db)
+    with game_app.app.app_context():
+        # Importing app.py created the tables; record that they match the newest migration
+        stamp()
+        game_app.db.engine.dispose()
+
+    count = precompile_templates(game_app.app, os.path.join(assets_dir, 'jinja_cache'))
+    print(f"Database template: {os.path.relpath(template, ROOT)}")
+    print(f"Precompiled {count} templates")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--assets-only', action='store_true')
+    args = parser.parse_args(argv)
+
+    build_assets()
+    if args.assets_only:
+        return 0
+    return subprocess.call(
+        [sys.executable, '-m', 'PyInstaller', '--noconfirm', SPEC], cwd=ROOT
+    )
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""Game content registry.
+
+Monsters, classes, abilities, explore events and adventure tiers are loaded
+from the JSON files in data/ once and frozen into read-only structures that
+every view shares. ``reload_content()`` builds a fresh snapshot and swaps it
+in with a single assignment, so a request that already called
+``get_content()`` keeps a consistent view while new requests see the edit.
+"""
+import json
+import os
+import threading
+
+import dice
+from sampler import AliasSampler, SamplerTable
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+ABILITY_TYPES = {'attack_all', 'attack_single', 'heal', 'shield', 'buff'}
+
+
+class ContentError(ValueError):
+    """Raised when a data file is missing or inconsistent"""
+
+
+class FrozenDict(dict):
+    """dict that refuses mutation but still serializes with json and Jinja"""
+
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('game content is read-only')
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = __ior__ = _readonly
+
+    def __copy__(self):
+        return dict(self)
+
+    def copy(self):
+        return dict(self)
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+def freeze(value):
+    """Recursively turn dicts into FrozenDicts and lists into tuples"""
+    if isinstance(value, dict):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+class Content:
+    """One immutable snapshot of all game data"""
+
+    __slots__ = (
+        'classes', 'abilities', 'monsters', 'single_monsters', 'monster_names', 'monster_sampler',
+        'explore_events', 'explore_sampler', 'rarity_weights', 'shop_items', 'adventure_tiers',
+        'adventure_samplers', 'source'
+    )
+
+    def __init__(self, classes, abilities, monsters, explore, adventure_tiers, source=None):
+        self.classes = freeze(classes)
+        self.abilities = freeze(abilities)
+        self.monsters = freeze(monsters['wave'])
+        self.single_monsters = freeze(monsters['single'])
+        self.monster_names = tuple(self.monsters)
+        # Monsters are equally likely unless the data gives them a 'weight'
+        self.monster_sampler = AliasSampler(
+            self.monster_names, [m.get('weight', 1) for m in self.monsters.values()]
+        )
+        self.explore_events = freeze(explore['events'])
+        self.rarity_weights = freeze(explore['rarity_weights'])
+        self.shop_items = freeze(explore.get('shop_items', []))
+        self.adventure_tiers = FrozenDict(
+            (int(tier), freeze(outcomes)) for tier, outcomes in adventure_tiers.items()
+        )
+        self.source = source
+        self.validate()
+
+        self.explore_sampler = AliasSampler.from_rarity(self.explore_events, self.rarity_weights)
+        self.adventure_samplers = SamplerTable({
+            tier: AliasSampler(outcomes, [o.get('weight', 1) for o in outcomes])
+            for tier, outcomes in self.adventure_tiers.items()
+        })
+
+    def validate(self):
+        for name, ability in self.abilities.items():
+            if ability.get('type') not in ABILITY_TYPES:
+                raise ContentError(f"Ability {name!r} has unknown type {ability.get('type')!r}")
+        for char_class, stats in self.classes.items():
+            for ability in stats['abilities']:
+                if ability not in self.abilities:
+                    raise ContentError(f"Class {char_class!r} uses unknown ability {ability!r}")
+        for table in (self.monsters, self.single_monsters):
+            for name, monster in table.items():
+                try:
+                    dice.compile_dice(monster['damage'])
+                except (KeyError, ValueError) as exc:
+                    raise ContentError(f"Monster {name!r} has invalid damage: {exc}") from exc
+        for event in self.explore_events:
+            if event['rarity'] not in self.rarity_weights:
+                raise ContentError(f"Explore event has unknown rarity {event['rarity']!r}")
+
+
+def _read(data_dir, name):
+    path = os.path.join(data_dir, name)
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as exc:
+        raise ContentError(f"Could not load {path}: {exc}") from exc
+
+
+def load_content(data_dir=DATA_DIR):
+    """Read every data file and return a new Content snapshot"""
+    try:
+        return Content(
+            classes=_read(data_dir, 'classes.json'),
+            abilities=_read(data_dir, 'abilities.json'),
+            monsters=_read(data_dir, 'monsters.json'),
+            explore=_read(data_dir, 'explore.json'),
+            adventure_tiers=_read(data_dir, 'adventure_tiers.json'),
+            source=data_dir,
+        )
+    except (KeyError, TypeError, AttributeError) as exc:
+        raise ContentError(f"Malformed game data in {data_dir}: {exc!r}") from exc
+
+
+_content = None
+_reload_lock = threading.Lock()
+
+
+def get_content():
+    """Return the current snapshot, loading it on first use"""
+    content = _content
+    if content is None:
+        with _reload_lock:
+            if _content is None:
+                _swap(load_content())
+            content = _content
+    return content
+
+
+def reload_content(data_dir=None):
+    """Load the data files again and atomically replace the current snapshot
+
+    If the new data fails to load or validate, ContentError is raised and the
+    old snapshot stays in place.
+    """
+    with _reload_lock:
+        current = _content
+        content = load_content(data_dir or (current.source if current else DATA_DIR))
+        _swap(content)
+    return content
+
+
+def _swap(content):
+    global _content
+    _content = content
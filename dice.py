@@ -0,0 +1,115 @@
+"""Dice expressions compiled once and rolled singly or in NumPy batches.
+
+Supported syntax: ``XdY`` with an optional keep clause and flat modifier,
+e.g. ``1d8``, ``2d6+3``, ``4d6kh3`` (keep highest 3), ``2d20kl1`` (keep
+lowest 1) or ``d20-1``.
+"""
+import random
+import re
+from functools import lru_cache
+
+_DICE_RE = re.compile(
+    r'^\s*(?P<count>\d*)\s*d\s*(?P<sides>\d+)'
+    r'(?:\s*k(?P<keep_dir>[hl]?)\s*(?P<keep>\d+))?'
+    r'(?:\s*(?P<sign>[+-])\s*(?P<mod>\d+))?\s*$',
+    re.IGNORECASE,
+)
+
+
+class Dice:
+    """A parsed dice expression that can be rolled many times without re-parsing"""
+
+    __slots__ = ('expression', 'count', 'sides', 'keep', 'keep_highest', 'modifier')
+
+    def __init__(self, expression, count, sides, keep=None, keep_highest=True, modifier=0):
+        if count < 1 or sides < 1:
+            raise ValueError(f"Invalid dice expression: {expression!r}")
+        if keep is not None and not 1 <= keep <= count:
+            raise ValueError(f"Cannot keep {keep} of {count} dice in {expression!r}")
+        self.expression = expression
+        self.count = count
+        self.sides = sides
+        # Keeping every die is the same as keeping none
+        self.keep = None if keep == count else keep
+        self.keep_highest = keep_highest
+        self.modifier = modifier
+
+    def __repr__(self):
+        return f'<Dice {self.expression}>'
+
+    @property
+    def minimum(self):
+        return (self.keep or self.count) + self.modifier
+
+    @property
+    def maximum(self):
+        return (self.keep or self.count) * self.sides + self.modifier
+
+    def roll(self, rng=random):
+        """Roll the expression once and return the total"""
+        sides = self.sides
+        if self.keep is None:
+            if self.count == 1:
+                return rng.randint(1, sides) + self.modifier
+            return sum(rng.randint(1, sides) for _ in range(self.count)) + self.modifier
+
+        rolls = sorted(rng.randint(1, sides) for _ in range(self.count))
+        kept = rolls[-self.keep:] if self.keep_highest else rolls[:self.keep]
+        return sum(kept) + self.modifier
+
+    def roll_many(self, n, rng=None):
+        """Roll the expression ``n`` times and return an int64 array of totals"""
+        import numpy as np  # only batch rolls need NumPy; keep it out of the web app's startup
+
+        rng = rng if rng is not None else _numpy_rng()
+        rolls = rng.integers(1, self.sides + 1, size=(n, self.count), dtype=np.int64)
+        if self.keep is not None:
+            rolls.sort(axis=1)
+            rolls = rolls[:, -self.keep:] if self.keep_highest else rolls[:, :self.keep]
+        totals = rolls.sum(axis=1)
+        if self.modifier:
+            totals += self.modifier
+        return totals
+
+
+@lru_cache(maxsize=256)
+def compile_dice(expression):
+    """Parse a dice expression into a cached Dice object"""
+    match = _DICE_RE.match(expression)
+    if not match:
+        raise ValueError(f"Invalid dice expression: {expression!r}")
+
+    count = int(match['count'] or 1)
+    keep = int(match['keep']) if match['keep'] else None
+    modifier = int(match['mod'] or 0)
+    if match['sign'] == '-':
+        modifier = -modifier
+    return Dice(
+        expression,
+        count=count,
+        sides=int(match['sides']),
+        keep=keep,
+        keep_highest=(match['keep_dir'] or 'h').lower() == 'h',
+        modifier=modifier,
+    )
+
+
+def roll(expression, rng=random):
+    """Roll a dice expression once (e.g. roll('2d6+3'))"""
+    return compile_dice(expression).roll(rng)
+
+
+def roll_many(expression, n, rng=None):
+    """Roll a dice expression ``n`` times into a NumPy array"""
+    return compile_dice(expression).roll_many(n, rng)
+
+
+_rng = None
+
+
+def _numpy_rng():
+    global _rng
+    if _rng is None:
+        import numpy as np
+        _rng = np.random.default_rng()
+    return _rng
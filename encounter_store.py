@@ -0,0 +1,140 @@
+"""Server-side storage for in-progress combat encounters.
+
+The combat view used to keep the monster list, wave, shield and dodge in the
+signed session cookie. Encounters now live in one of these stores, keyed by
+an opaque per-session id plus the character id, so the cookie only carries
+the id.
+
+Stores share a tiny interface: ``get(key)``, ``set(key, state)`` and
+``delete(key)``. States are plain JSON-serializable dicts.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from cache import TTLCache
+
+DEFAULT_TTL = 60 * 60
+DEFAULT_MAXSIZE = 10_000
+
+
+class MemoryEncounterStore(TTLCache):
+    """In-process LRU with per-entry TTL"""
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL):
+        super().__init__(maxsize, ttl)
+
+
+class SQLiteEncounterStore:
+    """Encounters persisted in a small SQLite file, shared between worker processes"""
+
+    PURGE_EVERY = 500
+
+    def __init__(self, path, ttl=DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS encounter ('
+            'key TEXT PRIMARY KEY, state TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT state FROM encounter WHERE key = ? AND expires_at > ?',
+                (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, state):
+        payload = json.dumps(state, separators=(',', ':'))
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO encounter (key, state, expires_at) VALUES (?, ?, ?)',
+                (key, payload, time.time() + self.ttl)
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self._conn.execute('DELETE FROM encounter WHERE expires_at <= ?', (time.time(),))
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute('DELETE FROM encounter WHERE key = ?', (key,))
+
+
+class LayeredEncounterStore:
+    """Memory LRU in front of a SQLite store; misses fall back to SQLite
+
+    Writes go to both layers. The memory layer is per process, so use the
+    plain ``sqlite`` store when several workers may serve the same player.
+    """
+
+    def __init__(self, memory, backing):
+        self.memory = memory
+        self.backing = backing
+
+    def get(self, key):
+        state = self.memory.get(key)
+        if state is None:
+            state = self.backing.get(key)
+            if state is not None:
+                self.memory.set(key, state)
+        return state
+
+    def set(self, key, state):
+        self.memory.set(key, state)
+        self.backing.set(key, state)
+
+    def delete(self, key):
+        self.memory.delete(key)
+        self.backing.delete(key)
+
+
+class SessionEncounterStore:
+    """Legacy behaviour: keep encounters inside the Flask session cookie"""
+
+    SESSION_KEY = 'encounters'
+
+    def get(self, key):
+        from flask import session
+        return session.get(self.SESSION_KEY, {}).get(key)
+
+    def set(self, key, state):
+        from flask import session
+        encounters = session.get(self.SESSION_KEY, {})
+        encounters[key] = state
+        session[self.SESSION_KEY] = encounters
+
+    def delete(self, key):
+        from flask import session
+        encounters = session.get(self.SESSION_KEY, {})
+        if encounters.pop(key, None) is not None:
+            session[self.SESSION_KEY] = encounters
+
+
+def create_encounter_store(config, instance_path):
+    """Build the store selected by ``ENCOUNTER_STORE`` (memory, sqlite, layered or cookie)"""
+    kind = config.get('ENCOUNTER_STORE', 'layered')
+    ttl = config.get('ENCOUNTER_TTL', DEFAULT_TTL)
+    if kind == 'cookie':
+        return SessionEncounterStore()
+
+    memory = MemoryEncounterStore(config.get('ENCOUNTER_CACHE_SIZE', DEFAULT_MAXSIZE), ttl)
+    if kind == 'memory':
+        return memory
+
+    path = config.get('ENCOUNTER_STORE_PATH') or os.path.join(instance_path, 'encounters.db')
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    sqlite_store = SQLiteEncounterStore(path, ttl)
+    if kind == 'sqlite':
+        return sqlite_store
+    if kind == 'layered':
+        return LayeredEncounterStore(memory, sqlite_store)
+    raise ValueError(f"Unknown ENCOUNTER_STORE: {kind!r}")
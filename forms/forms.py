@@ -1,7 +1,7 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SelectField, HiddenField
 from wtforms.validators import DataRequired, EqualTo, Length, ValidationError
-from models import User
+from ..models import User
 
 class LoginForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired()])
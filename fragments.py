@@ -0,0 +1,126 @@
+"""Cache rendered template fragments per character version.
+
+    {% cache 'stats', character %}
+        ... markup that only depends on the character row ...
+    {% endcache %}
+
+The rendered markup is stored under (template, block name, character id,
+version) and reused until the character changes, so a click that only
+changes the message box skips re-rendering the stat block. ``version`` comes
+from the character's optimistic-locking column by default; the app can
+supply its own (write-behind turns change a character without bumping it).
+
+Entries are kept in an LRU bounded by total size (FRAGMENT_CACHE_BYTES);
+the least recently used fragments are evicted past the budget. Hits and
+misses are counted per block for /admin/cache/stats.
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+
+
+def default_version(obj):
+    return obj.version
+
+
+class FragmentCache:
+    """LRU of rendered fragments bounded by their total size in bytes"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, version_of=default_version):
+        self.max_bytes = max_bytes
+        self.version_of = version_of
+        self.bytes = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, template, block, obj):
+        return (template, block, obj.id, self.version_of(obj))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            counts = self._blocks.setdefault(key[1], [0, 0])
+            if entry is None:
+                counts[1] += 1
+                return None
+            self._entries.move_to_end(key)
+            counts[0] += 1
+            return entry[0]
+
+    def set(self, key, html):
+        size = sys.getsizeof(html)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (html, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            blocks = {block: {'hits': hits, 'misses': misses,
+                              'hit_rate': hits / (hits + misses) if hits + misses else 0.0}
+                      for block, (hits, misses) in sorted(self._blocks.items())}
+            hits = sum(block['hits'] for block in blocks.values())
+            lookups = hits + sum(block['misses'] for block in blocks.values())
+            return {
+                'size': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'blocks': blocks,
+            }
+
+
+class FragmentCacheExtension(Extension):
+    """Adds ``{% cache 'block', obj %}...{% endcache %}`` backed by environment.fragment_cache"""
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        template = nodes.Const(parser.name or '')
+        block = parser.parse_expression()
+        parser.stream.expect('comma')
+        obj = parser.parse_expression()
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', [template, block, obj]), [], [], body
+                               ).set_lineno(lineno)
+
+    def _render(self, template, block, obj, caller):
+        cache = self.environment.fragment_cache
+        if cache is None or not cache.max_bytes:
+            return caller()
+        key = cache.key(template, block, obj)
+        html = cache.get(key)
+        if html is None:
+            html = caller()
+            cache.set(key, html)
+        return Markup(html)
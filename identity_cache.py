@@ -0,0 +1,141 @@
+"""Cross-request cache of User and Character rows.
+
+Rows are cached as plain column snapshots and turned back into persistent
+ORM objects with ``make_transient_to_detached`` + ``merge(load=False)``, so a
+cache hit issues no SELECT for the row itself.
+
+Versioned models (Character) are checked with one cheap
+``SELECT id, version`` per load: a snapshot is only used when its version
+still matches the row. Snapshots of rows updated in a transaction are
+refreshed when that transaction commits, so the turn after a write is a hit
+too. Unversioned models (User) are served straight from the cache and
+dropped whenever they are updated or deleted; the TTL bounds staleness
+across processes.
+"""
+import copy
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from cache import TTLCache
+
+DEFAULT_TTL = 5 * 60
+DEFAULT_MAXSIZE = 10_000
+
+_PENDING_KEY = 'identity_cache_pending'
+
+
+class SnapshotCache:
+    """Read-through cache for one model, optionally validated by a version column"""
+
+    def __init__(self, model, version_attr=None, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL):
+        self.model = model
+        self.version_attr = version_attr
+        self.cache = TTLCache(maxsize, ttl)
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self._columns = [attr.key for attr in inspect(model).column_attrs]
+        self._pk = inspect(model).primary_key[0]
+
+        event.listen(model, 'after_update', self._after_write)
+        event.listen(model, 'after_delete', self._after_delete)
+
+    def load(self, session, pk):
+        """Return the instance for pk attached to session, or None if it does not exist"""
+        pk = int(pk)
+        existing = session.identity_map.get(session.identity_key(self.model, pk))
+        if existing is not None:
+            return existing
+
+        snapshot = self.cache.get(pk)
+        if self.version_attr is not None:
+            version_col = getattr(self.model, self.version_attr)
+            row = session.execute(
+                select(self._pk, version_col).where(self._pk == pk)
+            ).first()
+            if row is None:
+                self.cache.delete(pk)
+                return None
+            if snapshot is not None and snapshot[self.version_attr] != row[1]:
+                self.stale += 1
+                snapshot = None
+
+        if snapshot is not None:
+            self.hits += 1
+            return self._restore(session, snapshot)
+
+        self.misses += 1
+        instance = session.get(self.model, pk)
+        if instance is not None:
+            self.remember(instance)
+        return instance
+
+    def remember(self, instance):
+        self.cache.set(getattr(instance, self._pk.key), self._snapshot(instance))
+
+    def invalidate(self, pk):
+        self.cache.delete(int(pk))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.cache),
+            'hits': self.hits,
+            'misses': self.misses,
+            'stale': self.stale,
+            'evictions': self.cache.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def _snapshot(self, instance):
+        return {key: copy.deepcopy(getattr(instance, key)) for key in self._columns}
+
+    def _restore(self, session, snapshot):
+        instance = self.model(**copy.deepcopy(snapshot))
+        make_transient_to_detached(instance)
+        return session.merge(instance, load=False)
+
+    def _after_write(self, mapper, connection, target):
+        if self.version_attr is None:
+            self.invalidate(getattr(target, self._pk.key))
+            return
+        # Refresh the snapshot only once the transaction has committed
+        session = Session.object_session(target)
+        if session is not None:
+            session.info.setdefault(_PENDING_KEY, {})[(self, getattr(target, self._pk.key))] = target
+
+    def _after_delete(self, mapper, connection, target):
+        self.invalidate(getattr(target, self._pk.key))
+
+
+class IdentityCache:
+    """The user and character caches used by load_user and the game views"""
+
+    def __init__(self, user_model, character_model, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL):
+        self.users = SnapshotCache(user_model, maxsize=maxsize, ttl=ttl)
+        self.characters = SnapshotCache(character_model, version_attr='version',
+                                        maxsize=maxsize, ttl=ttl)
+
+    def stats(self):
+        return {'users': self.users.stats(), 'characters': self.characters.stats()}
+
+
+@event.listens_for(Session, 'after_commit')
+def _remember_committed(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    for (snapshot_cache, pk), instance in pending.items():
+        # Expired attributes would need a SELECT; just drop the entry instead
+        if inspect(instance).expired_attributes:
+            snapshot_cache.invalidate(pk)
+        else:
+            snapshot_cache.remember(instance)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rolled_back(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    for snapshot_cache, pk in (pending or {}):
+        snapshot_cache.invalidate(pk)
@@ -0,0 +1,65 @@
+"""Offline progression: what a character earned while the player was away.
+
+Nothing ticks while a player is offline. When they come back, the time since
+``Character.last_played`` is turned into a number of idle ticks (one explore and
+one fight every IDLE_TICK_SECONDS, capped at IDLE_MAX_SECONDS) and the
+rewards for all of them are computed at once:
+
+* XP and gold are expected values, ticks x the per-tick mean from the game
+  data, scaled by IDLE_EFFICIENCY.
+* Loot is a single multinomial draw over the explore events that drop an
+  item, so item counts vary like real play without a loop over ticks.
+
+The cost is the same for ten minutes away or twelve hours, and there is no
+scheduler whose work grows with the number of players.
+
+Only whole ticks are paid: ``last_played`` moves forward by the ticks
+granted, so the remainder carries over to the next check-in.
+
+app.py credits it (credit_offline_progress) whenever a character's game
+page is opened. Game.apply_offline_progress does the same for the
+app/models package.
+"""
+IDLE_TICK_SECONDS = 5 * 60
+IDLE_MAX_SECONDS = 12 * 60 * 60
+# Share of active-play rewards earned while away
+IDLE_EFFICIENCY = 0.5
+
+
+def idle_rates(content):
+    """Expected XP and gold per tick and the per-tick drop chance of each item"""
+    sampler = content.explore_sampler
+    gold = 0.0
+    items = {}
+    for index, event in enumerate(sampler.items):
+        p = sampler.probability(index)
+        gold += p * event['effect'].get('gold', 0)
+        if 'item' in event['effect']:
+            items[event['effect']['item']] = items.get(event['effect']['item'], 0.0) + p
+    monsters = list(content.single_monsters.values())
+    xp = sum(monster['xp'] for monster in monsters) / len(monsters) if monsters else 0.0
+    return {'xp': xp, 'gold': gold, 'items': items}
+
+
+def idle_ticks(seconds):
+    return int(min(max(seconds, 0), IDLE_MAX_SECONDS) // IDLE_TICK_SECONDS)
+
+
+def offline_rewards(seconds, rates, efficiency=IDLE_EFFICIENCY, rng=None):
+    """{'ticks', 'xp', 'gold', 'loot': {item: count}} for ``seconds`` spent offline"""
+    ticks = idle_ticks(seconds)
+    rewards = {
+        'ticks': ticks,
+        'xp': round(ticks * efficiency * rates['xp']),
+        'gold': round(ticks * efficiency * rates['gold']),
+        'loot': {},
+    }
+    if ticks and rates['items']:
+        import numpy as np
+
+        rng = rng if rng is not None else np.random.default_rng()
+        names = list(rates['items'])
+        chances = [rates['items'][name] * efficiency for name in names]
+        counts = rng.multinomial(ticks, chances + [max(0.0, 1.0 - sum(chances))])
+        rewards['loot'] = {name: int(count) for name, count in zip(names, counts) if count}
+    return rewards
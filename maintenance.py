@@ -0,0 +1,157 @@
+"""Bulk fixes to the character table, run from the ``flask characters`` commands.
+
+Loading every Character and calling a method on it holds the whole table in
+memory and keeps one long write transaction open. These jobs walk the table
+in primary-key ranges of ``chunk_size`` ids instead:
+
+* rest and level-up are single UPDATE statements per range, the rules
+  written as SQL expressions;
+* recompute-max-hp needs rules.wave_clear_max_hp, so each range is read
+  as (id, level, max_hp) tuples and written back with one executemany UPDATE.
+
+Each range is its own short transaction, followed by a ``pause`` so live
+requests get the write lock in between. Every UPDATE bumps ``version``, so a
+turn that loaded the row before the change fails its compare-and-swap and
+retries on fresh data, and cached rows and fragments are invalidated.
+
+The last id done is stored in ``maintenance_checkpoint`` in the same
+transaction as the range, so an interrupted job picks up where it stopped
+and no row is changed twice. A finished job is not run again unless
+restarted. The id range is fixed when a job starts; characters created later
+are left alone.
+"""
+import time
+
+from sqlalchemy import and_, bindparam, case, func, select, text
+
+from rules import DEFAULT_LEVEL_UP_HIT_POINTS, LEVEL_UP_HIT_POINTS, wave_clear_max_hp
+
+DEFAULT_CHUNK_SIZE = 1000
+# Seconds between ranges for live requests to take the write lock
+DEFAULT_PAUSE = 0.05
+
+
+class JobFinished(Exception):
+    pass
+
+
+def _ensure_checkpoint_table(conn):
+    conn.execute(text('CREATE TABLE IF NOT EXISTS maintenance_checkpoint '
+                      '(job TEXT PRIMARY KEY, last_id INTEGER NOT NULL, end_id INTEGER NOT NULL, '
+                      'rows INTEGER NOT NULL, finished INTEGER NOT NULL)'))
+
+
+def _floor_half(value):
+    """value // 2 in SQL (integer division truncates towards zero there)"""
+    return (value - (value % 2 + 2) % 2) // 2
+
+
+def bump_version(characters):
+    """The mapper's (version or 0) + 1; rows from before the version column hold NULL"""
+    return func.coalesce(characters.c.version, 0) + 1
+
+
+def rest_statement(characters, lo, hi):
+    """Game.rest for every character in (lo, hi]"""
+    return (characters.update()
+            .where(characters.c.id > lo, characters.c.id <= hi, characters.c.hp < characters.c.max_hp)
+            .values(hp=characters.c.max_hp, version=bump_version(characters)))
+
+
+def level_up_statement(characters, lo, hi, min_xp):
+    """Character.level_up for characters in (lo, hi] with at least ``min_xp`` experience"""
+    c = characters.c
+    increase = case(LEVEL_UP_HIT_POINTS, value=c.char_class, else_=DEFAULT_LEVEL_UP_HIT_POINTS) \
+        + _floor_half(c.constitution - 10)
+    max_hp = c.max_hp + case((increase < 1, 1), else_=increase)  # Minimum 1 HP per level
+    return (characters.update()
+            .where(c.id > lo, c.id <= hi, c.experience >= min_xp)
+            .values(level=c.level + 1, max_hp=max_hp, hp=max_hp, version=bump_version(characters)))
+
+
+def recompute_max_hp(conn, characters, lo, hi):
+    """Reset max_hp to wave_clear_max_hp(level) in (lo, hi]; hp is capped at the new maximum
+
+    Level 1 characters keep their class's starting HP.
+    """
+    c = characters.c
+    rows = conn.execute(select(c.id, c.level, c.max_hp)
+                        .where(c.id > lo, c.id <= hi, c.level > 1)).all()
+    params = [{'row_id': row_id, 'new_max_hp': wave_clear_max_hp(level)}
+              for row_id, level, max_hp in rows if max_hp != wave_clear_max_hp(level)]
+    if not params:
+        return 0
+    new_max_hp = bindparam('new_max_hp')
+    conn.execute(characters.update().where(c.id == bindparam('row_id'))
+                 .values(max_hp=new_max_hp, hp=case((c.hp > new_max_hp, new_max_hp), else_=c.hp),
+                         version=bump_version(characters)), params)
+    return len(params)
+
+
+def job_name(command, **params):
+    """Checkpoint key: the command plus its parameters, so different runs resume separately"""
+    return ' '.join([command] + [f'{key}={value}' for key, value in sorted(params.items())])
+
+
+def run_chunked(engine, characters, job, apply_range, chunk_size=DEFAULT_CHUNK_SIZE, pause=DEFAULT_PAUSE,
+                restart=False, progress=None):
+    """Run ``apply_range(conn, lo, hi)`` over the id ranges of the character table
+
+    ``apply_range`` returns the rows it changed. ``progress(done_id, end_id,
+    rows)`` is called after every range. Returns the total of changed rows.
+    Raises JobFinished if the job already ran to the end and restart is false.
+    """
+    with engine.begin() as conn:
+        _ensure_checkpoint_table(conn)
+        if restart:
+            conn.execute(text('DELETE FROM maintenance_checkpoint WHERE job = :job'), {'job': job})
+        checkpoint = conn.execute(text('SELECT last_id, end_id, rows, finished FROM maintenance_checkpoint '
+                                       'WHERE job = :job'), {'job': job}).first()
+        if checkpoint is None:
+            end_id = conn.execute(select(func.max(characters.c.id))).scalar() or 0
+            checkpoint = (0, end_id, 0, 0)
+            conn.execute(text('INSERT INTO maintenance_checkpoint (job, last_id, end_id, rows, finished) '
+                              'VALUES (:job, 0, :end_id, 0, 0)'), {'job': job, 'end_id': end_id})
+    last_id, end_id, rows, finished = checkpoint
+    if finished:
+        raise JobFinished(job)
+
+    while last_id < end_id:
+        # Skip gaps in the ids so a range never comes back empty just because of deleted rows
+        with engine.connect() as conn:
+            next_id = conn.execute(select(func.min(characters.c.id))
+                                   .where(and_(characters.c.id > last_id, characters.c.id <= end_id))
+                                   ).scalar()
+        hi = end_id if next_id is None else min(end_id, next_id - 1 + chunk_size)
+        with engine.begin() as conn:
+            changed = apply_range(conn, last_id, hi) or 0
+            conn.execute(text('UPDATE maintenance_checkpoint SET last_id = :hi, rows = rows + :changed '
+                              'WHERE job = :job'), {'hi': hi, 'changed': changed, 'job': job})
+        last_id = hi
+        rows += changed
+        if progress is not None:
+            progress(last_id, end_id, rows)
+        if pause and last_id < end_id:
+            time.sleep(pause)
+
+    with engine.begin() as conn:
+        conn.execute(text('UPDATE maintenance_checkpoint SET finished = 1 WHERE job = :job'), {'job': job})
+    return rows
+
+
+def rest_range(characters):
+    def apply(conn, lo, hi):
+        return conn.execute(rest_statement(characters, lo, hi)).rowcount
+    return apply
+
+
+def level_up_range(characters, min_xp):
+    def apply(conn, lo, hi):
+        return conn.execute(level_up_statement(characters, lo, hi, min_xp)).rowcount
+    return apply
+
+
+def recompute_max_hp_range(characters):
+    def apply(conn, lo, hi):
+        return recompute_max_hp(conn, characters, lo, hi)
+    return apply
@@ -0,0 +1,205 @@
+"""Request instrumentation exposed in the Prometheus text format.
+
+Per request it records the duration (by endpoint), how many SQL statements
+ran and how long they took (SQLAlchemy cursor events), how long each
+template took to render (Flask template signals) and the size of the
+session cookie the browser sent. Everything goes into fixed-bucket
+histograms, so recording an event is a bisect and two additions under a lock.
+
+Requests are recorded when the request context is torn down, so a view that
+raises is still counted (as status 500). A streamed response (the
+auto-battle event stream) is torn down when its generator finishes if it is
+wrapped in stream_with_context, so it is timed until the last event; those
+go into a separate histogram with longer buckets instead of skewing the
+request durations. A generator without stream_with_context is only timed
+up to the first byte.
+
+    metrics = Metrics(app, db.engine)
+    ...
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, has_request_context, request
+from flask.signals import before_render_template, template_rendered
+from sqlalchemy import event
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+STREAM_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34)
+COOKIE_BUCKETS = (0, 64, 128, 256, 512, 1024, 2048, 4096)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    def __init__(self, name, help_text, buckets, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # one slot per bucket plus +Inf, then sum
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), values):
+                cumulative += count
+                le = bound if bound == '+Inf' else _format_value(bound)
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, [("le", le)])} '
+                             f'{cumulative}')
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_value(values[-1])}')
+            lines.append(f'{self.name}_count{label_text} {cumulative}')
+        return lines
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+
+class Metrics:
+    """Hooks the app and engine and keeps the histograms served by /metrics"""
+
+    def __init__(self, app=None, engine=None, prefix='dnd'):
+        self.request_duration = Histogram(
+            f'{prefix}_request_duration_seconds', 'Time spent handling a request.',
+            DURATION_BUCKETS, ('endpoint', 'method'))
+        self.stream_duration = Histogram(
+            f'{prefix}_stream_duration_seconds', 'Time from request to the end of a streamed response.',
+            STREAM_BUCKETS, ('endpoint', 'method'))
+        self.requests = Counter(
+            f'{prefix}_requests_total', 'Requests handled.', ('endpoint', 'method', 'status'))
+        self.sql_queries = Histogram(
+            f'{prefix}_request_sql_queries', 'SQL statements executed per request.',
+            QUERY_BUCKETS, ('endpoint',))
+        self.sql_duration = Histogram(
+            f'{prefix}_request_sql_seconds', 'Time spent in SQL per request.',
+            DURATION_BUCKETS, ('endpoint',))
+        self.template_duration = Histogram(
+            f'{prefix}_template_render_seconds', 'Time spent rendering a template.',
+            DURATION_BUCKETS, ('template',))
+        self.session_cookie = Histogram(
+            f'{prefix}_session_cookie_bytes', 'Size of the session cookie sent by the client.',
+            COOKIE_BUCKETS)
+        self._all = (self.request_duration, self.stream_duration, self.requests, self.sql_queries, self.sql_duration,
+                     self.template_duration, self.session_cookie)
+        if app is not None:
+            self.init_app(app, engine)
+
+    def init_app(self, app, engine):
+        self._cookie_name = app.config.get('SESSION_COOKIE_NAME', 'session')
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        before_render_template.connect(self._before_render, app, weak=False)
+        template_rendered.connect(self._after_render, app, weak=False)
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+
+    def render(self):
+        lines = []
+        for metric in self._all:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def _before_request(self):
+        g._metrics_started = time.perf_counter()
+        g._metrics_sql = [0, 0.0]
+        self.session_cookie.observe(len(request.cookies.get(self._cookie_name, '')))
+
+    def _after_request(self, response):
+        g._metrics_response = (response.status_code, response.is_streamed)
+        return response
+
+    def _teardown_request(self, exc):
+        started = g.pop('_metrics_started', None)
+        if started is None:
+            return
+        # No response when the view raised and the exception propagates (debug, testing)
+        status, streamed = g.pop('_metrics_response', (500, False))
+        if exc is not None:
+            status = 500
+        endpoint = request.endpoint or 'unmatched'
+        duration = self.stream_duration if streamed else self.request_duration
+        duration.observe(time.perf_counter() - started, endpoint, request.method)
+        self.requests.inc(endpoint, request.method, str(status))
+        count, seconds = g.pop('_metrics_sql', (0, 0.0))
+        self.sql_queries.observe(count, endpoint)
+        self.sql_duration.observe(seconds, endpoint)
+
+    def _before_render(self, sender, template, context, **extra):
+        if has_request_context():
+            g.setdefault('_metrics_renders', []).append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        renders = g.get('_metrics_renders') if has_request_context() else None
+        if renders:
+            self.template_duration.observe(time.perf_counter() - renders.pop(), template.name or '')
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Kept on the statement's own context: one that raises never reaches _after_execute
+        context._metrics_started = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_metrics_started', None)
+        if started is None:
+            return
+        # Background work (write-behind flushes) has no request to charge the query to
+        if has_request_context():
+            sql = g.get('_metrics_sql')
+            if sql is not None:
+                sql[0] += 1
+                sql[1] += time.perf_counter() - started
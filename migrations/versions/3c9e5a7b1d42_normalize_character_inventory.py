@@ -0,0 +1,165 @@
+"""normalize character inventory
+
+Moves Character.inventory (a JSON list in a VARCHAR(500)) into the item and
+character_item tables and turns equipment and abilities into JSON columns.
+Existing characters are converted in batches of BATCH_SIZE rows so the
+upgrade never holds the whole table in memory.
+
+Databases created by db.create_all() before this revision have no
+alembic_version table; run `flask db stamp 6ec618d622fa` once first.
+
+Revision ID: 3c9e5a7b1d42
+Revises: 6ec618d622fa
+Create Date: 2026-10-18 09:12:00.000000
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9e5a7b1d42'
+down_revision = '6ec618d622fa'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+character_table = sa.table(
+    'character',
+    sa.column('id', sa.Integer),
+    sa.column('inventory', sa.String),
+)
+item_table = sa.Table(
+    'item',
+    sa.MetaData(),
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('name', sa.String),
+)
+character_item_table = sa.table(
+    'character_item',
+    sa.column('character_id', sa.Integer),
+    sa.column('item_id', sa.Integer),
+    sa.column('quantity', sa.Integer),
+)
+
+
+def _count_items(raw):
+    """Turn a legacy inventory list into {name: quantity}
+
+    Old inventories were plain lists of names, except gold which was stored
+    as a 'Gold', <amount> pair.
+    """
+    try:
+        entries = json.loads(raw or '[]')
+    except ValueError:
+        return {}
+    counts = {}
+    i = 0
+    while i < len(entries):
+        name = entries[i]
+        quantity = 1
+        if name == 'Gold' and i + 1 < len(entries) and isinstance(entries[i + 1], int):
+            quantity = entries[i + 1]
+            i += 1
+        if isinstance(name, str) and quantity > 0:
+            counts[name] = counts.get(name, 0) + quantity
+        i += 1
+    return counts
+
+
+def _batches(conn, query):
+    """Yield rows of `query` (ordered by character id) BATCH_SIZE at a time"""
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            query.where(character_table.c.id > last_id)
+            .order_by(character_table.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    # db.create_all() in app.py may already have created the new tables
+    if not inspector.has_table('item'):
+        op.create_table(
+            'item',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('name')
+        )
+    if not inspector.has_table('character_item'):
+        op.create_table(
+            'character_item',
+            sa.Column('character_id', sa.Integer(), nullable=False),
+            sa.Column('item_id', sa.Integer(), nullable=False),
+            sa.Column('quantity', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['character_id'], ['character.id'], ),
+            sa.ForeignKeyConstraint(['item_id'], ['item.id'], ),
+            sa.PrimaryKeyConstraint('character_id', 'item_id')
+        )
+        op.create_index('ix_character_item_character_id', 'character_item', ['character_id'])
+
+    item_ids = dict(conn.execute(sa.select(item_table.c.name, item_table.c.id)).fetchall())
+    query = sa.select(character_table.c.id, character_table.c.inventory)
+    for rows in _batches(conn, query):
+        new_rows = []
+        for character_id, raw in rows:
+            for name, quantity in _count_items(raw).items():
+                if name not in item_ids:
+                    result = conn.execute(item_table.insert().values(name=name))
+                    item_ids[name] = result.inserted_primary_key[0]
+                new_rows.append({'character_id': character_id, 'item_id': item_ids[name],
+                                 'quantity': quantity})
+        if new_rows:
+            conn.execute(character_item_table.insert(), new_rows)
+
+    with op.batch_alter_table('character', schema=None) as batch_op:
+        batch_op.drop_column('inventory')
+        batch_op.alter_column('equipment', existing_type=sa.String(length=500), type_=sa.JSON())
+        batch_op.alter_column('abilities', existing_type=sa.String(length=500), type_=sa.JSON())
+
+
+def downgrade():
+    with op.batch_alter_table('character', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('inventory', sa.String(length=500), nullable=True))
+        batch_op.alter_column('equipment', existing_type=sa.JSON(), type_=sa.String(length=500))
+        batch_op.alter_column('abilities', existing_type=sa.JSON(), type_=sa.String(length=500))
+
+    conn = op.get_bind()
+    names = dict(conn.execute(sa.select(item_table.c.id, item_table.c.name)).fetchall())
+    query = sa.select(character_table.c.id)
+    for rows in _batches(conn, query):
+        ids = [row[0] for row in rows]
+        inventories = {character_id: [] for character_id in ids}
+        owned = conn.execute(
+            sa.select(character_item_table.c.character_id, character_item_table.c.item_id,
+                      character_item_table.c.quantity)
+            .where(character_item_table.c.character_id.in_(ids))
+        ).fetchall()
+        for character_id, item_id, quantity in owned:
+            name = names[item_id]
+            if name == 'Gold':
+                inventories[character_id].extend(['Gold', quantity])
+            else:
+                inventories[character_id].extend([name] * quantity)
+        for character_id, inventory in inventories.items():
+            conn.execute(
+                character_table.update()
+                .where(character_table.c.id == character_id)
+                .values(inventory=json.dumps(inventory))
+            )
+
+    op.drop_index('ix_character_item_character_id', table_name='character_item')
+    op.drop_table('character_item')
+    op.drop_table('item')
@@ -0,0 +1,30 @@
+"""add character last_played
+
+Unix time of a character's last turn, used to credit offline progression
+(idle.py). Existing characters get NULL and start counting at their next
+visit.
+
+Revision ID: 8d41f0c2b7e5
+Revises: 3c9e5a7b1d42
+Create Date: 2026-10-18 20:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41f0c2b7e5'
+down_revision = '3c9e5a7b1d42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('character', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_played', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('character', schema=None) as batch_op:
+        batch_op.drop_column('last_played')
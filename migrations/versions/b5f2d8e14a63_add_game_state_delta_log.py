@@ -0,0 +1,76 @@
+"""add game state delta log
+
+Adds Game.state_seq / Game.snapshot_seq and the game_state_delta table used
+by Game.save_game_state (app/models, state_log.py). Existing games keep
+their game_state blob: with state_seq 0 it is read once as the starting
+state and the first save writes a snapshot, so no data is copied here.
+
+Only databases that have a game table (created from app/models) are
+changed; app.py's schema has none and this revision is a no-op there.
+
+Revision ID: b5f2d8e14a63
+Revises: 8d41f0c2b7e5
+Create Date: 2026-10-18 21:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5f2d8e14a63'
+down_revision = '8d41f0c2b7e5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('game'):
+        return
+
+    # db.create_all() may already have created the new columns and table
+    columns = {column['name'] for column in inspector.get_columns('game')}
+    with op.batch_alter_table('game', schema=None) as batch_op:
+        for name in ('state_seq', 'snapshot_seq'):
+            if name not in columns:
+                batch_op.add_column(sa.Column(name, sa.Integer(), nullable=False, server_default='0'))
+    if not inspector.has_table('game_state_delta'):
+        op.create_table(
+            'game_state_delta',
+            sa.Column('game_id', sa.Integer(), nullable=False),
+            sa.Column('seq', sa.Integer(), nullable=False),
+            sa.Column('is_snapshot', sa.Boolean(), nullable=False),
+            sa.Column('payload', sa.LargeBinary(), nullable=False),
+            sa.ForeignKeyConstraint(['game_id'], ['game.id'], ),
+            sa.PrimaryKeyConstraint('game_id', 'seq')
+        )
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('game'):
+        return
+
+    # Fold each game's log back into game_state before dropping it
+    if inspector.has_table('game_state_delta'):
+        from state_log import replay
+
+        conn = op.get_bind()
+        game = sa.table('game', sa.column('id', sa.Integer), sa.column('game_state', sa.JSON),
+                        sa.column('snapshot_seq', sa.Integer))
+        delta = sa.table('game_state_delta', sa.column('game_id', sa.Integer), sa.column('seq', sa.Integer),
+                         sa.column('is_snapshot', sa.Boolean), sa.column('payload', sa.LargeBinary))
+        for game_id, snapshot_seq in conn.execute(sa.select(game.c.id, game.c.snapshot_seq)).fetchall():
+            rows = conn.execute(
+                sa.select(delta.c.is_snapshot, delta.c.payload)
+                .where(delta.c.game_id == game_id, delta.c.seq >= snapshot_seq)
+                .order_by(delta.c.seq)
+            ).fetchall()
+            if rows:
+                conn.execute(game.update().where(game.c.id == game_id).values(game_state=replay(rows)))
+        op.drop_table('game_state_delta')
+
+    with op.batch_alter_table('game', schema=None) as batch_op:
+        batch_op.drop_column('snapshot_seq')
+        batch_op.drop_column('state_seq')
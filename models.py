@@ -1,6 +1,5 @@
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
-from . import db
+from . import db, password_hasher
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -9,10 +8,14 @@ class User(UserMixin, db.Model):
     characters = db.relationship('Character', backref='user', lazy=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        """Verify password, rehashing a weaker stored hash in place (the caller commits)"""
+        ok, upgrade = password_hasher.verify(self.password_hash, password)
+        if upgrade:
+            self.set_password(password)
+        return ok
 
     def __repr__(self):
         return f'<User {self.username}>'
@@ -0,0 +1,142 @@
+"""Password hashing on a small, bounded thread pool.
+
+PBKDF2 is slow on purpose. Run inline, a burst of logins after a deploy
+takes every core and stalls the combat requests sharing the worker. The
+hasher runs at most PASSWORD_HASH_WORKERS hashes at once; hashlib releases
+the GIL while it works, so the other request threads keep running.
+Callers waiting beyond PASSWORD_HASH_QUEUE get PasswordHasherBusy instead of
+piling up.
+
+The work factor is PASSWORD_HASH_ITERATIONS. Stored values that are not a
+hash (the plaintext rows the monolith used to write), or that were hashed
+with a different work factor, are reported by verify() as needing a rehash,
+so the login view can upgrade them once the password is known to be right.
+
+    password_hasher = PasswordHasher(app)
+    ok, upgrade = password_hasher.verify(user.password, form.password.data)
+"""
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_ITERATIONS = 600_000
+DEFAULT_QUEUE = 64
+QUEUE_TIMEOUT = 10.0
+
+HASH_PREFIXES = ('pbkdf2:', 'scrypt:')
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Too many hashes are already queued"""
+
+
+def default_workers():
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords on a bounded pool (workers=0 hashes inline)"""
+
+    def __init__(self, app=None, iterations=DEFAULT_ITERATIONS, workers=None, max_pending=DEFAULT_QUEUE):
+        self._executor = None
+        self._lock = threading.Lock()
+        self.hashed = 0
+        self.verified = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.configure(iterations, default_workers() if workers is None else workers, max_pending)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_ITERATIONS', self.iterations)
+        app.config.setdefault('PASSWORD_HASH_WORKERS', self.workers)
+        app.config.setdefault('PASSWORD_HASH_QUEUE', self.max_pending)
+        self.configure(app.config['PASSWORD_HASH_ITERATIONS'], app.config['PASSWORD_HASH_WORKERS'],
+                       app.config['PASSWORD_HASH_QUEUE'])
+
+    def configure(self, iterations, workers, max_pending):
+        """Change the work factor or pool size; the old pool finishes its queue"""
+        with self._lock:
+            old, self._executor = self._executor, None
+            self.iterations = int(iterations)
+            self.workers = int(workers)
+            self.max_pending = int(max_pending)
+            self._slots = threading.BoundedSemaphore(self.max_pending)
+        if old is not None:
+            old.shutdown(wait=False)
+
+    @property
+    def method(self):
+        return f'pbkdf2:sha256:{self.iterations}'
+
+    def hash(self, password):
+        """Salted hash of password, computed on the pool"""
+        with self._lock:
+            self.hashed += 1
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, stored, password):
+        """(matches, needs_rehash) for a stored hash or legacy plaintext value"""
+        with self._lock:
+            self.verified += 1
+        if not stored:
+            return False, False
+        if not stored.startswith(HASH_PREFIXES):
+            # Legacy plaintext row: cheap to check, and always worth upgrading
+            ok = hmac.compare_digest(stored.encode('utf-8'), password.encode('utf-8'))
+            return ok, ok
+        ok = self._run(check_password_hash, stored, password)
+        return ok, ok and self.needs_rehash(stored)
+
+    def needs_rehash(self, stored):
+        """True when stored is not a hash at the current work factor"""
+        return not stored.startswith(self.method + '$')
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'iterations': self.iterations,
+                'queue_limit': self.max_pending,
+                'in_flight': self.in_flight,
+                'peak_in_flight': self.peak_in_flight,
+                'hashed': self.hashed,
+                'verified': self.verified,
+                'rejected_busy': self.rejected,
+            }
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='password-hash')
+            return self._executor, self._slots
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        executor, slots = self._pool()
+        if not slots.acquire(timeout=QUEUE_TIMEOUT):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHasherBusy('password hashing queue is full')
+        with self._lock:
+            # Running plus queued hashes; at queue_limit new callers wait, then get PasswordHasherBusy
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            future = executor.submit(fn, *args)
+        except BaseException:
+            self._done(slots)
+            raise
+        future.add_done_callback(lambda _: self._done(slots))
+        return future.result()
+
+    def _done(self, slots):
+        with self._lock:
+            self.in_flight -= 1
+        slots.release()
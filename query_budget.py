@@ -0,0 +1,96 @@
+"""Cap how many SQL statements a block of code or a view may run.
+
+    install(db.engine)
+
+    @app.route('/character/select')
+    @login_required
+    @query_budget(2)
+    def character_select():
+        ...
+
+    with QueryBudget(3, label='load roster'):
+        ...
+
+Statements are counted with a SQLAlchemy cursor event. Going over budget
+raises QueryBudgetExceeded (an AssertionError) when the app is under test
+(``app.testing`` or QUERY_BUDGET_STRICT), and is logged as a warning with
+the offending statements otherwise, so an N+1 in a template fails the
+tests instead of quietly growing with the user's roster.
+"""
+import contextvars
+import functools
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+_active = contextvars.ContextVar('query_budget_active', default=())
+_installed = set()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """More SQL statements ran than the budget allows"""
+
+
+def install(engine):
+    """Count statements on engine toward the active budgets (idempotent)"""
+    if id(engine) in _installed:
+        return
+    _installed.add(id(engine))
+    event.listen(engine, 'before_cursor_execute', _count)
+
+
+def _count(conn, cursor, statement, parameters, context, executemany):
+    for budget in _active.get():
+        budget.statements.append(statement)
+
+
+class QueryBudget:
+    """Context manager allowing at most ``limit`` statements inside the block"""
+
+    def __init__(self, limit, label=None, strict=None):
+        self.limit = limit
+        self.label = label or 'block'
+        self.strict = strict
+        self.statements = []
+        self._token = None
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __enter__(self):
+        self.statements = []
+        self._token = _active.set(_active.get() + (self,))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _active.reset(self._token)
+        if exc_type is None and self.count > self.limit:
+            self._report()
+        return False
+
+    def _is_strict(self):
+        if self.strict is not None:
+            return self.strict
+        if not has_app_context():
+            return True
+        return current_app.testing or current_app.config.get('QUERY_BUDGET_STRICT', False)
+
+    def _report(self):
+        message = (f"{self.label} ran {self.count} SQL statements, budget is {self.limit}:\n"
+                   + '\n'.join(f"  {statement}" for statement in self.statements))
+        if self._is_strict():
+            raise QueryBudgetExceeded(message)
+        if has_app_context():
+            current_app.logger.warning(message)
+
+
+def query_budget(limit):
+    """Decorate a view so each call may run at most ``limit`` statements"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with QueryBudget(limit, label=view.__name__):
+                return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,161 @@
+"""Many characters as one struct of NumPy arrays.
+
+A game.Character dataclass or an ORM Character row costs hundreds of bytes
+of Python objects, and batch tools that hold tens of thousands of them spend
+their time in attribute lookups. A Roster keeps one typed array per column
+instead (abilities, hp, max_hp, level, experience, a class code and the row
+id), with names packed into one UTF-8 buffer plus offsets, about 50 bytes per
+character.
+
+    roster = Roster.from_characters(session.scalars(select(Character)))
+    roster.level_up(roster.hp > 0)
+    roster.rest()
+    session.execute(update(Character), roster.update_params())
+
+``level_up``, ``rest`` and ``generate_stats`` do the same as
+app/models Character.level_up, game.Game.rest and game.Character.generate_stats,
+for every character at once or for the ones selected by a boolean mask.
+Inventories are not part of a roster.
+"""
+import numpy as np
+
+import dice
+from rules import DEFAULT_LEVEL_UP_HIT_POINTS, LEVEL_UP_HIT_POINTS
+
+ABILITIES = ('strength', 'dexterity', 'constitution', 'intelligence', 'wisdom', 'charisma')
+
+ABILITY_DTYPE = np.int16
+HP_DTYPE = np.int32
+
+
+def _pack_names(names):
+    encoded = [name.encode('utf-8') for name in names]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(name) for name in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8).copy(), offsets
+
+
+class Roster:
+    """Struct-of-arrays view of ``len(roster)`` characters"""
+
+    def __init__(self, names, classes, ids=None, level=None, experience=None, hp=None, max_hp=None,
+                 abilities=None):
+        n = len(names)
+        self.name_data, self.name_offsets = _pack_names(names)
+        self.class_names = sorted(set(classes))
+        codes = {name: code for code, name in enumerate(self.class_names)}
+        self.class_code = np.fromiter((codes[c] for c in classes), dtype=np.uint8, count=n)
+        self.id = np.asarray(ids if ids is not None else np.zeros(n), dtype=np.int64)
+        self.level = np.asarray(level if level is not None else np.ones(n), dtype=np.int16)
+        self.experience = np.asarray(experience if experience is not None else np.zeros(n), dtype=np.int32)
+        self.abilities = np.asarray(abilities if abilities is not None else np.full((n, len(ABILITIES)), 10),
+                                    dtype=ABILITY_DTYPE).reshape(n, len(ABILITIES))
+        self.max_hp = np.asarray(max_hp if max_hp is not None else np.full(n, 10), dtype=HP_DTYPE)
+        self.hp = np.asarray(hp if hp is not None else self.max_hp, dtype=HP_DTYPE).copy()
+
+    def __len__(self):
+        return len(self.class_code)
+
+    @classmethod
+    def from_characters(cls, characters):
+        """Build from game.Character dataclasses or ORM Character rows"""
+        characters = list(characters)
+        return cls(
+            names=[c.name for c in characters],
+            classes=[c.char_class for c in characters],
+            ids=[getattr(c, 'id', None) or 0 for c in characters],
+            level=[c.level or 1 for c in characters],
+            experience=[getattr(c, 'experience', 0) or 0 for c in characters],
+            hp=[c.hp for c in characters],
+            max_hp=[c.max_hp for c in characters],
+            abilities=[[getattr(c, ability) for ability in ABILITIES] for c in characters],
+        )
+
+    def name(self, index):
+        start, end = self.name_offsets[index], self.name_offsets[index + 1]
+        return self.name_data[start:end].tobytes().decode('utf-8')
+
+    def char_class(self, index):
+        return self.class_names[self.class_code[index]]
+
+    def ability(self, name):
+        """Column of one ability (a view, writes go through)"""
+        return self.abilities[:, ABILITIES.index(name)]
+
+    def modifier(self, name):
+        return (self.ability(name).astype(HP_DTYPE) - 10) // 2
+
+    def row(self, index):
+        """Column values of one character as a dict"""
+        values = {
+            'name': self.name(index),
+            'char_class': self.char_class(index),
+            'level': int(self.level[index]),
+            'experience': int(self.experience[index]),
+            'hp': int(self.hp[index]),
+            'max_hp': int(self.max_hp[index]),
+        }
+        values.update(zip(ABILITIES, self.abilities[index].tolist()))
+        return values
+
+    def to_dataclasses(self):
+        """New game.Character objects (empty inventories)"""
+        from game import Character
+
+        characters = []
+        for index in range(len(self)):
+            values = self.row(index)
+            del values['experience']
+            characters.append(Character(**values))
+        return characters
+
+    def apply_to(self, characters):
+        """Copy the numeric columns back onto the objects the roster was built from"""
+        columns = [('level', self.level.tolist()), ('hp', self.hp.tolist()), ('max_hp', self.max_hp.tolist())]
+        columns += [(ability, self.abilities[:, i].tolist()) for i, ability in enumerate(ABILITIES)]
+        experience = self.experience.tolist()
+        for index, character in enumerate(characters):
+            for column, values in columns:
+                setattr(character, column, values[index])
+            if hasattr(character, 'experience'):
+                character.experience = experience[index]
+
+    def update_params(self):
+        """executemany parameters for ``session.execute(update(Character), ...)`` by primary key"""
+        columns = {'id': self.id, 'level': self.level, 'experience': self.experience,
+                   'hp': self.hp, 'max_hp': self.max_hp}
+        columns.update((ability, self.abilities[:, i]) for i, ability in enumerate(ABILITIES))
+        lists = {column: values.tolist() for column, values in columns.items()}
+        return [dict(zip(lists, values)) for values in zip(*lists.values())]
+
+    def _select(self, mask):
+        return slice(None) if mask is None else np.asarray(mask, dtype=bool)
+
+    def level_up(self, mask=None):
+        """Character.level_up for every character (or those where ``mask`` is true)"""
+        rows = self._select(mask)
+        hit_points = np.array([LEVEL_UP_HIT_POINTS.get(name, DEFAULT_LEVEL_UP_HIT_POINTS)
+                               for name in self.class_names], dtype=HP_DTYPE)
+        increase = hit_points[self.class_code[rows]] + self.modifier('constitution')[rows]
+        self.level[rows] += 1
+        self.max_hp[rows] += np.maximum(1, increase)  # Minimum 1 HP per level
+        self.hp[rows] = self.max_hp[rows]
+
+    def rest(self, mask=None):
+        """Game.rest: back to full HP"""
+        rows = self._select(mask)
+        self.hp[rows] = self.max_hp[rows]
+
+    def generate_stats(self, mask=None, rng=None):
+        """Character.generate_stats: 4d6 drop lowest per ability, then max HP from constitution"""
+        rows = np.arange(len(self))[self._select(mask)]
+        rolls = dice.roll_many('4d6kh3', rows.size * len(ABILITIES), rng)
+        self.abilities[rows] = rolls.reshape(rows.size, len(ABILITIES))
+        self.max_hp[rows] = 10 + self.modifier('constitution')[rows]
+        self.hp[rows] = self.max_hp[rows]
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (
+            self.name_data, self.name_offsets, self.class_code, self.id, self.level, self.experience,
+            self.abilities, self.max_hp, self.hp))
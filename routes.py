@@ -3,8 +3,10 @@ from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from . import db
 from .models import User, Character
-from forms.forms import LoginForm, RegistrationForm, CharacterCreationForm
+from .forms.forms import LoginForm, RegistrationForm, CharacterCreationForm
 import random
+import dice
+from content import get_content
 
 main = Blueprint('main', __name__)
 
@@ -21,6 +23,7 @@ def login():
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
         if user and user.check_password(form.password.data):
+            db.session.commit()
             login_user(user)
             return redirect(url_for('main.character_select'))
         flash('Invalid username or password')
@@ -112,56 +115,94 @@ def game(character_id):
         return redirect(url_for('main.character_select'))
     return render_template('game.html', character=character)
 
-@main.route('/api/combat', methods=['POST'])
-@login_required
-def combat():
-    data = request.get_json()
-    character = Character.query.get_or_404(data['character_id'])
-    if character.user_id != current_user.id:
-        return jsonify({"error": "Unauthorized"}), 403
-    
-    monster = data['monster']
-    monster_stats = {
-        'Goblin': {'hp': 7, 'damage': (1, 6), 'xp': 50},
-        'Skeleton': {'hp': 13, 'damage': (1, 6), 'xp': 100},
-        'Orc': {'hp': 15, 'damage': (1, 8), 'xp': 150}
-    }
-    
-    # Combat simulation
-    monster_hp = monster_stats[monster]['hp']
-    damage_dice, damage_sides = monster_stats[monster]['damage']
-    
-    # Character's attack
-    attack_roll = random.randint(1, 20)
-    if attack_roll >= 10:  # Hit
-        char_damage = random.randint(1, 8) + (character.strength - 10) // 2
-        monster_hp -= char_damage
-        combat_log = f"You hit the {monster} for {char_damage} damage! "
+# Most actions one /api/combat/batch request may resolve
+MAX_BATCH_ACTIONS = 50
+
+def _resolve_exchange(character, monster, state, action='attack'):
+    """One exchange against a single monster: the character acts, then the monster answers
+
+    ``state`` carries the monster's hp between exchanges. A shield or dodge
+    only covers the monster's answer in the same exchange, as in a single
+    /api/combat request. Returns the log line for the exchange.
+    """
+    monster_stats = state['stats']
+    if action == 'attack':
+        attack_roll = dice.roll('1d20')
+        if attack_roll >= 10:  # Hit
+            char_damage = dice.roll('1d8') + (character.strength - 10) // 2
+            state['monster_hp'] -= char_damage
+            combat_log = f"You hit the {monster} for {char_damage} damage! "
+        else:
+            combat_log = f"You missed the {monster}! "
     else:
-        combat_log = f"You missed the {monster}! "
-    
+        ability = get_content().abilities[action]
+        if ability['type'] in ('attack_all', 'attack_single'):
+            state['monster_hp'] -= ability['damage']
+            combat_log = f"You use {action} and deal {ability['damage']} damage to the {monster}! "
+        elif ability['type'] == 'heal':
+            old_hp = character.hp
+            character.hp = min(character.hp + ability['heal'], character.max_hp)
+            combat_log = f"You use {action} and heal for {character.hp - old_hp} HP! "
+        elif ability['type'] == 'shield':
+            state['shield'] = ability['shield']
+            combat_log = f"You use {action} and gain {ability['shield']} shield! "
+        else:  # buff
+            state['dodge'] = ability['dodge']
+            combat_log = f"You use {action} and gain increased dodge chance! "
+
     # Monster's counterattack if still alive
-    if monster_hp > 0:
-        monster_attack = random.randint(1, 20)
-        if monster_attack >= 10:  # Hit
-            monster_damage = random.randint(damage_dice, damage_sides)
-            character.hp -= monster_damage
-            combat_log += f"The {monster} hits you for {monster_damage} damage!"
+    if state['monster_hp'] > 0:
+        monster_attack = dice.roll('1d20')
+        if state.get('dodge') and random.random() < state['dodge']:
+            combat_log += f"You dodge the {monster}'s attack!"
+        elif monster_attack >= 10:  # Hit
+            monster_damage = state['damage_dice'].roll()
+            absorbed = min(state.get('shield', 0), monster_damage)
+            state['shield'] = state.get('shield', 0) - absorbed
+            character.hp -= monster_damage - absorbed
+            combat_log += f"The {monster} hits you for {monster_damage - absorbed} damage!"
+            if absorbed:
+                combat_log += f" Your shield absorbed {absorbed}."
         else:
             combat_log += f"The {monster} misses you!"
     else:
         combat_log += f"You defeated the {monster}!"
-        character.experience += monster_stats[monster]['xp']
+        character.experience += monster_stats['xp']
         
         # Level up check
-        level_up = False
         while character.experience >= character.level * 1000:
             character.level += 1
-            level_up = True
+            state['level_up'] = True
             # Increase HP on level up
-            hp_increase = random.randint(1, 8) + (character.constitution - 10) // 2
+            hp_increase = dice.roll('1d8') + (character.constitution - 10) // 2
             character.max_hp += hp_increase
             character.hp = character.max_hp
+    state['shield'] = 0
+    state['dodge'] = 0
+    return combat_log
+
+def _new_encounter(monster):
+    monster_stats = get_content().single_monsters[monster]
+    return {
+        'stats': monster_stats,
+        'monster_hp': monster_stats['hp'],
+        'damage_dice': dice.compile_dice(monster_stats['damage']),
+        'shield': 0,
+        'dodge': 0,
+        'level_up': False,
+    }
+
+@main.route('/api/combat', methods=['POST'])
+@login_required
+def combat():
+    data = request.get_json()
+    character = Character.query.get_or_404(data['character_id'])
+    if character.user_id != current_user.id:
+        return jsonify({"error": "Unauthorized"}), 403
+    
+    monster = data['monster']
+    state = _new_encounter(monster)
+    combat_log = _resolve_exchange(character, monster, state)
     
     # Save character state
     db.session.commit()
@@ -170,7 +211,84 @@ def combat():
         "success": True,
         "message": combat_log,
         "character_hp": character.hp,
-        "new_level": level_up if monster_hp <= 0 else False
+        "new_level": state['level_up']
+    })
+
+@main.route('/api/combat/batch', methods=['POST'])
+@login_required
+def combat_batch():
+    """Resolve an ordered list of actions against one monster in a single transaction
+
+    Body: {"character_id": 1, "monster": "Goblin",
+           "actions": [{"action": "attack"}, {"action": "Fireball"}, ...]}
+    Stops early when the monster or the character drops to 0 HP.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "body must be a JSON object"}), 400
+    actions = data.get('actions')
+    if not isinstance(actions, list) or not actions:
+        return jsonify({"error": "actions must be a non-empty list"}), 400
+    if len(actions) > MAX_BATCH_ACTIONS:
+        return jsonify({"error": f"at most {MAX_BATCH_ACTIONS} actions per batch"}), 400
+    
+    monster = data.get('monster')
+    if not isinstance(monster, str) or monster not in get_content().single_monsters:
+        return jsonify({"error": f"Unknown monster {monster!r}"}), 400
+    
+    character_id = data.get('character_id')
+    if not isinstance(character_id, int) or isinstance(character_id, bool):
+        return jsonify({"error": "character_id must be an integer"}), 400
+    character = Character.query.get_or_404(character_id)
+    if character.user_id != current_user.id:
+        return jsonify({"error": "Unauthorized"}), 403
+    
+    # Validate the whole batch before resolving any of it
+    known = set(character.abilities or [])
+    names = []
+    for entry in actions:
+        name = entry.get('action', 'attack') if isinstance(entry, dict) else entry
+        if not isinstance(name, str):
+            return jsonify({"error": "each action must be a name or {\"action\": name}"}), 400
+        if name != 'attack' and name not in known:
+            return jsonify({"error": f"Unknown action {name!r}"}), 400
+        names.append(name)
+    
+    state = _new_encounter(monster)
+    turns = []
+    outcome = 'ongoing'
+    for turn, name in enumerate(names, start=1):
+        message = _resolve_exchange(character, monster, state, name)
+        turns.append({
+            "turn": turn,
+            "action": name,
+            "message": message,
+            "character_hp": character.hp,
+            "monster_hp": max(state['monster_hp'], 0),
+        })
+        if state['monster_hp'] <= 0:
+            outcome = 'victory'
+            break
+        if character.hp <= 0:
+            outcome = 'defeat'
+            break
+    
+    # One commit for the whole batch
+    db.session.commit()
+    
+    return jsonify({
+        "success": True,
+        "turns": turns,
+        "outcome": outcome,
+        "resolved": len(turns),
+        "character": {
+            "hp": character.hp,
+            "max_hp": character.max_hp,
+            "level": character.level,
+            "experience": character.experience,
+        },
+        "monster": {"name": monster, "hp": max(state['monster_hp'], 0)},
+        "new_level": state['level_up']
     })
 
 @main.route('/character/rest/<int:character_id>', methods=['POST'])
@@ -0,0 +1,67 @@
+"""Combat rules shared by the web routes and the offline simulator.
+
+Nothing here may import Flask or the database so the same numbers can be
+used headless. Monster, class and ability numbers come from the content
+registry (see content.py).
+"""
+from content import get_content
+
+WAVE_SIZE = 4
+WAVE_HP_SCALING = 0.5
+WAVE_XP_SCALING = 0.3
+BASIC_ATTACK_DICE = '1d8'
+# HP per level before the constitution modifier (Character.level_up in app/models)
+LEVEL_UP_HIT_POINTS = {'warrior': 10, 'mage': 6}
+DEFAULT_LEVEL_UP_HIT_POINTS = 8
+
+
+def strength_bonus(strength):
+    """Bonus damage added to basic attacks"""
+    return max(0, (strength - 10) // 2)
+
+
+def wave_multipliers(wave):
+    """Return the (hp, xp) multipliers applied to monsters of a wave"""
+    return 1 + (wave - 1) * WAVE_HP_SCALING, 1 + (wave - 1) * WAVE_XP_SCALING
+
+
+def scale_monster(monster_name, wave):
+    """Build the state dict for one monster scaled to the given wave"""
+    base_monster = get_content().monsters[monster_name]
+    hp_mult, xp_mult = wave_multipliers(wave)
+    scaled_hp = int(base_monster['hp'] * hp_mult)
+    return {
+        'name': monster_name,
+        'hp': scaled_hp,
+        'max_hp': scaled_hp,
+        'damage': base_monster['damage'],
+        'xp': int(base_monster['xp'] * xp_mult)
+    }
+
+
+def spawn_wave(wave, size=WAVE_SIZE):
+    """Pick and scale a fresh set of monsters for a wave"""
+    monster_sampler = get_content().monster_sampler
+    return [scale_monster(monster_sampler.sample(), wave) for _ in range(size)]
+
+
+def wave_clear_max_hp(level):
+    """Max HP a character is set to after clearing a wave at the given level"""
+    return int(70 * (1 + (level - 1) * 0.2))
+
+
+def character_for_wave(char_class, wave):
+    """Stats a fresh character of char_class has when it starts the given wave
+
+    Clearing a wave levels the character up, adds 2 strength and fully heals,
+    so every wave starts from a known state.
+    """
+    stats = get_content().classes[char_class]
+    level = wave
+    max_hp = stats['hp'] if wave == 1 else wave_clear_max_hp(level)
+    return {
+        'level': level,
+        'hp': max_hp,
+        'max_hp': max_hp,
+        'strength': stats['strength'] + 2 * (wave - 1),
+    }
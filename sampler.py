@@ -0,0 +1,143 @@
+"""Weighted random selection with Walker/Vose alias tables.
+
+A sampler is built once from (item, weight) pairs in O(n) and then draws in
+O(1), either one item at a time with the ``random`` module or k at a time
+into a NumPy array. Weights can be any non-negative numbers. NumPy is only
+imported the first time a batch is drawn.
+"""
+import random
+
+
+class AliasSampler:
+    """Draw items with probability proportional to their weight"""
+
+    __slots__ = ('items', 'weights', '_prob', '_alias', '_prob_array', '_alias_array', '_item_array')
+
+    def __init__(self, items, weights):
+        items = tuple(items)
+        weights = tuple(float(w) for w in weights)
+        if len(items) != len(weights):
+            raise ValueError("items and weights must have the same length")
+        if not items:
+            raise ValueError("cannot sample from an empty table")
+        if any(w < 0 for w in weights) or sum(weights) <= 0:
+            raise ValueError("weights must be non-negative and not all zero")
+
+        self.items = items
+        self.weights = weights
+        self._prob, self._alias = _build_alias_table(weights)
+        self._prob_array = None
+        self._alias_array = None
+        self._item_array = None
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        """Build from an iterable of (item, weight) pairs"""
+        pairs = list(pairs)
+        return cls([item for item, _ in pairs], [weight for _, weight in pairs])
+
+    @classmethod
+    def uniform(cls, items):
+        items = tuple(items)
+        return cls(items, [1] * len(items))
+
+    @classmethod
+    def from_rarity(cls, items, rarity_weights, key='rarity'):
+        """Weight each item by the weight of its rarity tier (item[key])"""
+        items = tuple(items)
+        return cls(items, [rarity_weights[item[key]] for item in items])
+
+    def __len__(self):
+        return len(self.items)
+
+    def __repr__(self):
+        return f'<AliasSampler {len(self.items)} items>'
+
+    def probability(self, index):
+        """Probability of drawing the item at ``index``"""
+        return self.weights[index] / sum(self.weights)
+
+    def sample_index(self, rng=random):
+        i = int(rng.random() * len(self._prob))
+        return i if rng.random() < self._prob[i] else self._alias[i]
+
+    def sample(self, rng=random):
+        """Draw one item"""
+        return self.items[self.sample_index(rng)]
+
+    def sample_indices(self, size, rng=None):
+        """Draw ``size`` indices (an int or shape) into a NumPy array"""
+        import numpy as np
+
+        if self._prob_array is None:
+            self._prob_array = np.array(self._prob)
+            self._alias_array = np.array(self._alias, dtype=np.intp)
+        rng = rng if rng is not None else np.random.default_rng()
+        i = rng.integers(0, len(self._prob), size=size)
+        return np.where(rng.random(size) < self._prob_array[i], i, self._alias_array[i])
+
+    def sample_many(self, size, rng=None):
+        """Draw ``size`` items into a NumPy object array"""
+        if self._item_array is None:
+            import numpy as np
+            item_array = np.empty(len(self.items), dtype=object)
+            item_array[:] = self.items
+            self._item_array = item_array
+        return self._item_array[self.sample_indices(size, rng)]
+
+
+class SamplerTable:
+    """Named alias samplers, e.g. one loot or event table per location"""
+
+    def __init__(self, samplers):
+        self._samplers = dict(samplers)
+
+    @classmethod
+    def uniform(cls, tables):
+        """Build from a mapping of name -> list of equally likely items"""
+        return cls({name: AliasSampler.uniform(items) for name, items in tables.items()})
+
+    def __contains__(self, name):
+        return name in self._samplers
+
+    def __getitem__(self, name):
+        return self._samplers[name]
+
+    def get(self, name, default=None):
+        return self._samplers.get(name, default)
+
+    def keys(self):
+        return self._samplers.keys()
+
+    def sample(self, name, rng=random):
+        return self._samplers[name].sample(rng)
+
+    def sample_many(self, name, size, rng=None):
+        return self._samplers[name].sample_many(size, rng)
+
+
+def _build_alias_table(weights):
+    """Vose's alias method: O(n) construction of probability and alias columns"""
+    n = len(weights)
+    total = sum(weights)
+    scaled = [w * n / total for w in weights]
+    prob = [0.0] * n
+    alias = list(range(n))
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+    while small and large:
+        s = small.pop()
+        l = large.pop()
+        prob[s] = scaled[s]
+        alias[s] = l
+        scaled[l] = scaled[l] + scaled[s] - 1.0
+        if scaled[l] < 1.0:
+            small.append(l)
+        else:
+            large.append(l)
+
+    # Whatever is left is 1.0 up to floating point error
+    for i in large + small:
+        prob[i] = 1.0
+    return prob, alias
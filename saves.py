@@ -0,0 +1,304 @@
+"""Multi-slot saves for the CLI game (game.py).
+
+Each slot is one small binary file, ``slot_NN.sav``:
+
+    header   fixed struct: magic, format, level, hp, max_hp, six abilities,
+             item count, saved_at
+    strings  name, class, location, then every inventory item, each as a
+             2-byte length followed by UTF-8
+    crc32    over everything before it, so a torn or foreign file is rejected
+
+Writes never touch the live file: the record goes to a temp file in the same
+directory, is fsynced and then renamed over the slot with os.replace, which
+is atomic. A crash leaves either the old save or the new one.
+
+``index.bin`` holds a fixed-size summary entry per slot (name, class, level,
+HP, location, saved_at) and is memory-mapped, so the load menu lists every
+slot without opening the slot files. The index is only a cache: it is
+updated after each rename and rebuilt from the slot files if it is missing
+or damaged.
+
+``Autosaver`` encodes a snapshot on the game thread (cheap) and hands the
+bytes to a background thread that does the disk work; only the newest
+pending snapshot is kept.
+"""
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+
+SLOT_COUNT = 10
+AUTOSAVE_SLOT = 0
+DEFAULT_SAVE_DIR = 'saves'
+
+MAGIC = b'DNDS'
+FORMAT = 1
+ABILITIES = ('strength', 'dexterity', 'constitution', 'intelligence', 'wisdom', 'charisma')
+
+HEADER = struct.Struct('<4sBxHhH6HHd')
+_LENGTH = struct.Struct('<H')
+_CRC = struct.Struct('<I')
+
+INDEX_MAGIC = b'DNDI'
+INDEX_HEADER = struct.Struct('<4sBxH')
+INDEX_ENTRY = struct.Struct('<BxHhHd32s16s16s')
+
+
+class SaveError(Exception):
+    pass
+
+
+def _pack_string(value):
+    data = value.encode('utf-8')
+    if len(data) > 0xFFFF:
+        raise SaveError(f"String too long to save: {value[:20]!r}...")
+    return _LENGTH.pack(len(data)) + data
+
+
+def _unpack_string(data, offset):
+    (length,) = _LENGTH.unpack_from(data, offset)
+    offset += _LENGTH.size
+    if offset + length > len(data):
+        raise SaveError("Save record is truncated")
+    return data[offset:offset + length].decode('utf-8'), offset + length
+
+
+def _fixed(value, size):
+    """Encode into a fixed-width field, cut on a character boundary"""
+    return value.encode('utf-8')[:size].decode('utf-8', 'ignore').encode('utf-8')
+
+
+def encode(character, location, saved_at=None):
+    """Binary record for a game.Character at ``location``"""
+    saved_at = time.time() if saved_at is None else saved_at
+    try:
+        body = HEADER.pack(
+            MAGIC, FORMAT, character.level, character.hp, character.max_hp,
+            *(getattr(character, ability) for ability in ABILITIES),
+            len(character.inventory), saved_at,
+        )
+    except struct.error as e:
+        # A stat or the item count does not fit its field (e.g. more than 65535 items)
+        raise SaveError(f"Character cannot be saved: {e}") from e
+    body += b''.join(_pack_string(value) for value in
+                     (character.name, character.char_class, location, *character.inventory))
+    return body + _CRC.pack(zlib.crc32(body))
+
+
+def decode(data):
+    """(fields, location, saved_at) from a record; fields are game.Character keyword arguments"""
+    if len(data) < HEADER.size + _CRC.size:
+        raise SaveError("Save record is truncated")
+    body, (crc,) = data[:-_CRC.size], _CRC.unpack(data[-_CRC.size:])
+    if zlib.crc32(body) != crc:
+        raise SaveError("Save record is corrupt")
+    magic, version, level, hp, max_hp, *rest = HEADER.unpack_from(body)
+    if magic != MAGIC or version != FORMAT:
+        raise SaveError("Not a save record of this version")
+    abilities, (item_count, saved_at) = rest[:6], rest[6:]
+    offset = HEADER.size
+    name, offset = _unpack_string(body, offset)
+    char_class, offset = _unpack_string(body, offset)
+    location, offset = _unpack_string(body, offset)
+    inventory = []
+    for _ in range(item_count):
+        item, offset = _unpack_string(body, offset)
+        inventory.append(item)
+    fields = dict(name=name, char_class=char_class, level=level, hp=hp, max_hp=max_hp,
+                  inventory=inventory, **dict(zip(ABILITIES, abilities)))
+    return fields, location, saved_at
+
+
+def atomic_write(path, data):
+    """Replace ``path`` with ``data`` through a fsynced temp file and os.replace"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    # Make the rename itself durable (POSIX; Windows has no directory handles)
+    if hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+class SaveStore:
+    """The slot files and their memory-mapped index in one directory"""
+
+    def __init__(self, directory=None, slots=SLOT_COUNT):
+        self.directory = directory or os.environ.get('SAVE_DIR', DEFAULT_SAVE_DIR)
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._file = None
+        self._map = None
+
+    def slot_path(self, slot):
+        return os.path.join(self.directory, f'slot_{slot:02d}.sav')
+
+    @property
+    def index_path(self):
+        return os.path.join(self.directory, 'index.bin')
+
+    def _check_slot(self, slot):
+        if not 0 <= slot < self.slots:
+            raise SaveError(f"No slot {slot}, choose 0-{self.slots - 1}")
+
+    def _open_index(self):
+        if self._map is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        size = INDEX_HEADER.size + INDEX_ENTRY.size * self.slots
+        header = INDEX_HEADER.pack(INDEX_MAGIC, FORMAT, self.slots)
+        rebuild = True
+        if os.path.exists(self.index_path) and os.path.getsize(self.index_path) == size:
+            with open(self.index_path, 'rb') as f:
+                rebuild = f.read(INDEX_HEADER.size) != header
+        if rebuild:
+            atomic_write(self.index_path, header + bytes(size - len(header)))
+        self._file = open(self.index_path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), size)
+        if rebuild:
+            for slot in range(self.slots):
+                self._index_slot(slot)
+            self._map.flush()
+
+    def _entry_offset(self, slot):
+        return INDEX_HEADER.size + INDEX_ENTRY.size * slot
+
+    def _index_slot(self, slot, record=None):
+        """Write the index entry of one slot from its record (read from disk if not given)"""
+        if record is None:
+            try:
+                with open(self.slot_path(slot), 'rb') as f:
+                    record = f.read()
+            except FileNotFoundError:
+                record = None
+        entry = bytes(INDEX_ENTRY.size)
+        if record is not None:
+            try:
+                fields, location, saved_at = decode(record)
+            except SaveError:
+                pass
+            else:
+                entry = INDEX_ENTRY.pack(
+                    1, fields['level'], fields['hp'], fields['max_hp'], saved_at,
+                    _fixed(fields['name'], 32), _fixed(fields['char_class'], 16), _fixed(location, 16),
+                )
+        offset = self._entry_offset(slot)
+        self._map[offset:offset + INDEX_ENTRY.size] = entry
+
+    def write(self, slot, record):
+        """Store an encoded record in ``slot``"""
+        self._check_slot(slot)
+        with self._lock:
+            self._open_index()
+            atomic_write(self.slot_path(slot), record)
+            self._index_slot(slot, record)
+            self._map.flush()
+
+    def save(self, slot, character, location):
+        self.write(slot, encode(character, location))
+
+    def load(self, slot):
+        """(fields, location, saved_at) of ``slot``, or None when it is empty"""
+        self._check_slot(slot)
+        try:
+            with open(self.slot_path(slot), 'rb') as f:
+                return decode(f.read())
+        except FileNotFoundError:
+            return None
+
+    def list_slots(self):
+        """Summary dicts of the used slots, read from the index only"""
+        with self._lock:
+            self._open_index()
+            listing = []
+            for slot in range(self.slots):
+                used, level, hp, max_hp, saved_at, name, char_class, location = INDEX_ENTRY.unpack_from(
+                    self._map, self._entry_offset(slot))
+                if used:
+                    listing.append({
+                        'slot': slot, 'name': name.rstrip(b'\0').decode('utf-8'),
+                        'char_class': char_class.rstrip(b'\0').decode('utf-8'),
+                        'location': location.rstrip(b'\0').decode('utf-8'),
+                        'level': level, 'hp': hp, 'max_hp': max_hp, 'saved_at': saved_at,
+                    })
+            return listing
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._file.close()
+                self._map = self._file = None
+
+
+class Autosaver:
+    """Writes snapshots to the autosave slot on a background thread"""
+
+    def __init__(self, store, slot=AUTOSAVE_SLOT):
+        self.store = store
+        self.slot = slot
+        self.saves = 0
+        self.last_error = None
+        self._pending = None
+        self._cond = threading.Condition()
+        self._busy = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='autosave', daemon=True)
+        self._thread.start()
+
+    def submit(self, character, location):
+        """Queue a snapshot; replaces any snapshot not yet written"""
+        record = encode(character, location)
+        with self._cond:
+            self._pending = record
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._pending is None:
+                    return
+                record, self._pending = self._pending, None
+                self._busy = True
+            try:
+                self.store.write(self.slot, record)
+                self.saves += 1
+                self.last_error = None
+            except Exception as e:
+                # Keep the thread alive so later snapshots are still written
+                self.last_error = e
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Wait until every submitted snapshot is on disk"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending is None and not self._busy, timeout)
+
+    def close(self):
+        """Write the last snapshot and stop the thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
@@ -0,0 +1,80 @@
+"""Cookie session interface that counts cookie size and (de)serialization time."""
+import threading
+import time
+
+from flask.sessions import SecureCookieSessionInterface
+
+
+class SessionStats:
+    """Running counters for the signed session cookie"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.encodes = 0
+            self.encode_seconds = 0.0
+            self.decodes = 0
+            self.decode_seconds = 0.0
+            self.cookie_bytes_total = 0
+            self.cookie_bytes_last = 0
+            self.cookie_bytes_max = 0
+
+    def record_encode(self, seconds, size):
+        with self._lock:
+            self.encodes += 1
+            self.encode_seconds += seconds
+            self.cookie_bytes_total += size
+            self.cookie_bytes_last = size
+            self.cookie_bytes_max = max(self.cookie_bytes_max, size)
+
+    def record_decode(self, seconds):
+        with self._lock:
+            self.decodes += 1
+            self.decode_seconds += seconds
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'encodes': self.encodes,
+                'decodes': self.decodes,
+                'cookie_bytes_last': self.cookie_bytes_last,
+                'cookie_bytes_max': self.cookie_bytes_max,
+                'cookie_bytes_avg': self.cookie_bytes_total / self.encodes if self.encodes else 0,
+                'encode_us_avg': self.encode_seconds / self.encodes * 1e6 if self.encodes else 0,
+                'decode_us_avg': self.decode_seconds / self.decodes * 1e6 if self.decodes else 0,
+            }
+
+
+class _TimedSerializer:
+    def __init__(self, serializer, stats):
+        self._serializer = serializer
+        self._stats = stats
+
+    def dumps(self, obj):
+        started = time.perf_counter()
+        value = self._serializer.dumps(obj)
+        self._stats.record_encode(time.perf_counter() - started, len(value))
+        return value
+
+    def loads(self, value, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._serializer.loads(value, **kwargs)
+        finally:
+            self._stats.record_decode(time.perf_counter() - started)
+
+
+class TimedSessionInterface(SecureCookieSessionInterface):
+    """SecureCookieSessionInterface that records into ``self.stats``"""
+
+    def __init__(self, stats=None):
+        self.stats = stats if stats is not None else SessionStats()
+
+    def get_signing_serializer(self, app):
+        serializer = super().get_signing_serializer(app)
+        if serializer is None:
+            return None
+        return _TimedSerializer(serializer, self.stats)
@@ -0,0 +1,234 @@
+"""Headless Monte Carlo combat simulator for balance runs.
+
+Plays the same rules as the /combat/<id> route (see rules.py) without Flask
+or the database. Every (class, action, wave) cell is simulated as NumPy
+arrays of encounters, and the cells are split into chunks that run on a
+process pool.
+
+    python simulator.py --encounters 20000 --waves 1-10 --out balance.csv
+
+The "action" of a cell is the player's fixed strategy: either the basic
+attack or one of the class abilities used every turn. Targeted actions
+always hit the first living monster.
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import dice
+from content import get_content
+from rules import BASIC_ATTACK_DICE, WAVE_SIZE, character_for_wave, scale_monster, strength_bonus
+
+MAX_TURNS = 200
+CHUNK_SIZE = 50_000
+
+RESULT_FIELDS = [
+    'char_class', 'action', 'wave', 'encounters', 'win_rate', 'death_rate',
+    'timeout_rate', 'mean_turns_to_clear', 'mean_damage_taken', 'mean_damage_taken_on_win'
+]
+
+
+def class_actions(char_class):
+    """Strategies simulated for a class: basic attack plus each starting ability"""
+    return ['attack'] + list(get_content().classes[char_class]['abilities'])
+
+
+def simulate_batch(char_class, action, wave, n, seed=None):
+    """Simulate ``n`` independent encounters of one wave and return summed counters"""
+    rng = np.random.default_rng(seed)
+    content = get_content()
+    start = character_for_wave(char_class, wave)
+    ability = None if action == 'attack' else content.abilities[action]
+    attack_bonus = strength_bonus(start['strength'])
+    max_hp = start['max_hp']
+
+    # Monster kinds come from the same sampler as spawn_wave()
+    templates = [scale_monster(name, wave) for name in content.monster_names]
+    expressions = sorted({t['damage'] for t in templates})
+    damage_dice = [dice.compile_dice(expr) for expr in expressions]
+    kinds = content.monster_sampler.sample_indices((n, WAVE_SIZE), rng)
+    monster_hp = np.array([t['hp'] for t in templates], dtype=np.int64)[kinds]
+    dice_index = np.array([expressions.index(t['damage']) for t in templates])[kinds]
+
+    hp = np.full(n, start['hp'], dtype=np.int64)
+    turns = np.zeros(n, dtype=np.int64)
+    damage_taken = np.zeros(n, dtype=np.int64)
+    won = np.zeros(n, dtype=bool)
+    active = np.ones(n, dtype=bool)
+
+    for _ in range(MAX_TURNS):
+        idx = np.flatnonzero(active)
+        size = idx.size
+        if size == 0:
+            break
+        rows = np.arange(size)
+        m_hp = monster_hp[idx]
+        living_before = m_hp > 0
+        shield = np.zeros(size, dtype=np.int64)
+        dodge = 0.0
+
+        # Player action
+        if ability is None or ability['type'] == 'attack_single':
+            target = living_before.argmax(axis=1)
+            if ability is None:
+                damage = dice.roll_many(BASIC_ATTACK_DICE, size, rng) + attack_bonus
+            else:
+                damage = ability['damage']
+            m_hp[rows, target] -= damage
+        elif ability['type'] == 'attack_all':
+            m_hp -= np.where(living_before, ability['damage'], 0)
+        elif ability['type'] == 'heal':
+            hp[idx] = np.minimum(hp[idx] + ability['heal'], max_hp)
+        elif ability['type'] == 'shield':
+            shield[:] = ability['shield']
+        elif ability['type'] == 'buff':
+            dodge = ability['dodge']
+        turns[idx] += 1
+
+        # Monster attacks, in order, from monsters alive before and after the action
+        alive_now = m_hp > 0
+        cleared = ~alive_now.any(axis=1)
+        taken = np.zeros(size, dtype=np.int64)
+        for col in range(WAVE_SIZE):
+            attacking = living_before[:, col] & alive_now[:, col]
+            if dodge > 0:
+                attacking &= rng.random(size) >= dodge
+            rolled_by_dice = np.stack([d.roll_many(size, rng) for d in damage_dice])
+            rolled = np.where(attacking, rolled_by_dice[dice_index[idx, col], rows], 0)
+            absorbed = np.minimum(shield, rolled)
+            shield -= absorbed
+            taken += rolled - absorbed
+
+        hp[idx] -= taken
+        damage_taken[idx] += taken
+        monster_hp[idx] = m_hp
+
+        dead = hp[idx] <= 0
+        won[idx[cleared]] = True
+        active[idx[cleared | dead]] = False
+
+    return {
+        'encounters': n,
+        'wins': int(won.sum()),
+        'timeouts': int(active.sum()),
+        'turns_to_clear': int(turns[won].sum()),
+        'damage_taken': int(damage_taken.sum()),
+        'damage_taken_on_win': int(damage_taken[won].sum()),
+    }
+
+
+def _run_chunk(task):
+    key, n, seed = task
+    return key, simulate_batch(*key, n, seed=seed)
+
+
+def _merge(total, part):
+    for name, value in part.items():
+        total[name] = total.get(name, 0) + value
+    return total
+
+
+def summarize(key, totals):
+    """Turn summed counters for one cell into a result row"""
+    char_class, action, wave = key
+    n = totals['encounters']
+    wins = totals['wins']
+    deaths = n - wins - totals['timeouts']
+    return {
+        'char_class': char_class,
+        'action': action,
+        'wave': wave,
+        'encounters': n,
+        'win_rate': round(wins / n, 4),
+        'death_rate': round(deaths / n, 4),
+        'timeout_rate': round(totals['timeouts'] / n, 4),
+        'mean_turns_to_clear': round(totals['turns_to_clear'] / wins, 2) if wins else '',
+        'mean_damage_taken': round(totals['damage_taken'] / n, 2),
+        'mean_damage_taken_on_win': round(totals['damage_taken_on_win'] / wins, 2) if wins else '',
+    }
+
+
+def run(classes, waves, encounters, workers=None, seed=None, chunk_size=CHUNK_SIZE):
+    """Simulate ``encounters`` fights per (class, action, wave) cell and return result rows"""
+    cells = [(c, a, w) for c in classes for a in class_actions(c) for w in waves]
+    tasks = []
+    for key in cells:
+        remaining = encounters
+        while remaining > 0:
+            n = min(chunk_size, remaining)
+            tasks.append((key, n))
+            remaining -= n
+    seeds = np.random.SeedSequence(seed).spawn(len(tasks))
+    tasks = [(key, n, s) for (key, n), s in zip(tasks, seeds)]
+
+    totals = {key: {} for key in cells}
+    if workers == 1:
+        for key, part in map(_run_chunk, tasks):
+            _merge(totals[key], part)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for key, part in pool.map(_run_chunk, tasks):
+                _merge(totals[key], part)
+    return [summarize(key, totals[key]) for key in cells]
+
+
+def write_csv(rows, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def print_table(rows, out=sys.stdout):
+    header = f"{'class':<8} {'action':<14} {'wave':>4} {'win%':>7} {'turns':>7} {'dmg taken':>10}"
+    print(header, file=out)
+    print('-' * len(header), file=out)
+    for row in rows:
+        turns = row['mean_turns_to_clear']
+        print(f"{row['char_class']:<8} {row['action']:<14} {row['wave']:>4} "
+              f"{row['win_rate'] * 100:>6.1f}% {turns if turns != '' else '-':>7} "
+              f"{row['mean_damage_taken']:>10}", file=out)
+
+
+def parse_waves(spec):
+    """Parse '1-10' or '1,3,5' into a list of wave numbers"""
+    waves = []
+    for part in spec.split(','):
+        if '-' in part:
+            lo, hi = map(int, part.split('-'))
+            waves.extend(range(lo, hi + 1))
+        else:
+            waves.append(int(part))
+    return waves
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Monte Carlo balance runs for the combat rules')
+    parser.add_argument('--encounters', type=int, default=10_000,
+                        help='encounters per (class, action, wave) cell')
+    parser.add_argument('--waves', default='1-10', help="waves to simulate, e.g. '1-10' or '1,5,10'")
+    parser.add_argument('--classes', default=','.join(get_content().classes), help='comma separated classes')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--out', default='balance.csv', help='CSV file for the result table')
+    args = parser.parse_args(argv)
+
+    classes = args.classes.split(',')
+    waves = parse_waves(args.waves)
+    started = time.perf_counter()
+    rows = run(classes, waves, args.encounters, workers=args.workers, seed=args.seed)
+    elapsed = time.perf_counter() - started
+
+    write_csv(rows, args.out)
+    print_table(rows)
+    total = sum(row['encounters'] for row in rows)
+    print(f"\n{total:,} encounters in {elapsed:.1f}s ({total / elapsed:,.0f}/s), written to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
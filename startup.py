@@ -0,0 +1,123 @@
+"""Keep importing app.py cheap.
+
+Every worker spawn and every ``flask`` CLI call imports app.py, so the
+import avoids work that is only needed some of the time:
+
+* Flask-Migrate (and with it Alembic) is only set up when the app is being
+  loaded by the ``flask`` command line.
+* ``db.create_all()`` is skipped when the database is already stamped at the
+  newest migration; the heads are read from the migration scripts as text,
+  without importing Alembic.
+* Compiled templates are kept in a Jinja bytecode cache under instance/, so
+  a fresh process loads them instead of compiling them again.
+* Packaged builds (build_bundle.py) ship an already-migrated empty database
+  that is copied into place on first launch.
+"""
+import ast
+import hashlib
+import os
+import re
+import shutil
+
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+_REVISION_RE = re.compile(r'^(revision|down_revision)\s*(?::[^=]*)?=\s*(.+?)\s*$', re.MULTILINE)
+
+
+def running_under_cli():
+    """True while the app is being loaded by the ``flask`` command"""
+    import click  # already imported by Flask
+    return click.get_current_context(silent=True) is not None
+
+
+def alembic_heads(migrations_dir=MIGRATIONS_DIR):
+    """Revision ids that no other migration script revises"""
+    versions_dir = os.path.join(migrations_dir, 'versions')
+    if not os.path.isdir(versions_dir):
+        return set()
+    revisions, parents = set(), set()
+    for name in os.listdir(versions_dir):
+        if not name.endswith('.py'):
+            continue
+        with open(os.path.join(versions_dir, name), encoding='utf-8') as f:
+            values = dict(_REVISION_RE.findall(f.read()))
+        if 'revision' not in values:
+            continue
+        revisions.add(ast.literal_eval(values['revision']))
+        down = ast.literal_eval(values.get('down_revision', 'None'))
+        if isinstance(down, str):
+            parents.add(down)
+        elif down:
+            parents.update(down)
+    return revisions - parents
+
+
+def database_revisions(connection):
+    """Revisions the database is stamped with (empty if it was never migrated)"""
+    try:
+        return {row[0] for row in connection.execute(text('SELECT version_num FROM alembic_version'))}
+    except OperationalError:
+        return set()
+
+
+def schema_is_current(engine, migrations_dir=MIGRATIONS_DIR):
+    """True when the database is stamped at exactly the migration heads"""
+    with engine.connect() as connection:
+        stamped = database_revisions(connection)
+    return bool(stamped) and stamped == alembic_heads(migrations_dir)
+
+
+class NamedBytecodeCache(FileSystemBytecodeCache):
+    """Bytecode cache keyed by template name only
+
+    Jinja keys entries by name and absolute filename, so bytecode built on
+    one machine would never match a bundle unpacked somewhere else. Each
+    entry still stores a checksum of the template source and is recompiled
+    when the template changes.
+    """
+
+    def get_cache_key(self, name, filename=None):
+        return hashlib.sha1(name.encode('utf-8')).hexdigest()
+
+
+def template_bytecode_cache(directory):
+    """Jinja bytecode cache stored in directory (instance/jinja_cache by default)"""
+    os.makedirs(directory, exist_ok=True)
+    return NamedBytecodeCache(directory)
+
+
+def precompile_templates(app, directory=None):
+    """Compile every template once so its bytecode is cached; returns how many
+
+    With ``directory`` the bytecode is written there instead of the app's own cache.
+    """
+    env = app.jinja_env
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+        env = env.overlay(bytecode_cache=NamedBytecodeCache(directory), cache_size=0)
+    names = env.list_templates(extensions=['html'])
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+
+def sqlite_path(database_uri, instance_path):
+    """File behind a sqlite:/// URI (relative paths live in instance/), or None"""
+    if not database_uri.startswith('sqlite:///') or database_uri == 'sqlite:///:memory:':
+        return None
+    path = database_uri[len('sqlite:///'):]
+    return path if os.path.isabs(path) else os.path.join(instance_path, path)
+
+
+def install_database_template(database_uri, instance_path, template_path):
+    """Copy the shipped empty database into place if there is no database yet"""
+    path = sqlite_path(database_uri, instance_path)
+    if path is None or os.path.exists(path) or not os.path.exists(template_path):
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    shutil.copyfile(template_path, path)
+    return True
@@ -0,0 +1,132 @@
+"""Game state stored as an append-only log of compressed JSON-patch deltas.
+
+Rewriting the whole game_state blob on every autosave writes the full state
+each time, however little changed. Instead each save appends one row with
+the RFC 6902 operations (add / remove / replace) that turn the previous
+state into the new one, zlib-compressed. Every COMPACT_EVERY saves a full
+snapshot is written and the rows before it are dropped, so loading a game
+reads one snapshot plus at most COMPACT_EVERY - 1 patches.
+
+    ops = diff(old, new)            # [] when nothing changed
+    state = apply_patch(state, ops)
+    apply_patch(cached, clone(ops), in_place=True)  # cheaper than cloning all of new
+    state = replay(rows)            # rows: (is_snapshot, payload) oldest first
+"""
+import json
+import marshal
+import zlib
+
+COMPACT_EVERY = 32
+# Entries a list may lose from its front and still be diffed as a shift
+MAX_SHIFT = 8
+
+
+def encode(value):
+    return zlib.compress(json.dumps(value, separators=(',', ':')).encode('utf-8'))
+
+
+def decode(payload):
+    return json.loads(zlib.decompress(payload).decode('utf-8'))
+
+
+def _escape(key):
+    return str(key).replace('~', '~0').replace('/', '~1')
+
+
+def _unescape(token):
+    return token.replace('~1', '/').replace('~0', '~')
+
+
+def _same(a, b):
+    """Equal as JSON: unlike ==, 1, 1.0 and True differ, at any depth"""
+    if a is b:
+        return True
+    if type(a) is not type(b) or a != b:
+        return False
+    if isinstance(a, (dict, list)):
+        # == already matched; only a nested type difference can remain. marshal keeps
+        # 1, 1.0 and True apart and is much faster than json.dumps (format 2: no back-references)
+        return marshal.dumps(a, 2) == marshal.dumps(b, 2)
+    return True
+
+
+def diff(old, new, path=''):
+    """JSON-patch operations turning old into new"""
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({'op': 'remove', 'path': f'{path}/{_escape(key)}'})
+        for key, value in new.items():
+            if key not in old:
+                ops.append({'op': 'add', 'path': f'{path}/{_escape(key)}', 'value': value})
+            elif not _same(old[key], value):
+                ops.extend(diff(old[key], value, f'{path}/{_escape(key)}'))
+        return ops
+    if isinstance(old, list) and isinstance(new, list):
+        candidates = []
+        if len(old) == len(new):
+            ops = []
+            for index, (a, b) in enumerate(zip(old, new)):
+                if not _same(a, b):
+                    ops.extend(diff(a, b, f'{path}/{index}'))
+            candidates.append(ops)
+        # Inventories grow at the end; bounded logs also drop entries from the front
+        for dropped in range(min(MAX_SHIFT, len(old)) + 1):
+            kept = len(old) - dropped
+            if len(new) >= kept and _same(new[:kept], old[dropped:]):
+                candidates.append([{'op': 'remove', 'path': f'{path}/0'}] * dropped
+                                  + [{'op': 'add', 'path': f'{path}/-', 'value': value} for value in new[kept:]])
+                break
+        if candidates:
+            return min(candidates, key=len)
+    if _same(old, new):
+        return []
+    return [{'op': 'replace', 'path': path, 'value': new}]
+
+
+def clone(value):
+    """Deep copy of a JSON value, much faster than copy.deepcopy"""
+    return json.loads(json.dumps(value))
+
+
+def apply_patch(doc, ops, in_place=False):
+    """Apply JSON-patch operations and return the new document
+
+    doc is left alone unless in_place is true; op values are used as they are.
+    """
+    if not in_place:
+        doc = clone(doc)
+    for op in ops:
+        tokens = [_unescape(token) for token in op['path'].split('/')[1:]]
+        if not tokens:
+            doc = op['value']
+            continue
+        parent = doc
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+        last = tokens[-1]
+        if isinstance(parent, list):
+            if op['op'] == 'remove':
+                del parent[int(last)]
+            elif op['op'] == 'replace':
+                parent[int(last)] = op['value']
+            elif last == '-':
+                parent.append(op['value'])
+            else:
+                parent.insert(int(last), op['value'])
+        elif op['op'] == 'remove':
+            del parent[last]
+        else:
+            parent[last] = op['value']
+    return doc
+
+
+def replay(rows):
+    """Rebuild the state from (is_snapshot, payload) rows, oldest first, starting at a snapshot"""
+    state = {}
+    for is_snapshot, payload in rows:
+        value = decode(payload)
+        # Decoded payloads are fresh objects, so patches can be applied in place
+        state = value if is_snapshot else apply_patch(state, value, in_place=True)
+    return state
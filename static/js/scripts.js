@@ -4,4 +4,75 @@ $(document).ready(function() {
             'X-CSRFToken': $('meta[name="csrf-token"]').attr('content')
         }
     });
-}
\ No newline at end of file
+
+    // Combat turns: post the form for a JSON delta and patch the page in place
+    $('#combat-form').on('submit', function(event) {
+        var form = $(this);
+        event.preventDefault();
+        form.find('button, input[type="submit"]').prop('disabled', true);
+        $.ajax({
+            url: form.attr('action') || window.location.href,
+            method: 'POST',
+            data: form.serialize(),
+            dataType: 'json'
+        }).done(function(delta) {
+            applyCombatDelta(form, delta);
+        }).fail(function() {
+            // Fall back to a normal page load
+            window.location.reload();
+        }).always(function() {
+            form.find('button, input[type="submit"]').prop('disabled', false);
+        });
+    });
+
+    // Auto-battle: the server fights the whole wave and streams each turn
+    $('#auto-battle').on('click', function() {
+        var form = $('#combat-form');
+        var token = encodeURIComponent($('meta[name="csrf-token"]').attr('content'));
+        var source = new EventSource($(this).data('url') + '?csrf_token=' + token);
+        form.find('button, input[type="submit"]').prop('disabled', true);
+        source.addEventListener('turn', function(event) {
+            applyCombatDelta(form, JSON.parse(event.data));
+        });
+        source.addEventListener('done', function(event) {
+            source.close();
+            form.find('button, input[type="submit"]').prop('disabled', false);
+            applyCombatDelta(form, JSON.parse(event.data));
+        });
+        source.addEventListener('failed', function(event) {
+            source.close();
+            form.find('button, input[type="submit"]').prop('disabled', false);
+            $('.message-box').text(JSON.parse(event.data).log.join('\n')).prop('hidden', false);
+        });
+        source.onerror = function() {
+            // Never let EventSource reconnect: that would start another battle
+            source.close();
+            window.location.reload();
+        };
+    });
+});
+
+function applyCombatDelta(form, delta) {
+    $('[data-wave]').text(delta.wave);
+    $.each(delta.character, function(field, value) {
+        $('[data-field="' + field + '"]').text(value);
+    });
+    $.each(delta.monsters, function(_, monster) {
+        var entry = $('[data-monster="' + monster.index + '"]');
+        var text = monster.hp <= 0 ? 'Defeated' : 'HP: ' + monster.hp + '/' + monster.max_hp;
+        entry.toggleClass('text-danger', monster.hp <= 0);
+        entry.find('p').text(monster.name + ': ' + text);
+    });
+    $('.message-box').text(delta.log.join('\n')).prop('hidden', delta.log.length === 0);
+
+    if (delta.combat_over) {
+        $('.monster-entry').remove();
+        form.replaceWith($('<a class="btn btn-primary w-100">Return to Game</a>')
+            .attr('href', form.data('game-url')));
+        return;
+    }
+    var target = form.find('select[name="target"]').empty();
+    $.each(delta.targets, function(_, choice) {
+        target.append($('<option>').val(choice[0]).text(choice[1]));
+    });
+}
@@ -0,0 +1,62 @@
+"""Shared setup: the app on a throwaway database, and a logged-in player with a character.
+
+The environment is set before ``app`` is imported, since it reads its
+configuration at import time.
+"""
+import itertools
+import os
+import sys
+import tempfile
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='dnd-test-'), 'test.db'))
+os.environ.setdefault('ENCOUNTER_STORE', 'memory')
+os.environ.setdefault('PASSWORD_HASH_ITERATIONS', '1000')
+sys.path.insert(0, ROOT)
+
+import app as game_app  # noqa: E402
+
+_players = itertools.count(1)
+
+
+def login(username, password='secret1'):
+    client = game_app.app.test_client()
+    client.post('/login', data={'username': username, 'password': password})
+    return client
+
+
+@pytest.fixture
+def app():
+    game_app.app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    return game_app.app
+
+
+@pytest.fixture
+def player(app):
+    """(client, character_id, username) for a new user with one warrior"""
+    username = f'player{next(_players)}'
+    client = app.test_client()
+    client.post('/register', data={'username': username, 'password': 'secret1', 'confirm_password': 'secret1'})
+    client.post('/login', data={'username': username, 'password': 'secret1'})
+    client.post('/character/create', data={'name': 'Counter', 'char_class': 'warrior'})
+    with app.app_context():
+        character_id = game_app.db.session.scalars(
+            game_app.select(game_app.Character.id)
+            .join(game_app.User, game_app.User.id == game_app.Character.user_id)
+            .where(game_app.User.username == username)).first()
+    return client, character_id, username
+
+
+@pytest.fixture
+def explore_event(monkeypatch):
+    """Call with an event's text and effect to make every explore turn produce it"""
+    content = game_app.get_content()
+
+    def set_event(text, effect):
+        event = {'text': text, 'effect': effect}
+        monkeypatch.setattr(game_app, 'get_content', lambda: types.SimpleNamespace(
+            explore_sampler=types.SimpleNamespace(sample=lambda: event), shop_items=content.shop_items))
+    return set_event
@@ -0,0 +1,105 @@
+"""/api/combat/batch on the blueprint app from create_app (__init__.py)."""
+import importlib.util
+import os
+import sys
+import types
+
+import pytest
+
+from conftest import ROOT
+
+
+def load_package():
+    """The repository root as a package, whatever its directory is called"""
+    name = 'dnd_blueprint_app'
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, '__init__.py'),
+                                                      submodule_search_locations=[ROOT])
+        sys.modules[name] = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(sys.modules[name])
+    return sys.modules[name]
+
+
+@pytest.fixture(scope='module')
+def blueprint_app(tmp_path_factory):
+    package = load_package()
+    database = tmp_path_factory.mktemp('blueprint') / 'game.db'
+    app = package.create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}', 'TESTING': True})
+    from dnd_blueprint_app.models import Character, User
+    with app.app_context():
+        package.db.create_all()
+        user = User(username='batcher', password_hash='-')
+        package.db.session.add(user)
+        package.db.session.flush()
+        character = Character(name='Batcher', char_class='mage', user_id=user.id, hp=500, max_hp=500,
+                               strength=10, dexterity=10, constitution=10, intelligence=16, wisdom=10,
+                               charisma=10, abilities=['Fireball', 'Magic Shield'])
+        package.db.session.add(character)
+        package.db.session.commit()
+        app.test_ids = user.id, character.id
+    return app
+
+
+@pytest.fixture
+def client(blueprint_app):
+    client = blueprint_app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(blueprint_app.test_ids[0])
+        session['_fresh'] = True
+    return client, blueprint_app.test_ids[1]
+
+
+@pytest.mark.parametrize('body', [
+    ['attack'],
+    {'character_id': 1, 'monster': 'Goblin', 'actions': []},
+    {'character_id': 1, 'monster': 'Goblin', 'actions': 'attack'},
+    {'character_id': 1, 'monster': 'Goblin', 'actions': ['attack'] * 51},
+    {'character_id': 1, 'monster': ['Goblin'], 'actions': ['attack']},
+    {'character_id': 1, 'monster': 'Dragon King', 'actions': ['attack']},
+    {'character_id': '1', 'monster': 'Goblin', 'actions': ['attack']},
+    {'character_id': True, 'monster': 'Goblin', 'actions': ['attack']},
+    {'character_id': 1, 'monster': 'Goblin', 'actions': [{'action': 5}]},
+    {'character_id': 1, 'monster': 'Goblin', 'actions': [['attack']]},
+    {'character_id': 1, 'monster': 'Goblin', 'actions': ['Cleave']},
+])
+def test_wrongly_shaped_batches_are_rejected(client, body):
+    client, character_id = client
+    if isinstance(body, dict) and type(body.get('character_id')) is int:
+        body = dict(body, character_id=character_id)
+
+    response = client.post('/api/combat/batch', json=body)
+
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_batch_resolves_in_order_and_commits_once(client, blueprint_app):
+    client, character_id = client
+    actions = ['attack', {'action': 'Magic Shield'}, 'Fireball', 'attack', 'attack']
+
+    response = client.post('/api/combat/batch',
+                           json={'character_id': character_id, 'monster': 'Orc', 'actions': actions})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['resolved'] == len(data['turns']) <= len(actions)
+    assert [turn['action'] for turn in data['turns']] == ['attack', 'Magic Shield', 'Fireball', 'attack',
+                                                          'attack'][:data['resolved']]
+    assert data['outcome'] in ('victory', 'ongoing')
+    assert (data['outcome'] == 'victory') == (data['monster']['hp'] == 0)
+    from dnd_blueprint_app.models import Character
+    with blueprint_app.app_context():
+        character = load_package().db.session.get(Character, character_id)
+        assert character.hp == data['character']['hp'] == data['turns'][-1]['character_hp']
+
+
+def test_shield_only_covers_its_own_exchange(blueprint_app, monkeypatch):
+    routes = sys.modules['dnd_blueprint_app.routes']
+    monkeypatch.setattr(routes.dice, 'roll', lambda expression: 1)  # every attack misses
+    character = types.SimpleNamespace(hp=20, max_hp=20, strength=10, constitution=10, experience=0, level=1)
+    with blueprint_app.app_context():
+        state = routes._new_encounter('Orc')
+        routes._resolve_exchange(character, 'Orc', state, 'Magic Shield')
+
+    assert state['shield'] == 0
+    assert state['dodge'] == 0
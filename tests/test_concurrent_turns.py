@@ -0,0 +1,42 @@
+"""Optimistic locking on Character.version: racing turns are retried, never lost."""
+import threading
+
+import app as game_app
+from conftest import login
+
+THREADS = 6
+TURNS = 15
+GOLD = 5
+
+
+def test_concurrent_turns_lose_no_updates(app, player, explore_event):
+    _, character_id, username = player
+    explore_event('You find some coins.', {'gold': GOLD, 'max_hp': 1})
+    with app.app_context():
+        start = game_app.db.session.get(game_app.Character, character_id)
+        start_gold, start_max_hp = start.gold, start.max_hp
+    clients = [login(username) for _ in range(THREADS)]
+    statuses = []
+    lock = threading.Lock()
+
+    def play(client):
+        for _ in range(TURNS):
+            status = client.post(f'/game/{character_id}', data={'action': 'explore'}).status_code
+            with lock:
+                statuses.append(status)
+
+    threads = [threading.Thread(target=play, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # A turn that ran out of retries answers 409 and changes nothing
+    assert set(statuses) <= {200, 409}, statuses
+    applied = statuses.count(200)
+    assert applied > 0
+    game_app.identity_cache.characters.invalidate(character_id)
+    with app.app_context():
+        character = game_app.db.session.get(game_app.Character, character_id)
+        assert character.gold - start_gold == GOLD * applied
+        assert character.max_hp - start_max_hp == applied
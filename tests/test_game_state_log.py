@@ -0,0 +1,88 @@
+"""Game.save_game_state / load_game_state (app/models) round-trip through the delta log."""
+import random
+
+import pytest
+from flask import Flask
+from sqlalchemy import select
+
+from benchmarks.game_state_log import initial_state, load_models, play_turn
+from state_log import COMPACT_EVERY
+
+
+@pytest.fixture
+def store(tmp_path):
+    """(db, models) bound to a new database, inside an app context"""
+    package, models = load_models()
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tmp_path / "games.db"}'
+    package.db.init_app(app)
+    with app.app_context():
+        package.db.create_all()
+        yield package.db, models
+        package.db.session.remove()
+        package.db.engine.dispose()
+
+
+def new_game(db, models, game_state=None):
+    user = models.User(username='player')
+    db.session.add(user)
+    db.session.flush()
+    game = models.Game(user_id=user.id, game_state=game_state or {})
+    db.session.add(game)
+    db.session.commit()
+    return game.id
+
+
+def reload(db, models, game_id):
+    """The game from a fresh session, so nothing cached on the instance is used"""
+    db.session.expunge_all()
+    return db.session.get(models.Game, game_id)
+
+
+def test_saves_compact_and_replay_to_the_saved_state(store):
+    db, models = store
+    rng = random.Random(3)
+    game_id = new_game(db, models)
+    state = initial_state(rng, inventory=20, map_cells=100)
+    saves = 2 * COMPACT_EVERY + 5
+
+    for turn in range(saves):
+        play_turn(state, rng, turn)
+        game = reload(db, models, game_id)
+        game.save_game_state(state)
+        db.session.commit()
+        assert reload(db, models, game_id).load_game_state() == state
+
+    game = reload(db, models, game_id)
+    assert game.state_seq == saves
+    assert game.snapshot_seq == 2 * COMPACT_EVERY + 1
+    # Everything before the newest snapshot was dropped
+    rows = db.session.execute(
+        select(models.GameStateDelta.seq, models.GameStateDelta.is_snapshot)
+        .where(models.GameStateDelta.game_id == game_id).order_by(models.GameStateDelta.seq)).all()
+    assert [seq for seq, _ in rows] == list(range(game.snapshot_seq, saves + 1))
+    assert [is_snapshot for _, is_snapshot in rows] == [True] + [False] * (len(rows) - 1)
+
+
+def test_unchanged_state_writes_no_delta(store):
+    db, models = store
+    game_id = new_game(db, models)
+    game = reload(db, models, game_id)
+    game.save_game_state({'gold': 1})
+    game.save_game_state({'gold': 1})
+    db.session.commit()
+
+    assert reload(db, models, game_id).state_seq == 1
+
+
+def test_game_state_saved_before_the_log_is_the_starting_state(store):
+    db, models = store
+    game_id = new_game(db, models, game_state={'gold': 5, 'hp': 10})
+
+    game = reload(db, models, game_id)
+    assert game.load_game_state() == {'gold': 5, 'hp': 10}
+    game.save_game_state({'gold': 7, 'hp': 10})
+    game.save_game_state({'gold': 7, 'hp': 8})
+    db.session.commit()
+
+    assert reload(db, models, game_id).load_game_state() == {'gold': 7, 'hp': 8}
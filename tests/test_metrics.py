@@ -0,0 +1,58 @@
+"""Requests that raise and streamed responses still reach the request metrics."""
+import time
+
+import pytest
+from flask import Flask, Response, stream_with_context
+from sqlalchemy import create_engine
+
+from metrics import Metrics
+
+
+@pytest.fixture
+def instrumented():
+    app = Flask(__name__)
+    app.testing = True
+    metrics = Metrics(app, create_engine('sqlite://'))
+
+    @app.route('/ok')
+    def ok():
+        return 'fine'
+
+    @app.route('/boom')
+    def boom():
+        raise RuntimeError('boom')
+
+    @app.route('/stream')
+    def stream():
+        def events():
+            for _ in range(3):
+                time.sleep(0.05)
+                yield 'data: tick\n\n'
+        return Response(stream_with_context(events()), content_type='text/event-stream')
+
+    return app.test_client(), metrics
+
+
+def test_a_view_that_raises_is_counted_as_500(instrumented):
+    client, metrics = instrumented
+    assert client.get('/ok').status_code == 200
+    with pytest.raises(RuntimeError):
+        client.get('/boom')
+
+    text = metrics.render()
+    assert 'dnd_requests_total{endpoint="ok",method="GET",status="200"} 1' in text
+    assert 'dnd_requests_total{endpoint="boom",method="GET",status="500"} 1' in text
+    assert 'dnd_request_duration_seconds_count{endpoint="boom",method="GET"} 1' in text
+
+
+def test_streamed_response_is_timed_to_its_last_event(instrumented):
+    client, metrics = instrumented
+    response = client.get('/stream')
+    assert response.get_data(as_text=True).count('tick') == 3
+    response.close()
+
+    text = metrics.render()
+    assert 'dnd_stream_duration_seconds_count{endpoint="stream",method="GET"} 1' in text
+    assert 'dnd_request_duration_seconds_count{endpoint="stream"' not in text
+    total = float(text.split('dnd_stream_duration_seconds_sum{endpoint="stream",method="GET"} ')[1].split()[0])
+    assert total >= 0.15
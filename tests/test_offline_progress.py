@@ -0,0 +1,96 @@
+"""Opening a character's game page credits what it earned while the player was away."""
+import time
+
+from sqlalchemy import text
+
+import app as game_app
+from idle import IDLE_EFFICIENCY, IDLE_MAX_SECONDS, IDLE_TICK_SECONDS, idle_rates
+
+
+def set_last_played(app, character_id, last_played):
+    with app.app_context(), game_app.db.engine.begin() as conn:
+        conn.execute(text('UPDATE character SET last_played = :last_played WHERE id = :id'),
+                     {'last_played': last_played, 'id': character_id})
+    game_app.identity_cache.characters.invalidate(character_id)
+
+
+def saved(app, character_id):
+    """(experience, gold, last_played, {item: quantity}) as stored"""
+    if game_app.write_behind is not None:
+        game_app.write_behind.flush()
+    with app.app_context(), game_app.db.engine.connect() as conn:
+        experience, gold, last_played = conn.execute(
+            text('SELECT experience, gold, last_played FROM character WHERE id = :id'),
+            {'id': character_id}).one()
+        items = dict(conn.execute(
+            text('SELECT item.name, character_item.quantity FROM character_item '
+                 'JOIN item ON item.id = character_item.item_id WHERE character_item.character_id = :id'),
+            {'id': character_id}).all())
+    return experience, gold, last_played, items
+
+
+def spy_on_rewards(monkeypatch):
+    granted = []
+    offline_rewards = game_app.offline_rewards
+
+    def recording(*args, **kwargs):
+        granted.append(offline_rewards(*args, **kwargs))
+        return granted[-1]
+
+    monkeypatch.setattr(game_app, 'offline_rewards', recording)
+    return granted
+
+
+def test_absence_is_credited_once_and_the_remainder_carries_over(app, player, monkeypatch):
+    client, character_id, _ = player
+    granted = spy_on_rewards(monkeypatch)
+    away_since = int(time.time()) - 3 * 60 * 60 - 100
+    set_last_played(app, character_id, away_since)
+    experience, gold, _, items = saved(app, character_id)
+
+    response = client.get(f'/game/{character_id}')
+
+    assert response.status_code == 200
+    assert b'While you were away you earned' in response.data
+    ticks = 3 * 60 * 60 // IDLE_TICK_SECONDS
+    rates = idle_rates(game_app.get_content())
+    [rewards] = granted
+    assert rewards['ticks'] == ticks
+    assert sum(rewards['loot'].values()) <= ticks
+    new_experience, new_gold, last_played, new_items = saved(app, character_id)
+    assert new_experience - experience == round(ticks * IDLE_EFFICIENCY * rates['xp'])
+    assert new_gold - gold == round(ticks * IDLE_EFFICIENCY * rates['gold'])
+    for name in set(items) | set(new_items):
+        assert new_items.get(name, 0) - items.get(name, 0) == rewards['loot'].get(name, 0)
+    # Only whole ticks are paid; the spare 100 seconds count towards the next visit
+    assert last_played == away_since + ticks * IDLE_TICK_SECONDS
+
+    response = client.get(f'/game/{character_id}')
+
+    assert b'While you were away' not in response.data
+    assert len(granted) == 1
+    assert saved(app, character_id) == (new_experience, new_gold, last_played, new_items)
+
+
+def test_time_past_the_cap_is_not_earned(app, player, monkeypatch):
+    client, character_id, _ = player
+    granted = spy_on_rewards(monkeypatch)
+    set_last_played(app, character_id, int(time.time()) - 2 * IDLE_MAX_SECONDS)
+
+    client.get(f'/game/{character_id}')
+
+    assert granted[0]['ticks'] == IDLE_MAX_SECONDS // IDLE_TICK_SECONDS
+    assert saved(app, character_id)[2] >= int(time.time()) - 5
+
+
+def test_character_without_last_played_starts_counting(app, player):
+    client, character_id, _ = player
+    set_last_played(app, character_id, None)
+    experience, gold, _, items = saved(app, character_id)
+
+    response = client.get(f'/game/{character_id}')
+
+    assert b'While you were away' not in response.data
+    new_experience, new_gold, last_played, new_items = saved(app, character_id)
+    assert (new_experience, new_gold, new_items) == (experience, gold, items)
+    assert last_played is not None
@@ -0,0 +1,41 @@
+"""Password hashing pool counters, as served by /admin/cache/stats."""
+import threading
+
+from passwords import PasswordHasher
+
+
+def test_cache_stats_report_password_hashing(player):
+    client, _, _ = player
+
+    stats = client.get('/admin/cache/stats', environ_base={'REMOTE_ADDR': '127.0.0.1'}).get_json()
+
+    hashing = stats['password_hashing']
+    assert hashing['hashed'] >= 1 and hashing['verified'] >= 1
+    assert hashing['in_flight'] == 0
+    assert hashing['peak_in_flight'] >= 1
+
+
+def test_in_flight_counts_running_and_queued_hashes():
+    hasher = PasswordHasher(iterations=1000, workers=1, max_pending=4)
+    release = threading.Event()
+
+    def slow_hash(password):
+        release.wait(5)
+        return password
+
+    threads = [threading.Thread(target=hasher._run, args=(slow_hash, 'secret')) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for _ in range(100):
+        if hasher.stats()['in_flight'] == 3:
+            break
+        release.wait(0.01)
+    assert hasher.stats()['in_flight'] == 3
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    stats = hasher.stats()
+    assert stats['in_flight'] == 0
+    assert stats['peak_in_flight'] == 3
+    assert stats['queue_limit'] == 4
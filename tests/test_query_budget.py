@@ -0,0 +1,75 @@
+"""The game view's query budget holds on its most expensive path.
+
+app.testing makes budgets strict, so going over fails the request with
+QueryBudgetExceeded instead of logging a warning.
+"""
+from sqlalchemy import text
+
+import app as game_app
+from query_budget import QueryBudget
+
+
+def explore_finding(explore_event, item):
+    """Make every explore find ``item`` and gold, so the character row is updated too"""
+    explore_event(f'You find a {item} and some coins.', {'item': item, 'gold': 5})
+
+
+def test_explore_new_item_after_cache_miss_fits_budget(player, explore_event):
+    client, character_id, _ = player
+    explore_finding(explore_event, 'Budget Test Relic')
+    game_app.identity_cache.characters.invalidate(character_id)
+    game_app.Item._ids.clear()
+
+    with QueryBudget(100) as budget:
+        response = client.post(f'/game/{character_id}', data={'action': 'explore'})
+
+    assert response.status_code == 200
+    assert b'Budget Test Relic' in response.data
+    assert budget.count <= 6, budget.statements
+
+
+def test_turn_retried_after_conflict_fits_budget(player, explore_event, monkeypatch):
+    client, character_id, _ = player
+    explore_finding(explore_event, 'Retried Relic')
+    game_app.identity_cache.characters.invalidate(character_id)
+    game_app.Item._ids.clear()
+    get_character = game_app.get_character_or_404
+    calls = []
+
+    def load_then_lose_race(character_id):
+        character = get_character(character_id)
+        # Another request updates the character once, so this turn's UPDATE matches no row
+        if not calls:
+            with game_app.db.engine.begin() as conn:
+                conn.execute(text('UPDATE character SET version = version + 1 WHERE id = :id'),
+                             {'id': character_id})
+        calls.append(character.version)
+        return character
+
+    monkeypatch.setattr(game_app, 'get_character_or_404', load_then_lose_race)
+    conflicts = game_app.conflict_stats['conflicts']
+
+    # Strict under app.testing: a retried attempt over budget fails the request
+    response = client.post(f'/game/{character_id}', data={'action': 'explore'})
+
+    assert response.status_code == 200
+    assert b'Retried Relic' in response.data
+    assert game_app.conflict_stats['conflicts'] == conflicts + 1
+    # The page loads the character twice per attempt (offline progress, then the turn);
+    # the retry saw the other request's version
+    assert calls == [calls[0]] * 2 + [calls[0] + 1] * 2
+
+
+def test_character_select_does_not_load_roster_with_user(player):
+    client, character_id, _ = player
+    client.post('/character/create', data={'name': 'Second', 'char_class': 'mage'})
+
+    with QueryBudget(100) as budget:
+        response = client.get('/character/select')
+
+    assert response.status_code == 200
+    assert b'Counter' in response.data and b'Second' in response.data
+    assert budget.count <= 2, budget.statements
+    with game_app.app.app_context():
+        user = game_app.db.session.get(game_app.User, game_app.db.session.get(game_app.Character, character_id).user_id)
+        assert 'characters' not in user.__dict__
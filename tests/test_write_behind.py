@@ -0,0 +1,54 @@
+"""A write-behind buffer whose flushes keep failing is reported and then refuses turns."""
+import logging
+import os
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import app as game_app
+from write_behind import WriteBehind, WriteBehindBacklogged
+
+
+@pytest.fixture
+def failing_buffer(app, monkeypatch, tmp_path):
+    """Swap in a write-behind buffer (no flusher thread) whose writes always fail"""
+    with app.app_context():
+        buffer = WriteBehind(game_app.db.engine, game_app.Character.__table__, game_app.Item.__table__,
+                             game_app.CharacterItem.__table__, os.path.join(tmp_path, 'journal'),
+                             max_backlog=3, logger=app.logger)
+
+    def broken_write(conn, batch, seq):
+        raise OperationalError('UPDATE character ...', {}, Exception('disk I/O error'))
+
+    monkeypatch.setattr(buffer, '_write', broken_write)
+    monkeypatch.setattr(game_app, 'write_behind', buffer)
+    return buffer
+
+
+def test_failing_flushes_are_logged_counted_and_cap_the_backlog(app, player, explore_event, failing_buffer, caplog):
+    client, character_id, _ = player
+    explore_event('You find some coins.', {'gold': 5})
+
+    for _ in range(2):
+        assert client.post(f'/game/{character_id}', data={'action': 'explore'}).status_code == 200
+    with pytest.raises(OperationalError):
+        failing_buffer.flush()
+    # The background flusher logs the failure and keeps the batch for the next tick
+    failing_buffer.interval = 0
+    with caplog.at_level(logging.ERROR):
+        failing_buffer._tick()
+    assert 'Write-behind flush failed (2 in a row, 2 turns waiting)' in caplog.text
+
+    stats = failing_buffer.stats()
+    assert stats['failed_flushes'] == 2
+    assert stats['consecutive_failures'] == 2
+    assert stats['pending_records'] == 2
+    assert 'disk I/O error' in stats['last_error']
+
+    assert client.post(f'/game/{character_id}', data={'action': 'explore'}).status_code == 200
+    response = client.post(f'/game/{character_id}', data={'action': 'explore'})
+    assert response.status_code == 503
+    assert failing_buffer.stats()['rejected_turns'] == 1
+    assert failing_buffer.stats()['pending_records'] == 3
+    with app.app_context(), pytest.raises(WriteBehindBacklogged):
+        failing_buffer.capture(game_app.db.session.get(game_app.Character, character_id))
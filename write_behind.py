@@ -0,0 +1,451 @@
+"""Write-behind buffering of per-turn character changes.
+
+With write-behind on, a turn does not UPDATE the character row. The views
+call ``capture(character)`` instead of committing the character: the
+attribute changes made during the turn are turned into deltas (hp, gold,
+experience, strength, ... and item quantities), appended to a journal file
+and merged into an in-memory entry for that character. The row is then
+marked clean so the request's own commit leaves it alone.
+
+Entries are written in one batched transaction (``UPDATE character SET
+hp = hp + :d, ...``) when a wave ends, when the oldest entry is older than
+``interval`` seconds, when ``max_pending`` characters are buffered and at
+shutdown. ``overlay(character)`` applies the buffered deltas to a freshly
+loaded character so every read sees the latest state.
+
+Crash recovery: every journal record carries a sequence number, and the
+flush transaction stores the last sequence number it wrote in the
+``write_behind_checkpoint`` table. On startup ``recover()`` replays only the
+records after the checkpoint, so each turn is applied exactly once.
+
+Numeric deltas commute, so concurrent turns on the same character no longer
+conflict; non-numeric columns (abilities, equipment) are last-writer-wins.
+
+A failed flush keeps its batch and is retried on the next tick; failures
+are logged and counted in ``stats()``. If flushes keep failing, the buffer
+stops accepting turns once ``max_backlog`` records are waiting:
+``capture()`` raises WriteBehindBacklogged, so turns are refused instead of
+the buffer and journal growing without bound.
+
+The journal and the checkpoint row belong to one process: the buffer only
+works with a single server process (threads are fine). ``start()`` takes an
+exclusive lock on ``<journal>.lock`` and raises WriteBehindLocked if another
+process already holds it.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm.attributes import set_committed_value
+
+DEFAULT_INTERVAL = 2.0
+DEFAULT_MAX_PENDING = 500
+DEFAULT_MAX_BACKLOG = 50_000
+
+# Columns never captured from a turn
+SKIP_COLUMNS = {'id', 'user_id', 'version'}
+
+_OVERLAID = 'write_behind_overlaid'
+_ITEMS = 'write_behind_items'
+
+
+def _new_entry():
+    return {'add': {}, 'set': {}, 'items': {}}
+
+
+def _merge(entry, record):
+    """Fold one journal record (or entry) into an entry; later 'set' values win"""
+    for column, delta in record['add'].items():
+        entry['add'][column] = entry['add'].get(column, 0) + delta
+    entry['set'].update(record['set'])
+    for name, delta in record['items'].items():
+        entry['items'][name] = entry['items'].get(name, 0) + delta
+
+
+class WriteBehindLocked(RuntimeError):
+    pass
+
+
+class WriteBehindBacklogged(RuntimeError):
+    """Too many turns are waiting for a flush that keeps failing"""
+
+
+def _lock_file(f):
+    """Take a non-blocking exclusive lock on an open file; False if someone else holds it"""
+    try:
+        if os.name == 'nt':
+            import msvcrt
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+class WriteBehind:
+    """Per-character change buffer with a journal and a background flusher"""
+
+    def __init__(self, engine, character_table, item_table, character_item_table, journal_path,
+                 interval=DEFAULT_INTERVAL, max_pending=DEFAULT_MAX_PENDING, max_backlog=DEFAULT_MAX_BACKLOG,
+                 fsync=False, logger=None):
+        self.engine = engine
+        self.characters = character_table
+        self.items = item_table
+        self.character_items = character_item_table
+        self.journal_path = journal_path
+        self.interval = interval
+        self.max_pending = max_pending
+        self.max_backlog = max_backlog
+        self.fsync = fsync
+        self.logger = logger or logging.getLogger(__name__)
+
+        self.flushes = 0
+        self.records = 0
+        self.flushed_records = 0
+        self.last_flush_ms = 0.0
+        self.failed_flushes = 0
+        self.consecutive_failures = 0
+        self.last_error = None
+        self.rejected = 0
+
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._flushing = {}
+        # character id -> (version written by the last flush, entry it wrote)
+        self._recent = {}
+        # character id -> sequence number of its last buffered turn
+        self._revisions = {}
+        self._oldest = None
+        self._seq = 0
+        self._journal = None
+        self._lock_handle = None
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def _flushing_path(self):
+        return self.journal_path + '.flushing'
+
+    def start(self):
+        """Replay the journal, then start the background flusher"""
+        self._lock_handle = open(self.journal_path + '.lock', 'a')
+        if not _lock_file(self._lock_handle):
+            self._lock_handle.close()
+            self._lock_handle = None
+            raise WriteBehindLocked(f"{self.journal_path} is used by another process; "
+                                    "WRITE_BEHIND only works with a single server process")
+        self.recover()
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+        return self
+
+    def close(self):
+        """Stop the flusher and write everything that is still buffered"""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if self._lock_handle is not None:
+            self._lock_handle.close()
+            self._lock_handle = None
+
+    # Reads
+
+    def overlay(self, character):
+        """Apply buffered changes to a character loaded from the database (once per instance)"""
+        state = inspect(character)
+        if state.info.get(_OVERLAID):
+            return character
+        state.info[_OVERLAID] = True
+        entry = self._entry_for(character.id, character.version)
+        for column, delta in entry['add'].items():
+            set_committed_value(character, column, (getattr(character, column) or 0) + delta)
+        for column, value in entry['set'].items():
+            set_committed_value(character, column, value)
+        return character
+
+    def pending_items(self, character_id, version):
+        """{item name: quantity delta} not yet written for this character"""
+        return self._entry_for(character_id, version)['items']
+
+    def _entry_for(self, character_id, version):
+        entry = _new_entry()
+        with self._lock:
+            recent = self._recent.get(character_id)
+            # A row read before the last flush committed does not contain it yet
+            if recent is not None and version is not None and version < recent[0]:
+                _merge(entry, recent[1])
+            for source in (self._flushing, self._pending):
+                if character_id in source:
+                    _merge(entry, source[character_id])
+        return entry
+
+    def revision(self, character_id):
+        """Sequence number of the last turn buffered for a character (0 if none)"""
+        with self._lock:
+            return self._revisions.get(character_id, 0)
+
+    # Writes
+
+    def add_item(self, character, name, quantity=1):
+        """Record an inventory change for this turn; written by the next capture()"""
+        items = inspect(character).info.setdefault(_ITEMS, {})
+        items[name] = items.get(name, 0) + quantity
+
+    def capture(self, character):
+        """Buffer the changes made to character in this request and mark it clean
+
+        Deltas are taken against the values the character was loaded (and
+        overlaid) with, so they stay correct however the row changes meanwhile.
+        Returns False if the turn changed nothing. Raises WriteBehindBacklogged,
+        leaving the character untouched, when ``max_backlog`` records are unwritten.
+        """
+        with self._lock:
+            if self.max_backlog and self.records - self.flushed_records >= self.max_backlog:
+                self.rejected += 1
+                raise WriteBehindBacklogged(
+                    f"{self.records - self.flushed_records} turns are waiting to be written; "
+                    f"last flush error: {self.last_error}")
+        state = inspect(character)
+        record = _new_entry()
+        for attr in state.mapper.column_attrs:
+            column = attr.key
+            if column in SKIP_COLUMNS:
+                continue
+            history = state.attrs[column].history
+            if not history.added:
+                continue
+            new = history.added[0]
+            old = history.deleted[0] if history.deleted else None
+            if isinstance(new, int) and isinstance(old, int) and not isinstance(new, bool):
+                if new != old:
+                    record['add'][column] = new - old
+            else:
+                record['set'][column] = new
+            set_committed_value(character, column, new)
+        record['items'] = {name: delta for name, delta in state.info.pop(_ITEMS, {}).items() if delta}
+        # Still flagged dirty, so detach it: the session must not UPDATE it or fire
+        # after_update listeners (the identity cache would snapshot the overlaid values)
+        if state.session is not None:
+            state.session.expunge(character)
+        if not (record['add'] or record['set'] or record['items']):
+            return False
+
+        with self._lock:
+            self._seq += 1
+            self._revisions[character.id] = self._seq
+            self._append(dict(record, seq=self._seq, id=character.id))
+            _merge(self._pending.setdefault(character.id, _new_entry()), record)
+            self.records += 1
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if len(self._pending) >= self.max_pending:
+                self._wake.set()
+        return True
+
+    def _append(self, record):
+        if self._journal is None:
+            return
+        self._journal.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+
+    def flush(self):
+        """Write every buffered entry in one transaction; returns the number of characters"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch = self._pending
+                self._pending = {}
+                self._flushing = batch
+                self._oldest = None
+                seq = self._seq
+                records = self.records
+                self._rotate_journal()
+
+            started = time.perf_counter()
+            try:
+                with self.engine.begin() as conn:
+                    versions = self._write(conn, batch, seq)
+            except Exception as e:
+                with self._lock:
+                    # Put the batch back underneath anything buffered since
+                    for character_id, entry in self._pending.items():
+                        _merge(batch.setdefault(character_id, _new_entry()), entry)
+                    self._pending = batch
+                    self._flushing = {}
+                    self._oldest = self._oldest or time.monotonic()
+                    self.failed_flushes += 1
+                    self.consecutive_failures += 1
+                    self.last_error = repr(e)
+                raise
+
+            with self._lock:
+                self._recent = {cid: (versions[cid], batch[cid]) for cid in versions}
+                self._flushing = {}
+                self.flushes += 1
+                self.flushed_records = records
+                self.last_flush_ms = (time.perf_counter() - started) * 1000
+                self.consecutive_failures = 0
+            if os.path.exists(self._flushing_path):
+                os.remove(self._flushing_path)
+            return len(batch)
+
+    def _write(self, conn, batch, seq):
+        self._ensure_checkpoint_table(conn)
+        characters = self.characters
+        versions = {}
+        for character_id, entry in batch.items():
+            values = {column: characters.c[column] + delta for column, delta in entry['add'].items()}
+            values.update(entry['set'])
+            # Same as the mapper's (version or 0) + 1; rows from before the version column have NULL
+            values['version'] = func.coalesce(characters.c.version, 0) + 1
+            row = conn.execute(
+                characters.update().where(characters.c.id == character_id)
+                .values(**values).returning(characters.c.version)
+            ).first()
+            if row is None:
+                continue  # no row updated: the character was deleted meanwhile
+            versions[character_id] = row[0]
+            for name, delta in entry['items'].items():
+                self._write_item(conn, character_id, name, delta)
+        conn.execute(text('UPDATE write_behind_checkpoint SET seq = :seq WHERE id = 1'), {'seq': seq})
+        return versions
+
+    def _write_item(self, conn, character_id, name, delta):
+        items, rows = self.items, self.character_items
+        conn.execute(sqlite_insert(items).values(name=name).on_conflict_do_nothing())
+        item_id = conn.execute(select(items.c.id).where(items.c.name == name)).scalar_one()
+        stmt = sqlite_insert(rows).values(character_id=character_id, item_id=item_id, quantity=delta)
+        conn.execute(stmt.on_conflict_do_update(
+            index_elements=['character_id', 'item_id'],
+            set_={'quantity': rows.c.quantity + stmt.excluded.quantity}))
+        conn.execute(rows.delete().where(rows.c.character_id == character_id,
+                                         rows.c.item_id == item_id, rows.c.quantity <= 0))
+
+    # Journal
+
+    def _rotate_journal(self):
+        """Move the journal aside for the flush in progress; new records go to a fresh file"""
+        if self._journal is None:
+            return
+        self._journal.close()
+        if os.path.exists(self._flushing_path):
+            # An earlier flush failed: keep its records in front of the new ones
+            with open(self.journal_path, encoding='utf-8') as src, \
+                    open(self._flushing_path, 'a', encoding='utf-8') as dst:
+                dst.write(src.read())
+            os.remove(self.journal_path)
+        else:
+            os.replace(self.journal_path, self._flushing_path)
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+
+    def recover(self):
+        """Re-buffer journal records newer than the checkpoint and write them out"""
+        # Numbering continues from the checkpoint even without a journal, or the
+        # next crash's records would look older than what was already written
+        with self.engine.begin() as conn:
+            checkpoint = self._ensure_checkpoint_table(conn)
+        self._seq = max(self._seq, checkpoint)
+        paths = [p for p in (self._flushing_path, self.journal_path) if os.path.exists(p)]
+        if not paths:
+            return 0
+        replayed = 0
+        for path in paths:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # torn final line from a crash mid-write
+                    self._seq = max(self._seq, record['seq'])
+                    if record['seq'] <= checkpoint:
+                        continue
+                    _merge(self._pending.setdefault(record['id'], _new_entry()), record)
+                    replayed += 1
+        if self._pending:
+            self.flush()
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+        return replayed
+
+    def _ensure_checkpoint_table(self, conn):
+        conn.execute(text('CREATE TABLE IF NOT EXISTS write_behind_checkpoint '
+                          '(id INTEGER PRIMARY KEY, seq INTEGER NOT NULL)'))
+        conn.execute(text('INSERT OR IGNORE INTO write_behind_checkpoint (id, seq) VALUES (1, 0)'))
+        return conn.execute(text('SELECT seq FROM write_behind_checkpoint WHERE id = 1')).scalar()
+
+    # Background flusher
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval / 2)
+            self._wake.clear()
+            self._tick()
+
+    def _tick(self):
+        """Flush if the oldest entry is due; a failed batch is kept and retried on the next tick"""
+        with self._lock:
+            due = self._oldest is not None and (
+                len(self._pending) >= self.max_pending
+                or time.monotonic() - self._oldest >= self.interval)
+            if not due:
+                return
+        try:
+            self.flush()
+        except Exception:
+            with self._lock:
+                backlog, failures = self.records - self.flushed_records, self.consecutive_failures
+            self.logger.exception("Write-behind flush failed (%d in a row, %d turns waiting)",
+                                  failures, backlog)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending_characters': len(self._pending),
+                'pending_records': self.records - self.flushed_records,
+                'records': self.records,
+                'flushed_records': self.flushed_records,
+                'flushes': self.flushes,
+                'last_flush_ms': self.last_flush_ms,
+                'failed_flushes': self.failed_flushes,
+                'consecutive_failures': self.consecutive_failures,
+                'last_error': self.last_error,
+                'rejected_turns': self.rejected,
+            }
+
+
+def create_write_behind(config, instance_path, engine, character_table, item_table,
+                        character_item_table, logger=None):
+    """Build and start the buffer if ``WRITE_BEHIND`` is on, else return None"""
+    if not config.get('WRITE_BEHIND'):
+        return None
+    path = config.get('WRITE_BEHIND_JOURNAL') or os.path.join(instance_path, 'write_behind.journal')
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    return WriteBehind(
+        engine, character_table, item_table, character_item_table, path,
+        interval=config.get('WRITE_BEHIND_INTERVAL', DEFAULT_INTERVAL),
+        max_pending=config.get('WRITE_BEHIND_MAX_PENDING', DEFAULT_MAX_PENDING),
+        max_backlog=config.get('WRITE_BEHIND_MAX_BACKLOG', DEFAULT_MAX_BACKLOG),
+        fsync=config.get('WRITE_BEHIND_FSYNC', False),
+        logger=logger,
+    ).start()